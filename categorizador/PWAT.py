@@ -1,7 +1,14 @@
 # Standard library imports
 import argparse
+import sys
+
+import recursos
+
+# Perfil de hilos/afinidad: debe aplicarse antes de importar TF, numpy y cv2
+PERFIL_RECURSOS = recursos.aplicar_entorno(
+    recursos.perfil_desde_argv(sys.argv[1:]))
+
 from tqdm import tqdm
-import matplotlib.pyplot as plt
 from tensorflow.keras.preprocessing.image import load_img, img_to_array
 from tensorflow.keras.layers import Conv2D, Multiply, Layer
 from tensorflow.keras.models import load_model
@@ -26,9 +33,22 @@ import warnings
 import json
 import random
 import pickle
+import time
 from glob import glob
 
+from preprocesamiento import (cargar_lote_uint8, load_and_preprocess_image,
+                              load_and_preprocess_mask)
+import clasificadores
+import metricas
+import radiomica
+
+import contextlib
+import contextvars
+import functools
+import io
 import os
+import shutil
+import threading
 # 0 = mostrar todo, 1 = filtrar INFO, 2 = filtrar INFO+WARNING, 3 = filtrar INFO+WARNING+ERROR
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
@@ -52,6 +72,9 @@ try:
 except ImportError:
     pass
 
+# Limitar los pools de hilos de TensorFlow y OpenCV según el perfil
+recursos.aplicar_librerias(PERFIL_RECURSOS)
+
 # Third-party imports
 
 # Image processing
@@ -67,52 +90,91 @@ MODEL_DIR = os.path.join(BASE_DIR, 'modelos')
 IMGS_DIR = os.path.join(BASE_DIR, '../backend/categorizador/predicts', 'imgs')
 MASKS_DIR = os.path.join(
     BASE_DIR, '../backend/categorizador/predicts', 'masks')
+# Resultados memoizados por contenido de imagen y versión de modelos
+# (ver memo.py); PWAT_CACHE=0 desactiva la memoización
+CACHE_DB = os.getenv('PWAT_CACHE_DB', os.path.join(
+    BASE_DIR, 'cache', 'resultados.sqlite'))
 
 model_path = os.path.join(MODEL_DIR, 'best_model.keras')
 
+# Todos los artefactos que determinan el resultado de una predicción
+ARTEFACTOS_MODELO = [model_path] + [
+    os.path.join(MODEL_DIR, nombre) for nombre in (
+        'Categoria3.json', 'Categoria3.pkl', 'Categoria4.joblib',
+        'Categoria5.joblib', 'Categoria6.json', 'Categoria6.pkl',
+        'Categoria7.joblib', 'Categoria8.joblib')]
+
 # Cargar modelos con sistema de respaldo (JSON primero, PKL como alternativa)
 
 
 def load_xgboost_model(model_name):
     """Carga modelo XGBoost desde JSON, si falla usa PKL como respaldo"""
-    json_path = os.path.join(MODEL_DIR, f"{model_name}.json")
-    pkl_path = os.path.join(MODEL_DIR, f"{model_name}.pkl")
+    modelo, tipo = clasificadores.cargar_xgboost(MODEL_DIR, model_name)
+    # Los mensajes solo en modo debug: en una recarga en caliente stdout
+    # puede ser el canal de respuestas del modo servir
+    if debug_mode:
+        origen = 'JSON' if tipo == 'xgboost_json' else 'PKL (respaldo)'
+        print(f"{model_name}: Cargado desde {origen} ✓")
+    return modelo, tipo
 
-    try:
-        # Intentar cargar desde JSON (formato preferido)
-        modelo = xgboost.Booster()
-        modelo.load_model(json_path)
-        print(f"{model_name}: Cargado desde JSON ✓")
-        return modelo, 'xgboost_json'
-    except Exception as e:
-        print(f"{model_name}: Error al cargar JSON ({e}), intentando PKL...")
-        try:
-            # Intentar cargar desde PKL (respaldo)
-            modelo = load(pkl_path)
-            print(f"{model_name}: Cargado desde PKL (respaldo) ✓")
-            return modelo, 'xgboost_pkl'
-        except Exception as e2:
-            print(f"{model_name}: ERROR - No se pudo cargar ni JSON ni PKL: {e2}")
-            raise
+
+# Estado de carga y calentamiento de cada modelo, consultable con estado_modelos()
+ESTADO_MODELOS = {}
+
+
+def _medir_carga(nombre, cargador, *args, estado=None, **kwargs):
+    """
+    Ejecuta un cargador de modelo y registra el tiempo que tardó en `estado`
+    (por defecto ESTADO_MODELOS).
+    """
+    inicio = time.perf_counter()
+    resultado = cargador(*args, **kwargs)
+    (ESTADO_MODELOS if estado is None else estado)[nombre] = {
+        'estado': 'cargado',
+        'carga_s': round(time.perf_counter() - inicio, 4),
+        'calentamiento_s': None,
+    }
+    return resultado
 
 
 # Solo mostrar mensajes de carga en modo debug
 debug_mode = os.getenv('DEBUG_PWAT') == '1'
 
-# Temporalmente silenciar print para cargar modelos
-original_print = print
-if not debug_mode:
-    print = lambda *args, **kwargs: None
 
-Categoria3, tipo_cat3 = load_xgboost_model("Categoria3")
-Categoria4 = load(os.path.join(MODEL_DIR, "Categoria4.joblib"))
-Categoria5 = load(os.path.join(MODEL_DIR, "Categoria5.joblib"))
-Categoria6, tipo_cat6 = load_xgboost_model("Categoria6")
-Categoria7 = load(os.path.join(MODEL_DIR, "Categoria7.joblib"))
-Categoria8 = load(os.path.join(MODEL_DIR, "Categoria8.joblib"))
+def cargar_clasificadores(estado=None):
+    """
+    Carga los seis clasificadores de MODEL_DIR.
+
+    Args:
+        estado (dict): Donde registrar los tiempos de carga (ver _medir_carga()).
+
+    Returns:
+        list: (nombre, modelo, tipo) de Categoria3 a Categoria8.
+    """
+    categoria3, tipo3 = _medir_carga(
+        "Categoria3", load_xgboost_model, "Categoria3", estado=estado)
+    categoria4 = _medir_carga("Categoria4", load, os.path.join(
+        MODEL_DIR, "Categoria4.joblib"), estado=estado)
+    categoria5 = _medir_carga("Categoria5", load, os.path.join(
+        MODEL_DIR, "Categoria5.joblib"), estado=estado)
+    categoria6, tipo6 = _medir_carga(
+        "Categoria6", load_xgboost_model, "Categoria6", estado=estado)
+    categoria7 = _medir_carga("Categoria7", load, os.path.join(
+        MODEL_DIR, "Categoria7.joblib"), estado=estado)
+    categoria8 = _medir_carga("Categoria8", load, os.path.join(
+        MODEL_DIR, "Categoria8.joblib"), estado=estado)
+
+    recursos.ajustar_modelos(PERFIL_RECURSOS, [
+        categoria3, categoria4, categoria5, categoria6, categoria7, categoria8])
+    return [
+        ('Categoria3', categoria3, tipo3),
+        ('Categoria4', categoria4, 'sklearn'),
+        ('Categoria5', categoria5, 'sklearn'),
+        ('Categoria6', categoria6, tipo6),
+        ('Categoria7', categoria7, 'sklearn'),
+        ('Categoria8', categoria8, 'sklearn'),
+    ]
 
-# Restaurar print
-print = original_print
 
 
 class SpatialAttention(Layer):
@@ -147,6 +209,19 @@ class SpatialAttention(Layer):
         return config
 
 
+
+class NormalizarUint8(Layer):
+    """
+    Convierte una entrada uint8 [0, 255] a float32 [0, 1] dentro del grafo.
+
+    Dividir en float32 da exactamente los mismos valores que `img / 255.0`
+    en float64 seguido de la conversión a float32 que hace Keras.
+    """
+
+    def call(self, inputs):
+        return tf.cast(inputs, tf.float32) / 255.0
+
+
 def dice_coefficient(y_true, y_pred):
     smooth = 1e-6
     y_true = tf.cast(y_true, tf.float32)
@@ -221,12 +296,15 @@ os.makedirs(predictions_dir, exist_ok=True)
 
 
 def load_and_convert_model(model_path, custom_objects):
+    # Igual que en load_xgboost_model(): también se ejecuta en la recarga en
+    # caliente, cuando stdout puede ser el canal de respuestas del modo servir
+    informar = print if debug_mode else (lambda *args, **kwargs: None)
     try:
         # Intentar cargar directamente como archivo Keras nativo
         return load_model(model_path, custom_objects=custom_objects)
     except ValueError as e:
         if "Please ensure the file is an accessible `.keras` zip file" in str(e):
-            print(
+            informar(
                 f"El archivo {model_path} está en formato HDF5. Convirtiendo a formato Keras nativo...")
 
             # Cargar el modelo HDF5 usando tf.keras con extensión temporal .h5
@@ -241,7 +319,7 @@ def load_and_convert_model(model_path, custom_objects):
 
                 # Guardar en formato Keras nativo
                 model.save(model_path, save_format='keras')
-                print(f"Modelo convertido y guardado como {model_path}")
+                informar(f"Modelo convertido y guardado como {model_path}")
 
                 # Limpiar archivo temporal
                 os.remove(temp_h5_path)
@@ -256,69 +334,142 @@ def load_and_convert_model(model_path, custom_objects):
             raise e
 
 
-# Cargar el modelo
-try:
-    model = load_and_convert_model(model_path, {
-        'SpatialAttention': SpatialAttention,
-        'dice_coefficient': dice_coefficient,
-        'iou_metric': iou_metric,
-        'precision_metric': precision_metric,
-        'recall_metric': recall_metric,
-        'f1_score': f1_score,
-        'combined_loss': combined_loss,
-        'focal_tversky_loss': focal_tversky_loss
-    })
-except Exception as e:
-    print(f"Error al cargar el modelo desde {model_path}: {e}")
-    print("Verifique que el archivo del modelo existe y es válido.")
-    raise
+OBJETOS_PERSONALIZADOS = {
+    'SpatialAttention': SpatialAttention,
+    'dice_coefficient': dice_coefficient,
+    'iou_metric': iou_metric,
+    'precision_metric': precision_metric,
+    'recall_metric': recall_metric,
+    'f1_score': f1_score,
+    'combined_loss': combined_loss,
+    'focal_tversky_loss': focal_tversky_loss
+}
 
-# 4. Definir funciones de preprocesamiento
 
+def cargar_segmentacion(estado=None):
+    """Carga el modelo de segmentación (ver _medir_carga() para `estado`)."""
+    try:
+        return _medir_carga('segmentacion', load_and_convert_model, model_path,
+                            OBJETOS_PERSONALIZADOS, estado=estado)
+    except Exception as e:
+        print(f"Error al cargar el modelo desde {model_path}: {e}", file=sys.stderr)
+        print("Verifique que el archivo del modelo existe y es válido.", file=sys.stderr)
+        raise
 
-def load_and_preprocess_image(image_path, target_size=(256, 256)):
-    """
-    Carga y preprocesa una imagen.
 
-    Args:
-        image_path (str): Ruta a la imagen.
-        target_size (tuple): Tamaño al que redimensionar la imagen.
+def cargar_modelos():
+    """
+    Carga una versión completa de los modelos, con su propio registro de
+    tiempos de carga y calentamiento.
 
     Returns:
-        np.array: Imagen preprocesada.
+        dict: {'segmentacion', 'clasificadores', 'estado', 'version'}
     """
-    try:
-        img = Image.open(image_path).convert('RGB')
-    except Exception as e:
-        print(f"Error al abrir la imagen {image_path}: {e}")
-        return None
-    img = img.resize(target_size)
-    img = np.array(img)
-    img = img / 255.0  # Normalización
-    return img
+    estado = {}
+    return {
+        'clasificadores': cargar_clasificadores(estado),
+        'segmentacion': cargar_segmentacion(estado),
+        'estado': estado,
+        'version': None,
+    }
 
 
-def load_and_preprocess_mask(mask_path, target_size=(256, 256)):
-    """
-    Carga y preprocesa una máscara.
+# Versión vigente de los modelos. Se carga al primer uso (ver
+# modelos_vigentes()) y se reemplaza entera en una recarga en caliente (ver
+# iniciar_recarga()); 'version' es la versión para la memoización, o None
+# para calcularla de los archivos en cada consulta.
+_modelos = None
+_bloqueo_carga = threading.Lock()
+# Calentar los modelos en cuanto se carguen (CLI con --calentar, ver __main__)
+_calentar_al_cargar = False
+# Versión fijada para la petición en curso (ver version_fijada())
+_modelos_fijados = contextvars.ContextVar('modelos_fijados', default=None)
 
-    Args:
-        mask_path (str): Ruta a la máscara.
-        target_size (tuple): Tamaño al que redimensionar la máscara.
+# Nombres de módulo que aún usan scripts externos
+_NOMBRES_MODELOS = ('model', 'clasificadores_cargados', 'Categoria3', 'Categoria4',
+                    'Categoria5', 'Categoria6', 'Categoria7', 'Categoria8',
+                    'tipo_cat3', 'tipo_cat6')
 
-    Returns:
-        np.array: Máscara preprocesada.
+
+def _fijar_nombres_modelos(modelos):
+    global model, clasificadores_cargados, tipo_cat3, tipo_cat6
+    global Categoria3, Categoria4, Categoria5, Categoria6, Categoria7, Categoria8
+    model = modelos['segmentacion']
+    clasificadores_cargados = modelos['clasificadores']
+    (Categoria3, Categoria4, Categoria5, Categoria6, Categoria7,
+     Categoria8) = [modelo for _, modelo, _ in clasificadores_cargados]
+    tipo_cat3, tipo_cat6 = clasificadores_cargados[0][2], clasificadores_cargados[3][2]
+
+
+def _cargar_modelos_iniciales():
+    """
+    Carga los modelos la primera vez que se necesitan, no al importar el
+    módulo: una consulta memoizada no los usa, y los trabajadores del pool
+    de radiomica.py vuelven a ejecutar este script como __mp_main__.
+    """
+    global _modelos
+    with _bloqueo_carga:
+        if _modelos is None:
+            modelos = {
+                'clasificadores': cargar_clasificadores(),
+                'segmentacion': cargar_segmentacion(),
+                'estado': ESTADO_MODELOS,
+                'version': None,
+            }
+            if _calentar_al_cargar:
+                calentar_modelos(modelos=modelos)
+            _fijar_nombres_modelos(modelos)
+            _modelos = modelos
+    return _modelos
+
+
+def __getattr__(nombre):
+    if nombre in _NOMBRES_MODELOS:
+        _cargar_modelos_iniciales()
+        return globals()[nombre]
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+
+
+def modelos_vigentes():
+    """Versión de los modelos a usar: la fijada para la petición o la vigente."""
+    fijados = _modelos_fijados.get()
+    if fijados is not None:
+        return fijados
+    return _modelos if _modelos is not None else _cargar_modelos_iniciales()
+
+
+@contextlib.contextmanager
+def version_fijada():
     """
+    Fija la versión vigente de los modelos para todo lo que se ejecute
+    dentro, de modo que una petición en curso termina con los modelos con
+    los que empezó aunque entretanto se recarguen.
+    """
+    fijados = _modelos_fijados.get()
+    if fijados is not None or _modelos is None:
+        # Sin modelos cargados no hay versión que fijar: la recarga en
+        # caliente solo empieza después de cargarlos (iniciar_recarga())
+        yield fijados
+        return
+    fijados = _modelos
+    token = _modelos_fijados.set(fijados)
     try:
-        mask = Image.open(mask_path).convert('L')  # Escala de grises
-    except Exception as e:
-        print(f"Error al abrir la máscara {mask_path}: {e}")
-        return None
-    mask = mask.resize(target_size)
-    mask = np.array(mask)
-    mask = (mask > 127).astype(np.float32)  # Binarización
-    mask = np.expand_dims(mask, axis=-1)
-    return mask
+        yield fijados
+    finally:
+        _modelos_fijados.reset(token)
+
+
+def con_version_fijada(funcion):
+    """Decorador: ejecuta `funcion` dentro de version_fijada()."""
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        with version_fijada():
+            return funcion(*args, **kwargs)
+    return envoltura
+
+# 4. Definir funciones de preprocesamiento
+# load_and_preprocess_image y load_and_preprocess_mask viven en
+# preprocesamiento.py para poder usarse sin TensorFlow
 
 
 def prepare_image_for_prediction(image):
@@ -346,12 +497,38 @@ def predict_mask(model, image):
         np.array: Máscara de predicción.
     """
     preprocessed_image = prepare_image_for_prediction(image)
-    pred_mask = model.predict(preprocessed_image, verbose=0)
+    with LATENCIA_ETAPAS.medir(etapa='segmentacion'):
+        pred_mask = model.predict(preprocessed_image, verbose=0)
     pred_mask = np.squeeze(pred_mask, axis=0)
 
     return pred_mask
 
 
+_modelos_uint8 = {}
+
+
+def modelo_uint8(modelo=None):
+    """
+    Envuelve el modelo de segmentación para que reciba lotes uint8: el
+    escalado y la conversión a float32 ocurren dentro del grafo, sin copias
+    float64 intermedias.
+
+    Args:
+        modelo (tf.keras.Model): Modelo a envolver (por defecto el vigente).
+
+    Returns:
+        tf.keras.Model: Modelo con entrada uint8 y las mismas salidas.
+    """
+    modelo = modelos_vigentes()['segmentacion'] if modelo is None else modelo
+    envuelto = _modelos_uint8.get(id(modelo))
+    if envuelto is None or envuelto[0] is not modelo:
+        entrada = tf.keras.Input(shape=modelo.input_shape[1:], dtype='uint8')
+        salida = modelo(NormalizarUint8()(entrada))
+        envuelto = (modelo, tf.keras.Model(entrada, salida))
+        _modelos_uint8[id(modelo)] = envuelto
+    return envuelto[1]
+
+
 def postprocess_mask(pred_mask, threshold=0.5):
     """
     Binariza la máscara de predicción utilizando un umbral.
@@ -368,7 +545,7 @@ def postprocess_mask(pred_mask, threshold=0.5):
 # 5. Definir funciones de visualización y guardado
 
 
-def visualize_prediction(original_image, true_mask, pred_mask, postprocessed_mask, save_path=None):
+def visualize_prediction(original_image, true_mask, pred_mask, postprocessed_mask, save_path=None, headless=None):
     """
     Visualiza y opcionalmente guarda la imagen original, máscara verdadera,
     máscara de predicción y máscara postprocesada.
@@ -379,7 +556,21 @@ def visualize_prediction(original_image, true_mask, pred_mask, postprocessed_mas
         pred_mask (np.array): Máscara de predicción.
         postprocessed_mask (np.array): Máscara postprocesada.
         save_path (str, optional): Ruta para guardar la visualización.
+        headless (bool, optional): Componer el panel con NumPy (overlays.py)
+            y solo guardarlo, sin matplotlib ni ventana. Por defecto se toma
+            de PWAT_HEADLESS=1.
     """
+    if headless is None:
+        headless = os.getenv('PWAT_HEADLESS') == '1'
+    if headless:
+        import overlays
+        if save_path:
+            overlays.guardar_panel(overlays.componer_panel(
+                original_image, true_mask, pred_mask, postprocessed_mask), save_path)
+        return
+
+    import matplotlib.pyplot as plt
+
     fig, axes = plt.subplots(1, 4, figsize=(20, 5))
 
     axes[0].imshow(original_image)
@@ -411,42 +602,580 @@ def save_mask(pred_mask, save_path):
     Args:
         pred_mask (np.array): Máscara postprocesada.
         save_path (str): Ruta para guardar la máscara.
+
+    La codificación se hace aquí y la escritura (atómica) en segundo plano;
+    ver escribir_archivo().
     """
-    mask = (pred_mask * 255).astype(np.uint8)
-    mask_image = Image.fromarray(mask.squeeze(), mode='L')
-    mask_image.save(save_path)
+    return escribir_archivo(save_path, codificar_mascara(pred_mask))
+
+
+def dos_etapas_activas():
+    """La segmentación en dos etapas se activa con PWAT_DOS_ETAPAS=1."""
+    return os.getenv('PWAT_DOS_ETAPAS') == '1'
 
 
-def predecir_mascara(imagen_path, modelo=model, target_size=(256, 256), threshold=0.5):
+def predecir_mascara(imagen_path, modelo=None, target_size=(256, 256), threshold=0.5,
+                     dos_etapas=None):
+    modelo = modelos_vigentes()['segmentacion'] if modelo is None else modelo
+    if dos_etapas if dos_etapas is not None else dos_etapas_activas():
+        return predecir_mascara_dos_etapas(imagen_path, modelo, target_size, threshold)
     imagen = load_and_preprocess_image(imagen_path, target_size=target_size)
     if imagen is None:
         raise ValueError(f"No se pudo cargar la imagen: {imagen_path}")
     prediccion = predict_mask(modelo, imagen)
 
     mascara_predicha = postprocess_mask(prediccion, threshold=threshold)
-    nombre_archivo = os.path.basename(imagen_path)
-    nombre_base, _ = os.path.splitext(nombre_archivo)
-    ruta_mascara = os.path.join(predictions_dir, f"{nombre_base}.jpg")
+    ruta_mascara = ruta_mascara_para(imagen_path)
     save_mask(mascara_predicha, ruta_mascara)
+    guardar_probabilidad(prediccion, ruta_mascara)
     if os.getenv('DEBUG_PWAT') == '1':
         print(f"Máscara guardada en: {ruta_mascara}")
     return ruta_mascara
 
 
-def predecir(image_path, mask_path):
+def predecir_mascara_dos_etapas(imagen_path, modelo=None, target_size=(256, 256),
+                                threshold=0.5):
+    """
+    Segmenta en dos pasadas: la imagen completa reducida ubica la herida y
+    un recorte con margen alrededor de ella se segmenta a la resolución
+    nativa del modelo (ver etapas.py). La máscara se guarda a la resolución
+    original de la imagen; si la herida ocupa casi toda la foto se usa solo
+    la primera pasada.
+
+    Returns:
+        str: Ruta de la máscara guardada.
+    """
+    import etapas
+
+    modelo = modelos_vigentes()['segmentacion'] if modelo is None else modelo
+    try:
+        original = Image.open(imagen_path).convert('RGB')
+    except Exception as e:
+        raise ValueError(f"No se pudo cargar la imagen: {imagen_path} ({e})")
+    tamano = original.size
+
+    gruesa = predict_mask(modelo, np.array(original.resize(target_size)) / 255.0)
+    caja = etapas.caja_herida(gruesa, tamano, threshold=threshold)
+    if caja is None:
+        prediccion = etapas.redimensionar_mapa(gruesa, tamano)[:, :, None]
+    else:
+        recorte = np.array(original.crop(caja).resize(target_size)) / 255.0
+        fina = predict_mask(modelo, recorte)
+        prediccion = etapas.componer(gruesa, fina, caja, tamano)
+    if os.getenv('DEBUG_PWAT') == '1':
+        print(f"Dos etapas: caja {caja} en imagen {tamano}")
+
+    ruta_mascara = ruta_mascara_para(imagen_path)
+    save_mask(postprocess_mask(prediccion, threshold=threshold), ruta_mascara)
+    guardar_probabilidad(prediccion, ruta_mascara)
+    return ruta_mascara
+
+
+def guardar_probabilidad(prediccion, ruta_mascara):
+    """
+    Guarda junto a la máscara el mapa de probabilidad cuantizado a uint8
+    (`<nombre>.prob.npz`), para poder cambiar el umbral sin volver a
+    inferir (ver reumbralizar.py). PWAT_PROBABILIDADES=0 lo desactiva.
+    """
+    if os.getenv('PWAT_PROBABILIDADES') == '0':
+        return
+    try:
+        import reumbralizar
+        # Se cuantiza ya (copia pequeña); la compresión va en segundo plano
+        cuantizado = reumbralizar.cuantizar(prediccion)
+        escribir_archivo(reumbralizar.ruta_probabilidad(ruta_mascara),
+                         functools.partial(reumbralizar.escribir_cuantizado, cuantizado))
+    except Exception as e:
+        if os.getenv('DEBUG_PWAT') == '1':
+            print(f"No se pudo guardar el mapa de probabilidad: {e}")
+
+
+def ruta_mascara_para(imagen_path):
+    """Ruta donde se guarda la máscara predicha de una imagen."""
+    nombre_base, _ = os.path.splitext(os.path.basename(imagen_path))
+    return os.path.join(predictions_dir, f"{nombre_base}.jpg")
+
+
+def predecir_mascaras_lote(rutas, modelo=None, target_size=(256, 256),
+                           threshold=0.5, tamano_lote=16):
+    """
+    Segmenta varias imágenes manteniéndolas en uint8 de principio a fin.
+
+    Las imágenes se cargan por bloques de `tamano_lote` en un arreglo uint8
+    preasignado y se pasan al modelo envuelto por modelo_uint8(), que
+    normaliza dentro del grafo.
+
+    Args:
+        rutas (list): Rutas de las imágenes.
+        modelo (tf.keras.Model): Modelo de segmentación (por defecto el vigente).
+        target_size (tuple): Tamaño de entrada del modelo.
+        threshold (float): Umbral de binarización.
+        tamano_lote (int): Imágenes por pasada del modelo.
+
+    Returns:
+        list: Ruta de la máscara de cada imagen, o None si no se pudo cargar.
+    """
+    envuelto = modelo_uint8(modelo)
+    mascaras = [None] * len(rutas)
+    for inicio in range(0, len(rutas), tamano_lote):
+        bloque = rutas[inicio:inicio + tamano_lote]
+        lote, validas = cargar_lote_uint8(bloque, target_size=target_size)
+        if not validas:
+            continue
+        predicciones = envuelto.predict(lote, batch_size=tamano_lote, verbose=0)
+        guardadas = _guardar_predicciones([bloque[i] for i in validas], predicciones,
+                                          threshold)
+        for indice, ruta_mascara in zip(validas, guardadas):
+            mascaras[inicio + indice] = ruta_mascara
+    return mascaras
+
+
+def predecir_mascaras_paquete(ruta_paquete, modelo=None, target_size=(256, 256),
+                              threshold=0.5, tamano_lote=16):
+    """
+    Segmenta las imágenes de un paquete (ver paquete.py).
+
+    Los lotes son cortes del mapa de memoria ya redimensionados en uint8, así
+    que van directos al modelo envuelto por modelo_uint8() sin decodificar
+    ni copiar en Python.
+
+    Args:
+        ruta_paquete (str): Directorio del paquete.
+        modelo (tf.keras.Model): Modelo de segmentación (por defecto el vigente).
+        target_size (tuple): Tamaño de entrada del modelo.
+        threshold (float): Umbral de binarización.
+        tamano_lote (int): Imágenes por pasada del modelo.
+
+    Returns:
+        list: Ruta de la máscara de cada imagen del paquete.
+    """
+    from paquete import Paquete
+
+    paquete = Paquete(ruta_paquete)
+    if paquete.tamano != tuple(target_size):
+        raise ValueError(f"El paquete es de {paquete.tamano} y el modelo espera {target_size}")
+    envuelto = modelo_uint8(modelo)
+    mascaras = []
+    for archivos, imagenes, _, _ in paquete.lotes(tamano_lote):
+        predicciones = envuelto.predict(imagenes, batch_size=tamano_lote, verbose=0)
+        mascaras.extend(_guardar_predicciones(archivos, predicciones, threshold))
+    return mascaras
+
+
+def _guardar_predicciones(rutas, predicciones, threshold):
+    """Guarda la máscara y la probabilidad de cada predicción de un lote."""
+    guardadas = []
+    for ruta, prediccion in zip(rutas, predicciones):
+        ruta_mascara = ruta_mascara_para(ruta)
+        save_mask(postprocess_mask(prediccion, threshold=threshold), ruta_mascara)
+        guardar_probabilidad(prediccion, ruta_mascara)
+        guardadas.append(ruta_mascara)
+    return guardadas
+
+
+def _numero_caracteristicas(modelo):
+    """Devuelve el número de características que espera un clasificador."""
+    if hasattr(modelo, 'num_features'):
+        return int(modelo.num_features())
+    return int(getattr(modelo, 'n_features_in_'))
+
+
+def _clasificadores():
+    """Devuelve (nombre, modelo, tipo) de los seis clasificadores vigentes."""
+    return modelos_vigentes()['clasificadores']
+
+
+def calentar_modelos(target_size=(256, 256), modelos=None):
+    """
+    Ejecuta entradas ficticias con las dimensiones de producción a través del
+    modelo de segmentación y de los seis clasificadores, para que el trazado
+    del grafo y la selección de kernels no recaigan en la primera petición.
+
+    Args:
+        target_size (tuple): Tamaño de entrada del modelo de segmentación.
+        modelos (dict): Versión a calentar (por defecto la vigente).
+
+    Returns:
+        dict: Estado de los modelos (ver estado_modelos()).
+    """
+    modelos = modelos_vigentes() if modelos is None else modelos
+    estado = modelos['estado']
+    objetivos = [('segmentacion', None, None)] + modelos['clasificadores']
+    for nombre, modelo, tipo in objetivos:
+        inicio = time.perf_counter()
+        try:
+            if nombre == 'segmentacion':
+                entrada = np.zeros(
+                    (1, target_size[0], target_size[1], 3), dtype=np.float32)
+                modelos['segmentacion'].predict(entrada, verbose=0)
+            else:
+                entrada = np.zeros(
+                    (1, _numero_caracteristicas(modelo)), dtype=np.float64)
+                clasificadores.predecir_crudo(modelo, tipo, entrada)
+        except Exception as e:
+            estado.setdefault(nombre, {})['estado'] = 'error'
+            estado[nombre]['error'] = str(e)
+            if os.getenv('DEBUG_PWAT') == '1':
+                print(f"No se pudo calentar {nombre}: {e}")
+            continue
+        estado.setdefault(nombre, {}).update({
+            'estado': 'listo',
+            'calentamiento_s': round(time.perf_counter() - inicio, 4),
+        })
+    return estado_modelos(modelos)
+
+
+def estado_modelos(modelos=None):
+    """
+    Informa si los modelos están listos para atender peticiones.
+
+    Args:
+        modelos (dict): Versión a informar (por defecto la vigente).
+
+    Returns:
+        dict: {'listo': bool, 'modelos': {nombre: {estado, carga_s, calentamiento_s}}},
+        más 'recarga' si la recarga en caliente está activa.
+    """
+    estado = (modelos_vigentes() if modelos is None else modelos)['estado']
+    informe = {
+        'listo': bool(estado) and all(
+            info.get('estado') == 'listo' for info in estado.values()),
+        'modelos': {nombre: dict(info) for nombre, info in estado.items()},
+    }
+    if _registro is not None:
+        informe['recarga'] = _registro.estado()
+    return informe
+
+
+def validar_modelos(modelos, target_size=(256, 256)):
+    """
+    Calienta una versión recién cargada y la prueba con una imagen de sonda
+    antes de ponerla en uso. PWAT_SONDA indica una imagen real; si no, se
+    usa un degradado sintético.
+
+    Raises:
+        ValueError: Si algún modelo no respondió o la segmentación no
+            devuelve un mapa de probabilidad válido.
+    """
+    informe = calentar_modelos(target_size, modelos=modelos)
+    if not informe['listo']:
+        errores = {nombre: info.get('error') for nombre, info in informe['modelos'].items()
+                   if info.get('estado') != 'listo'}
+        raise ValueError(f"Modelos no aptos: {errores}")
+
+    ruta_sonda = os.getenv('PWAT_SONDA')
+    if ruta_sonda:
+        sonda = load_and_preprocess_image(ruta_sonda, target_size=target_size)
+    else:
+        gradiente = np.linspace(0.0, 1.0, target_size[0] * target_size[1])
+        sonda = np.repeat(gradiente.reshape(target_size + (1,)), 3, axis=2)
+    prediccion = predict_mask(modelos['segmentacion'], sonda)
+    if (prediccion.shape != tuple(target_size) + (1,)
+            or not np.all(np.isfinite(prediccion))
+            or prediccion.min() < 0 or prediccion.max() > 1):
+        raise ValueError(f"Salida de segmentación inválida: forma {prediccion.shape}")
+
+
+_registro = None
+
+
+def _cargar_version():
+    """Carga, para el registro, una versión nueva de los modelos."""
+    modelos = cargar_modelos()
+    modelos['version'] = _version_artefactos()
+    return modelos
+
+
+def _publicar_modelos(nuevos, anteriores):
+    """Pone en uso una versión recién validada (ver registro.py)."""
+    global _modelos, ESTADO_MODELOS
+    _modelos = nuevos
+    ESTADO_MODELOS = nuevos['estado']
+    _fijar_nombres_modelos(nuevos)
+    # El envoltorio uint8 del modelo anterior ya no se usará
+    _modelos_uint8.pop(id(anteriores['segmentacion']), None)
+    RECARGAS.inc()
+
+
+def iniciar_recarga(intervalo=None):
+    """
+    Activa la recarga en caliente de los modelos en un proceso de larga
+    duración (ver registro.py). PWAT_RECARGA=0 la desactiva y
+    PWAT_RECARGA_INTERVALO fija los segundos entre comprobaciones (5).
+
+    Returns:
+        registro.RegistroModelos: El registro, o None si está desactivada.
+    """
+    global _registro
+    if os.getenv('PWAT_RECARGA') == '0' or _registro is not None:
+        return _registro
+    import registro
+
+    # Desde aquí la memoización usa la versión de los modelos en uso, no la
+    # de los archivos, que pueden cambiar antes de que se recarguen
+    vigentes = _cargar_modelos_iniciales()
+    vigentes['version'] = _version_artefactos()
+    if intervalo is None:
+        intervalo = float(os.getenv('PWAT_RECARGA_INTERVALO', '5'))
+    _registro = registro.RegistroModelos(
+        ARTEFACTOS_MODELO, _cargar_version, validar=validar_modelos,
+        vigente=vigentes, al_cambiar=_publicar_modelos, intervalo=intervalo)
+    _registro.iniciar()
+    return _registro
+
+
+def _en_almacen(tarea, descripcion):
+    """
+    Ejecuta `tarea(almacen)` sobre el almacén de características (ver
+    feature_store.py) en el escritor en segundo plano, para que el bloqueo
+    y los fsync no recaigan en la petición; sin escritor, en el momento.
+    Un fallo nunca interrumpe la predicción.
+    """
+    try:
+        import feature_store
+        almacen = feature_store.almacen_desde_entorno()
+    except Exception as e:
+        almacen = None
+        if os.getenv('DEBUG_PWAT') == '1':
+            print(f"No se pudo abrir el almacén de características: {e}")
+    if almacen is None:
+        return
+
+    def ejecutar():
+        try:
+            tarea(almacen)
+        except Exception as e:
+            if os.getenv('DEBUG_PWAT') == '1':
+                print(f"No se pudo {descripcion}: {e}")
+
+    fondo = escritor_fondo()
+    if fondo is None:
+        ejecutar()
+    else:
+        # Misma clave para todas: las filas se agregan en orden
+        fondo.ejecutar(almacen.ruta_indice, ejecutar)
+
+
+def _guardar_caracteristicas(image_id, df):
+    """Agrega las características extraídas al almacén (ver _en_almacen())."""
+    columnas, valores = list(df.columns), df.values
+    _en_almacen(lambda almacen: almacen.agregar(image_id, columnas, valores),
+                'guardar en el almacén de características')
+
+
+def _copiar_caracteristicas(origen, destino):
+    """Registra para `destino` el último vector guardado de `origen`."""
+    def copiar(almacen):
+        vector = almacen.buscar(origen)
+        if vector is not None:
+            almacen.agregar(destino, almacen.columnas, vector[None, :])
+
+    _en_almacen(copiar, 'reutilizar las características')
+
+
+_escritor = None
+_bloqueo_escritor = threading.Lock()
+
+
+def escritor_fondo():
+    """
+    Devuelve el escritor en segundo plano (ver escritor.py), o None si
+    PWAT_ESCRITOR=0, en cuyo caso las escrituras son síncronas.
+
+    PWAT_ESCRITOR_HILOS y PWAT_ESCRITOR_COLA fijan los hilos y el máximo de
+    escrituras pendientes; PWAT_ESCRITOR_FSYNC=0 omite el fsync.
+    """
+    global _escritor
+    if os.getenv('PWAT_ESCRITOR') == '0':
+        return None
+    with _bloqueo_escritor:
+        if _escritor is None:
+            import escritor
+            _escritor = escritor.Escritor(
+                hilos=int(os.getenv('PWAT_ESCRITOR_HILOS', '2')),
+                max_pendientes=int(os.getenv('PWAT_ESCRITOR_COLA', '32')),
+                fsync=os.getenv('PWAT_ESCRITOR_FSYNC') != '0')
+        return _escritor
+
+
+def escribir_archivo(ruta, contenido, esperar=False):
+    """
+    Escribe un archivo de forma atómica fuera del camino crítico.
+
+    Args:
+        ruta (str): Ruta final.
+        contenido (bytes | callable): Bytes, o una función que recibe la
+            ruta temporal (con la misma extensión) y escribe allí.
+        esperar (bool): Volver solo cuando el archivo ya esté en disco.
+
+    Returns:
+        Future: Escritura pendiente, o None si se hizo de forma síncrona.
+    """
+    fondo = escritor_fondo()
+    if fondo is None:
+        import escritor
+        escritor.escribir_atomico(ruta, contenido)
+        return None
+    futuro = fondo.escribir(ruta, contenido)
+    if esperar:
+        futuro.result()
+    return futuro
+
+
+def vaciar_escrituras():
+    """Espera a que todas las escrituras en segundo plano estén en disco."""
+    if _escritor is not None:
+        _escritor.vaciar()
+
+
+# Métricas del proceso (ver metricas.py). Se acumulan siempre; el endpoint
+# HTTP solo se abre con iniciar_metricas().
+METRICAS = metricas.Registro()
+PETICIONES = METRICAS.contador(
+    'pwat_peticiones_total', 'Peticiones atendidas por modo y resultado',
+    ('modo', 'resultado'))
+LATENCIA_PETICIONES = METRICAS.histograma(
+    'pwat_peticion_segundos', 'Latencia total de una petición por modo', ('modo',))
+LATENCIA_ETAPAS = METRICAS.histograma(
+    'pwat_etapa_segundos', 'Latencia por etapa (segmentacion, radiomica, clasificacion)',
+    ('etapa',))
+REUTILIZADOS = METRICAS.contador(
+    'pwat_reutilizados_total', 'Resultados servidos sin inferir (memo o duplicado)',
+    ('origen',))
+CATEGORIAS_POR_DEFECTO = METRICAS.contador(
+    'pwat_categoria_por_defecto_total',
+    'Categorías cuyo clasificador falló y devolvieron el valor por defecto',
+    ('categoria',))
+RECARGAS = METRICAS.contador(
+    'pwat_modelos_recargas_total', 'Recargas en caliente aplicadas')
+
+
+def _tiempos_modelos(campo):
+    # Sin cargar los modelos: leer /metrics no debe provocar la carga
+    modelos = _modelos_fijados.get() or _modelos
+    if modelos is None:
+        return {}
+    return {nombre: info.get(campo) for nombre, info in modelos['estado'].items()}
+
+
+METRICAS.medidor('pwat_cola_escrituras', 'Escrituras pendientes en el escritor en segundo plano',
+                 lambda: _escritor.en_cola if _escritor is not None else 0)
+METRICAS.medidor('pwat_modelo_carga_segundos', 'Tiempo de carga de cada modelo vigente',
+                 lambda: _tiempos_modelos('carga_s'), ('modelo',))
+METRICAS.medidor('pwat_modelo_calentamiento_segundos',
+                 'Tiempo de calentamiento de cada modelo vigente',
+                 lambda: _tiempos_modelos('calentamiento_s'), ('modelo',))
+METRICAS.medidor('pwat_proceso_rss_bytes', 'Memoria residente del proceso',
+                 metricas.rss_bytes)
+
+_servidor_metricas = None
+
+
+def iniciar_metricas(puerto=None):
+    """
+    Abre el endpoint /metrics (formato de Prometheus) en un proceso de larga
+    duración. Sin `puerto` se usa PWAT_METRICAS_PUERTO; si tampoco está
+    definido no se abre nada. PWAT_METRICAS_HOST cambia la interfaz
+    (127.0.0.1 por defecto).
+
+    Returns:
+        ThreadingHTTPServer: El servidor, o None si no se abrió.
+    """
+    global _servidor_metricas
+    puerto = puerto if puerto is not None else os.getenv('PWAT_METRICAS_PUERTO')
+    if puerto in (None, '') or _servidor_metricas is not None:
+        return _servidor_metricas
+    _servidor_metricas = metricas.servir_http(
+        METRICAS, int(puerto), host=os.getenv('PWAT_METRICAS_HOST', '127.0.0.1'))
+    if os.getenv('DEBUG_PWAT') == '1':
+        host, puerto = _servidor_metricas.server_address[:2]
+        print(f"Métricas en http://{host}:{puerto}/metrics")
+    return _servidor_metricas
+
+
+@contextlib.contextmanager
+def contabilizar_peticion(modo):
+    """Cuenta la petición por resultado y mide su latencia total."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        PETICIONES.inc(modo=modo, resultado='error')
+        raise
+    else:
+        PETICIONES.inc(modo=modo, resultado='ok')
+    finally:
+        LATENCIA_PETICIONES.observar(time.perf_counter() - inicio, modo=modo)
+
+
+def imagen_rgb(fuente):
+    """Abre una imagen (bytes codificados, arreglo o ruta) como PIL RGB."""
+    if isinstance(fuente, np.ndarray):
+        return Image.fromarray(fuente).convert('RGB')
+    if isinstance(fuente, bytes):
+        fuente = io.BytesIO(fuente)
+    return Image.open(fuente).convert('RGB')
+
+
+def imagen_gris(fuente):
+    """
+    Imagen en escala de grises como la lee cv2.imread(..., IMREAD_GRAYSCALE).
+
+    Args:
+        fuente (bytes | np.array | str): Bytes codificados, arreglo RGB o
+            gris, o ruta.
+
+    Returns:
+        np.array: Imagen uint8 (H, W), o None si no se pudo decodificar.
+    """
+    if isinstance(fuente, np.ndarray):
+        if fuente.ndim == 3:
+            return cv2.cvtColor(fuente, cv2.COLOR_RGB2GRAY)
+        return fuente
+    if isinstance(fuente, bytes):
+        return cv2.imdecode(np.frombuffer(fuente, dtype=np.uint8),
+                            cv2.IMREAD_GRAYSCALE)
+    return cv2.imread(fuente, cv2.IMREAD_GRAYSCALE)
+
+
+def predecir_mascara_arreglo(fuente, modelo=None, target_size=(256, 256), threshold=0.5):
+    """
+    Segmenta una imagen en memoria, con el mismo preprocesamiento que
+    load_and_preprocess_image().
+
+    Returns:
+        tuple: (prediccion, mascara) con el mapa de probabilidad y la
+        máscara postprocesada, ambos (H, W, 1).
+    """
+    img = np.array(imagen_rgb(fuente).resize(target_size)) / 255.0
+    prediccion = predict_mask(
+        modelos_vigentes()['segmentacion'] if modelo is None else modelo, img)
+    return prediccion, postprocess_mask(prediccion, threshold=threshold)
+
+
+def codificar_mascara(pred_mask):
+    """Codifica la máscara en JPEG exactamente como lo hace save_mask()."""
+    buffer = io.BytesIO()
+    mask = (pred_mask * 255).astype(np.uint8)
+    Image.fromarray(mask.squeeze(), mode='L').save(buffer, format='JPEG')
+    return buffer.getvalue()
+
 
-    # Silenciar los mensajes no deseados de PyRadiomics
-    logging.getLogger('radiomics').setLevel(logging.ERROR)
+def predecir(image_path, mask_path, imprimir=True):
 
     # Solo mostrar estos mensajes en modo debug
     if os.getenv('DEBUG_PWAT') == '1':
         print(f"Procesando imagen: {os.path.basename(image_path)}")
         print(f"Usando máscara: {os.path.basename(mask_path)}")
 
-    extractor = radiomics.featureextractor.RadiomicsFeatureExtractor()
-
     img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-    mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
+    # La máscara puede estar aún en la cola del escritor (mask_precit)
+    fondo = escritor_fondo()
+    pendiente = fondo.pendiente(mask_path) if fondo is not None else None
+    if pendiente is not None:
+        mask = imagen_gris(pendiente)
+    else:
+        mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
 
     # Validar que las imágenes se cargaron correctamente
     if img is None:
@@ -456,165 +1185,69 @@ def predecir(image_path, mask_path):
         raise ValueError(
             f'No se pudo cargar la máscara desde {mask_path}. Verifique que el archivo existe y es una imagen válida.')
 
-    # Validar que la máscara no esté vacía
-    if np.max(mask) == 0:
-        raise ValueError(
-            f'La máscara está completamente vacía (todos los pixeles son 0). Verifique que la máscara contenga regiones segmentadas.')
-
-    # Normalizar a máscara binaria con tipo compatible para OpenCV
-    # Evitar tipos int64 que provocan error en cv2.resize (func != 0)
-    mask = (mask > 0).astype(np.uint8)
-
-    img = cv2.resize(img, (256, 256))
-    # Mantener máscara binaria usando interpolación de vecino más cercano
-    mask = cv2.resize(mask, (256, 256), interpolation=cv2.INTER_NEAREST)
-
     # Detectar la extensión del archivo de máscara para reemplazar correctamente
     # Obtiene la extensión (.jpg, .png, etc.)
     mask_ext = os.path.splitext(mask_path)[1]
+    rutas_nrrd = (image_path.replace(".jpg", '.nrrd'),
+                  mask_path.replace(mask_ext, '.nrrd'))
 
-    nrrd.write(image_path.replace(".jpg", '.nrrd'), img)
-    nrrd.write(mask_path.replace(mask_ext, '.nrrd'), mask)
-
-    result = extractor.execute(image_path.replace(
-        ".jpg", '.nrrd'), mask_path.replace(mask_ext, '.nrrd'))
-
-    # 5. Lista de claves a excluir
-    keys_to_exclude = [
-        'diagnostics_Versions_PyRadiomics',
-        'diagnostics_Versions_Numpy',
-        'diagnostics_Versions_SimpleITK',
-        'diagnostics_Versions_PyWavelet',
-        'diagnostics_Versions_Python',
-        'diagnostics_Configuration_Settings',
-        'diagnostics_Image-original_Spacing',
-        'diagnostics_Image-original_Size',
-        'diagnostics_Image-original_Mean',
-        'diagnostics_Image-original_Minimum',
-        'diagnostics_Image-original_Maximum',
-        'diagnostics_Mask-original_Hash',
-        'diagnostics_Mask-original_Spacing',
-        'diagnostics_Mask-original_Size',
-        'diagnostics_Configuration_EnabledImageTypes',
-        'diagnostics_Image-original_Hash',
-        'diagnostics_Image-original_Dimensionality',
-        'diagnostics_Mask-original_CenterOfMass',
-        'diagnostics_Mask-original_BoundingBox',
-        'diagnostics_Mask-original_CenterOfMassIndex'
-    ]
+    return predecir_arreglos(img, mask, os.path.basename(image_path),
+                             imprimir=imprimir, rutas_nrrd=rutas_nrrd,
+                             extraer_de_disco=fondo is None)
 
-    # 6. Filtrar el diccionario 'result'
-    filtered_features = {
-        k: v
-        for k, v in result.items()
-        if k not in keys_to_exclude
-    }
 
-    # 7. Construir el diccionario final
-    filtered_data = {
-        'imagen': os.path.basename(image_path),
-        **filtered_features
-    }
-    df = pd.DataFrame([filtered_data])
+def predecir_arreglos(img, mask, image_id, imprimir=True, rutas_nrrd=None,
+                      extraer_de_disco=False):
+    """
+    Calcula las categorías PWAT a partir de la imagen y la máscara en gris.
 
-    # Eliminar columnas no numéricas y de diagnóstico
-    df = df.drop(['imagen'], axis=1)
+    Args:
+        img (np.array): Imagen en escala de grises (uint8).
+        mask (np.array): Máscara en escala de grises (0 = fondo).
+        image_id (str): Identificador para el almacén de características.
+        imprimir (bool): Imprimir el JSON de resultados.
+        rutas_nrrd (tuple): Rutas (imagen, máscara) de los NRRD, o None
+            para no escribirlos.
+        extraer_de_disco (bool): Escribir los NRRD y que PyRadiomics los lea
+            de disco (flujo de predecir() con PWAT_ESCRITOR=0). Si es False
+            la extracción usa imágenes SimpleITK en memoria y los NRRD se
+            escriben en segundo plano.
 
-    # Eliminar las primeras 2 columnas de diagnósticos restantes
-    if len(df.columns) > 2:
-        df = df.drop(df.columns[:2], axis=1)
+    Returns:
+        dict: {'Cat3': n, ..., 'Cat8': n}
+    """
+    img, mask = radiomica.preparar_entradas(img, mask)
 
-    # Asegurar que todos los valores sean numéricos
-    for col in df.columns:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
+    if extraer_de_disco:
+        nrrd.write(rutas_nrrd[0], img)
+        nrrd.write(rutas_nrrd[1], mask)
+        with LATENCIA_ETAPAS.medir(etapa='radiomica'):
+            df = radiomica.extraer_caracteristicas(rutas_nrrd[0], rutas_nrrd[1], image_id)
+    else:
+        if rutas_nrrd is not None:
+            escribir_archivo(rutas_nrrd[0], functools.partial(nrrd.write, data=img))
+            escribir_archivo(rutas_nrrd[1], functools.partial(nrrd.write, data=mask))
+        with LATENCIA_ETAPAS.medir(etapa='radiomica'):
+            df = radiomica.extraer_caracteristicas(img, mask, image_id)
 
-    # Rellenar NaN con 0 si los hay
-    df = df.fillna(0)
+    # Guardar el vector para poder reclasificar sin volver a extraerlo
+    _guardar_caracteristicas(image_id, df)
 
     # Solo mostrar en modo debug
     if os.getenv('DEBUG_PWAT') == '1':
         print(f"Características extraídas: {len(df.columns)} features")
         print(f"Shape de datos: {df.shape}")
 
-    modelos = [Categoria3, Categoria4, Categoria5,
-               Categoria6, Categoria7, Categoria8]
-    tipos_modelo = [tipo_cat3, 'sklearn',
-                    'sklearn', tipo_cat6, 'sklearn', 'sklearn']
-    resultados = []
-
-    for i, z, tipo in zip(modelos, range(3, 9), tipos_modelo):
-        try:
-            if tipo.startswith('xgboost'):
-                # Para modelos XGBoost (tanto JSON como PKL)
-                import xgboost as xgb
-                # Aplanar completamente el array y convertir a float64
-                data_flat = df.values.flatten().astype(np.float64)
-                data_array = data_flat.reshape(1, -1)
-
-                # Solo mostrar debug si está habilitado
-                if os.getenv('DEBUG_PWAT') == '1':
-                    print(
-                        f"Datos para XGBoost Cat{z} ({tipo}): shape={data_array.shape}, dtype={data_array.dtype}")
-
-                if tipo == 'xgboost_json':
-                    # Modelo cargado desde JSON - usar DMatrix (Booster)
-                    dmatrix = xgb.DMatrix(data_array)
-                    prediccion = i.predict(dmatrix)
-                else:
-                    # Modelo cargado desde PKL - es un XGBClassifier, usar predict_proba
-                    prediccion = i.predict_proba(data_array)
-
-                if os.getenv('DEBUG_PWAT') == '1':
-                    print(
-                        f"Predicción XGBoost raw: {prediccion}, tipo: {type(prediccion)}")
-
-                # Manejar predicción de XGBoost (multiclase)
-                if isinstance(prediccion, np.ndarray):
-                    if prediccion.ndim == 2 and prediccion.shape[1] > 1:
-                        # Es una predicción multiclase (probabilidades)
-                        # +1 porque las clases empiezan en 1
-                        resultado = int(np.argmax(prediccion[0])) + 1
-                    elif prediccion.ndim == 1 and len(prediccion) > 1:
-                        # Es una predicción multiclase en 1D
-                        resultado = int(np.argmax(prediccion)) + 1
-                    else:
-                        # Es una predicción single value
-                        resultado = int(round(float(prediccion.flatten()[0])))
-                else:
-                    resultado = int(round(float(prediccion)))
-
-                resultados.append(resultado)
-                if os.getenv('DEBUG_PWAT') == '1':
-                    print(
-                        f"Categoría {z} (XGBoost-{tipo.split('_')[1].upper()}): {resultado}")
-            else:
-                # Para modelos sklearn (RandomForest, etc.)
-                data_array = df.values.astype(np.float32)
-                if data_array.ndim == 1:
-                    data_array = data_array.reshape(1, -1)
-
-                prediccion = i.predict(data_array)
-                resultado = int(prediccion[0]) if hasattr(
-                    prediccion, '__len__') else int(prediccion)
-                resultados.append(resultado)
-                if os.getenv('DEBUG_PWAT') == '1':
-                    print(f"Categoría {z} (Sklearn): {resultado}")
-        except Exception as e:
-            if os.getenv('DEBUG_PWAT') == '1':
-                print(f"ERROR con la categoría {z}: {e}")
-                print(
-                    f"Tipo de datos: {type(df.values)}, Shape: {df.values.shape}")
-                print(f"Usando valor por defecto para categoría {z}")
-            if z == 3:
-                resultados.append(2)  # Valor por defecto para Cat3
-            elif z == 6:
-                resultados.append(3)  # Valor por defecto para Cat6
-            else:
-                resultados.append(1)  # Valor por defecto genérico
-    categories = ["Cat3", "Cat4", "Cat5", "Cat6", "Cat7", "Cat8"]
-    results_dict = {}
-    for c, r in zip(categories, resultados):
-        results_dict[c] = r[0] if hasattr(r, "__getitem__") else r
+    # Misma decodificación y valores por defecto que reclasificar
+    # (ver clasificadores.py)
+    vigentes = [(int(nombre[len('Categoria'):]), modelo, tipo)
+                for nombre, modelo, tipo in _clasificadores()]
+    inicio_clasificacion = time.perf_counter()
+    fila = clasificadores.predecir_lote(
+        vigentes, df.values,
+        al_fallar=lambda categoria: CATEGORIAS_POR_DEFECTO.inc(categoria=f"Cat{categoria}"))[0]
+    LATENCIA_ETAPAS.observar(time.perf_counter() - inicio_clasificacion, etapa='clasificacion')
+    results_dict = clasificadores.a_diccionario(fila)
 
     # Solo mostrar la tabla de resultados en modo debug, siempre imprimir el JSON
     if os.getenv('DEBUG_PWAT') == '1':
@@ -625,20 +1258,459 @@ def predecir(image_path, mask_path):
             print(f"{cat}: {resultado}")
         print("="*50)
 
-    # SIEMPRE imprimir el JSON para que el backend lo pueda parsear
-    print(json.dumps(results_dict))
+    # Imprimir el JSON para que el backend lo pueda parsear
+    if imprimir:
+        print(json.dumps(results_dict))
     return results_dict
 
 
-def mask_precit(image_path):
-    # Si no es una ruta absoluta, agregar el directorio IMGS_DIR
-    if not os.path.isabs(image_path):
-        full_image_path = os.path.join(IMGS_DIR, image_path)
+_memo = None
+
+
+def _memo_resultados():
+    """Devuelve el almacén de memoización, o None si está desactivado."""
+    global _memo
+    if os.getenv('PWAT_CACHE') == '0':
+        return None
+    if _memo is None or _memo.ruta_db != CACHE_DB:
+        import memo
+        _memo = memo.MemoResultados(CACHE_DB)
+    return _memo
+
+
+def _version_artefactos():
+    """Versión de memoización de los archivos de modelo en disco, o None."""
+    almacen = _memo_resultados()
+    return almacen.version_modelos(ARTEFACTOS_MODELO) if almacen is not None else None
+
+
+def _version_modelos(almacen):
+    """Versión de memoización de los modelos en uso (sin cargarlos)."""
+    modelos = _modelos_fijados.get() or _modelos
+    version = modelos['version'] if modelos is not None else None
+    return version if version is not None else almacen.version_modelos(ARTEFACTOS_MODELO)
+
+
+def _clave_imagen(image_path):
+    """
+    Clave de memoización de una imagen: el hash de su contenido, distinguido
+    si la máscara se obtiene con la segmentación en dos etapas.
+    """
+    import memo
+    clave = memo.hash_archivo(image_path)
+    return clave + ':dos_etapas' if dos_etapas_activas() else clave
+
+
+def guardar_resultado(image_path, ruta_mascara, categorias, threshold=0.5):
+    """
+    Memoiza la máscara y las categorías calculadas para una imagen, bajo el
+    hash de su contenido, la versión de los modelos y el umbral.
+
+    Args:
+        image_path (str): Ruta de la imagen procesada.
+        ruta_mascara (str): Ruta de la máscara generada.
+        categorias (dict): Resultado de predecir().
+        threshold (float): Umbral usado para binarizar la máscara.
+
+    La firma de la máscara se toma cuando termina de escribirse, así que si
+    sigue en la cola del escritor el registro se difiere hasta entonces.
+    """
+    almacen = _memo_resultados()
+    if almacen is None:
+        return
+
+    def memoizar(clave, version):
+        try:
+            almacen.guardar(clave, version, threshold, ruta_mascara, categorias,
+                            ruta_imagen=os.path.abspath(image_path))
+        except Exception as e:
+            if os.getenv('DEBUG_PWAT') == '1':
+                print(f"No se pudo memoizar el resultado: {e}")
+
+    try:
+        clave = _clave_imagen(image_path)
+        version = _version_modelos(almacen)
+    except Exception as e:
+        if os.getenv('DEBUG_PWAT') == '1':
+            print(f"No se pudo memoizar el resultado: {e}")
+        return
+    fondo = escritor_fondo()
+    if fondo is None:
+        memoizar(clave, version)
     else:
-        full_image_path = image_path
+        fondo.despues_de(ruta_mascara, lambda: memoizar(clave, version))
+
+
+def buscar_resultado(image_path, threshold=0.5):
+    """
+    Devuelve el resultado memoizado de una imagen si existe para su contenido
+    actual, la versión vigente de los modelos y el umbral, y si la máscara
+    guardada no ha cambiado.
+
+    Returns:
+        dict: {'mascara', 'categorias'} o None.
+    """
+    almacen = _memo_resultados()
+    if almacen is None:
+        return None
+    try:
+        return almacen.buscar(_clave_imagen(image_path),
+                              _version_modelos(almacen),
+                              threshold)
+    except Exception as e:
+        if os.getenv('DEBUG_PWAT') == '1':
+            print(f"No se pudo consultar la memoización: {e}")
+        return None
+
+
+_indice = None
+
+
+def _indice_duplicados():
+    """
+    Devuelve el índice de hashes perceptuales, o None si está desactivado.
+    Reutilizar el resultado de otra imagen es opcional: se activa con
+    PWAT_DUPLICADOS=1.
+
+    Comparte la base de datos con la memoización y depende de ella: sin
+    resultados memoizados no hay nada que reutilizar.
+    """
+    global _indice
+    if os.getenv('PWAT_CACHE') == '0' or os.getenv('PWAT_DUPLICADOS') != '1':
+        return None
+    if _indice is None or _indice.ruta_db != CACHE_DB:
+        import duplicados
+        _indice = duplicados.IndicePerceptual(CACHE_DB)
+    return _indice
+
+
+def huella_perceptual(image_path):
+    """
+    Hash perceptual de la imagen (ver duplicados.py), o None si falla o si
+    la búsqueda de duplicados está desactivada.
+    """
+    if _indice_duplicados() is None:
+        return None
+    try:
+        import duplicados
+        return duplicados.phash(image_path)
+    except Exception as e:
+        if os.getenv('DEBUG_PWAT') == '1':
+            print(f"No se pudo calcular el hash perceptual: {e}")
+        return None
+
+
+def buscar_duplicado(huella, image_path, threshold=0.5):
+    """
+    Busca una imagen casi idéntica ya procesada cuyo resultado memoizado
+    siga vigente. La distancia de Hamming máxima se configura con
+    PWAT_DUPLICADOS_DISTANCIA (2 bits por defecto), y cada candidato se
+    confirma comparando los píxeles con `image_path`: la diferencia media a
+    256x256 no puede superar PWAT_DUPLICADOS_DIFERENCIA (4 de 255).
+
+    Returns:
+        dict: {'mascara', 'categorias', 'ruta_imagen', 'distancia'} o None.
+    """
+    if huella is None:
+        return None
+    indice = _indice_duplicados()
+    almacen = _memo_resultados()
+    if indice is None or almacen is None:
+        return None
+    try:
+        import duplicados
+        distancia = int(os.getenv('PWAT_DUPLICADOS_DISTANCIA', str(duplicados.DISTANCIA_MAXIMA)))
+        maxima = float(os.getenv('PWAT_DUPLICADOS_DIFERENCIA', str(duplicados.DIFERENCIA_MAXIMA)))
+        version = _version_modelos(almacen)
+        for candidato in indice.buscar(huella, distancia):
+            previo = almacen.buscar(candidato['hash_imagen'], version, threshold)
+            if previo is not None and _mismos_pixeles(image_path, candidato['ruta_imagen'],
+                                                      maxima):
+                previo.update(ruta_imagen=candidato['ruta_imagen'],
+                              distancia=candidato['distancia'])
+                return previo
+    except Exception as e:
+        if os.getenv('DEBUG_PWAT') == '1':
+            print(f"No se pudo consultar el índice de duplicados: {e}")
+    return None
+
+
+def _mismos_pixeles(image_path, ruta_candidato, maxima):
+    """Confirma un candidato por pHash comparando las imágenes a 256x256."""
+    try:
+        import duplicados
+        return duplicados.diferencia_media(image_path, ruta_candidato) <= maxima
+    except Exception as e:
+        if os.getenv('DEBUG_PWAT') == '1':
+            print(f"No se pudo comparar con {ruta_candidato}: {e}")
+        return False
+
+
+def registrar_huella(image_path, huella):
+    """Agrega la imagen al índice de duplicados."""
+    if huella is None:
+        return
+    indice = _indice_duplicados()
+    if indice is None:
+        return
+    try:
+        indice.agregar(huella, _clave_imagen(image_path), image_path)
+    except Exception as e:
+        if os.getenv('DEBUG_PWAT') == '1':
+            print(f"No se pudo registrar el hash perceptual: {e}")
+
+
+def reutilizar_duplicado(image_path, duplicado):
+    """
+    Reutiliza la máscara y las características de una imagen casi idéntica:
+    copia la máscara con el nombre que esperaría predecir_mascara() y
+    registra en el almacén de características el mismo vector.
+
+    Returns:
+        str: Ruta de la máscara de la nueva imagen.
+    """
+    ruta_mascara = reutilizar_resultado(image_path, duplicado)
+
+    if os.getenv('DEBUG_PWAT') == '1':
+        print(f"Reutilizando {duplicado['ruta_imagen']} "
+              f"(distancia {duplicado['distancia']})")
+    return ruta_mascara
+
+
+def reutilizar_resultado(image_path, previo):
+    """
+    Deja la máscara de un resultado previo (memoizado o de un duplicado) en
+    la ruta que esperaría predecir_mascara() para `image_path`, y registra
+    para esa imagen el vector de características de la imagen de origen.
+
+    Una imagen idéntica subida de nuevo llega con otro nombre y el backend
+    busca su máscara en MASKS_DIR/<nombre>.jpg, así que no basta con
+    devolver la máscara de la primera subida.
+
+    Returns:
+        str: Ruta de la máscara de `image_path`.
+    """
+    ruta_mascara = ruta_mascara_para(image_path)
+    if os.path.abspath(ruta_mascara) == os.path.abspath(previo['mascara']) or (
+            os.path.exists(ruta_mascara)
+            and os.path.samefile(ruta_mascara, previo['mascara'])):
+        return ruta_mascara
+    escribir_archivo(ruta_mascara, functools.partial(shutil.copyfile, previo['mascara']))
+    if previo.get('ruta_imagen'):
+        _copiar_caracteristicas(os.path.basename(previo['ruta_imagen']),
+                                os.path.basename(image_path))
+    return ruta_mascara
+
+
+def categorias_memoizadas(image_path, mask_path, threshold=0.5):
+    """
+    Categorías memoizadas de una imagen si `mask_path` tiene el mismo
+    contenido que la máscara del resultado guardado: tras un acierto,
+    reutilizar_resultado() la copió con el nombre de la imagen nueva y el
+    backend pide después `--mode predecir` con esa copia.
+
+    Returns:
+        dict: Categorías, o None si no hay resultado o la máscara difiere.
+    """
+    import filecmp
+
+    previo = buscar_resultado(image_path, threshold)
+    if previo is None or not os.path.exists(mask_path):
+        return None
+    try:
+        if filecmp.cmp(previo['mascara'], mask_path, shallow=False):
+            return previo['categorias']
+    except OSError as e:
+        if os.getenv('DEBUG_PWAT') == '1':
+            print(f"No se pudo comparar la máscara con {previo['mascara']}: {e}")
+    return None
+
+
+@con_version_fijada
+def mask_precit(image_path, imprimir=True):
+    with contabilizar_peticion('mask_precit'):
+        # Si no es una ruta absoluta, agregar el directorio IMGS_DIR
+        if not os.path.isabs(image_path):
+            full_image_path = os.path.join(IMGS_DIR, image_path)
+        else:
+            full_image_path = image_path
+
+        previo = buscar_resultado(full_image_path)
+        if previo is not None:
+            REUTILIZADOS.inc(origen='memo')
+            mask_path = reutilizar_resultado(full_image_path, previo)
+            if imprimir:
+                print(json.dumps(previo['categorias']))
+            return mask_path, previo['categorias']
+
+        # Copias recodificadas de una imagen ya procesada
+        huella = huella_perceptual(full_image_path)
+        duplicado = buscar_duplicado(huella, full_image_path)
+        if duplicado is not None:
+            REUTILIZADOS.inc(origen='duplicado')
+            mask_path = reutilizar_duplicado(full_image_path, duplicado)
+            resultados = duplicado['categorias']
+            if imprimir:
+                print(json.dumps(resultados))
+        else:
+            mask_path = predecir_mascara(full_image_path)
+            resultados = predecir(full_image_path, mask_path, imprimir=imprimir)
+        guardar_resultado(full_image_path, mask_path, resultados)
+        registrar_huella(full_image_path, huella)
+        return mask_path, resultados
+
+
+def vigilar(directorio=IMGS_DIR, max_concurrencia=2, intervalo=1.0, usar_inotify=True,
+            existentes=False):
+    """
+    Segmenta y puntúa en segundo plano cada imagen nueva de `directorio`,
+    dejando el resultado listo para que el backend lo obtenga al instante.
+
+    Args:
+        directorio (str): Directorio de subidas (por defecto IMGS_DIR).
+        max_concurrencia (int): Imágenes procesadas a la vez como máximo.
+        intervalo (float): Segundos entre comprobaciones del directorio.
+        usar_inotify (bool): Usar inotify (watchdog) si está disponible.
+        existentes (bool): Procesar también las imágenes que ya estaban en
+            `directorio` al arrancar.
+    """
+    import vigilante
+
+    calentar_modelos()
+    iniciar_recarga()
+    observador = vigilante.Vigilante(
+        directorio, lambda ruta: mask_precit(ruta, imprimir=False),
+        max_concurrencia=max_concurrencia, intervalo=intervalo,
+        usar_inotify=usar_inotify, procesar_existentes=existentes)
+    METRICAS.medidor('pwat_cola_vigilante', 'Imágenes detectadas aún sin procesar',
+                     lambda: observador.pendientes)
+    iniciar_metricas()
+    print(json.dumps({'vigilando': observador.directorio,
+                      'modo': observador.modo}), flush=True)
+    observador.ejecutar_por_siempre()
+
+
+def trabajo(manifiesto, ruta_diario=None, cada=10, max_intentos=3):
+    """
+    Procesa con mask_precit() todas las imágenes de un manifiesto como un
+    trabajo reanudable (ver trabajos.py). Volver a lanzarlo con el mismo
+    diario retoma desde el último punto de control.
+
+    Args:
+        manifiesto (str): Directorio, lista de rutas o JSONL.
+        ruta_diario (str): Diario de progreso (por defecto junto al
+            manifiesto, `<manifiesto>.diario.jsonl`).
+        cada (int): Elementos por escritura del diario.
+        max_intentos (int): Intentos por imagen antes de darla por fallida.
+
+    Returns:
+        dict: Resumen del trabajo.
+    """
+    import signal
+    import trabajos
+
+    # SIGTERM (redeploy) sale por finally y deja el diario sincronizado
+    signal.signal(signal.SIGTERM, lambda *args: sys.exit(143))
+
+    items = trabajos.leer_manifiesto(manifiesto, base=IMGS_DIR)
+    ruta_diario = ruta_diario or os.path.normpath(manifiesto) + '.diario.jsonl'
+    calentar_modelos()
+    iniciar_recarga()
+    iniciar_metricas()
+
+    def procesar(ruta):
+        mascara, categorias = mask_precit(ruta, imprimir=False)
+        return {'mascara': mascara, 'categorias': categorias}
+
+    # Un elemento se anota como hecho solo con su máscara ya en disco
+    return trabajos.ejecutar_trabajo(items, procesar, ruta_diario, cada=cada,
+                                     max_intentos=max_intentos,
+                                     antes_de_sincronizar=vaciar_escrituras)
+
+
+@con_version_fijada
+def atender_peticion(peticion):
+    """
+    Atiende una petición del modo servir (ver servidor.py) sin pasar por
+    IMGS_DIR: la imagen llega como bytes, arreglo o memoria compartida.
+
+    La máscara se codifica en memoria igual que save_mask() y se vuelve a
+    decodificar para PyRadiomics, de modo que las categorías coinciden con
+    las de mask_precit() sobre el mismo archivo. Con "guardar": true la
+    máscara y los NRRD se escriben además en segundo plano.
+
+    Returns:
+        dict: Campos de la respuesta ('categorias', 'mascara', ...).
+    """
+    import servidor
+
+    modo = peticion.get('modo', 'mask_precit')
+    if modo not in ('mask_precit', 'predecir_mascara', 'predecir'):
+        PETICIONES.inc(modo='servir', resultado='invalida')
+        raise servidor.PeticionInvalida(f"Modo no soportado: {modo}")
+    with contabilizar_peticion(f"servir_{modo}"):
+        umbral = float(peticion.get('umbral', 0.5))
+        imagen = servidor.cargar_fuente(peticion, 'imagen')
+        if imagen is None:
+            raise servidor.PeticionInvalida("Falta la imagen")
+        if isinstance(imagen, str) and not os.path.isabs(imagen):
+            imagen = os.path.join(IMGS_DIR, imagen)
+        nombre = peticion.get('nombre') or (
+            os.path.basename(imagen) if isinstance(imagen, str) else f"{peticion.get('id', 'imagen')}.jpg")
+        guardar = bool(peticion.get('guardar'))
+        respuesta = {}
+
+        if modo == 'predecir':
+            mascara = servidor.cargar_fuente(peticion, 'mascara')
+            if mascara is None:
+                raise servidor.PeticionInvalida("Falta la máscara")
+            if isinstance(mascara, str) and not os.path.isabs(mascara):
+                mascara = os.path.join(MASKS_DIR, mascara)
+        else:
+            prediccion, binaria = predecir_mascara_arreglo(imagen, threshold=umbral)
+            mascara = codificar_mascara(binaria)
+            if guardar:
+                ruta_mascara = ruta_mascara_para(nombre)
+                escribir_archivo(ruta_mascara, mascara)
+                guardar_probabilidad(prediccion, ruta_mascara)
+                respuesta['ruta_mascara'] = ruta_mascara
+            respuesta.update(servidor.entregar_mascara(
+                (binaria.squeeze() * 255).astype(np.uint8), peticion))
+
+        if modo != 'predecir_mascara':
+            gris = imagen_gris(imagen)
+            gris_mascara = imagen_gris(mascara)
+            if gris is None or gris_mascara is None:
+                raise servidor.PeticionInvalida("No se pudo decodificar la imagen o la máscara")
+            rutas_nrrd = None
+            if guardar:
+                base, _ = os.path.splitext(nombre)
+                rutas_nrrd = (os.path.join(IMGS_DIR, f"{base}.nrrd"),
+                              os.path.join(predictions_dir, f"{base}.nrrd"))
+            respuesta['categorias'] = predecir_arreglos(
+                gris, gris_mascara, nombre, imprimir=False, rutas_nrrd=rutas_nrrd)
+        return respuesta
+
+
+def servir(ruta_socket=None, max_concurrencia=1):
+    """
+    Proceso de larga duración: atiende peticiones JSON por línea en stdin
+    (respuestas en stdout) o en un socket Unix si se indica `ruta_socket`.
+    """
+    import servidor
+
+    calentar_modelos()
+    iniciar_recarga()
+    iniciar_metricas()
+    atencion = servidor.Servidor(atender_peticion, max_concurrencia=max_concurrencia)
+    print(json.dumps({'sirviendo': ruta_socket or 'stdin',
+                      'listo': estado_modelos()['listo']}), flush=True)
+    if ruta_socket:
+        atencion.atender_socket(ruta_socket)
+    else:
+        atencion.atender_flujo(sys.stdin, sys.stdout)
+    vaciar_escrituras()
 
-    mask_path = predecir_mascara(full_image_path)
-    predecir(full_image_path, mask_path)
 
 # mask_precit('./predicts/imgs/mar4.jpg')
 # predecir_mascara('./predicts/imgs/mar4 copy.jpg')
@@ -649,15 +1721,97 @@ if __name__ == "__main__":
 
     parser = argparse.ArgumentParser()
     parser.add_argument("--mode", required=True,
-                        choices=["mask_precit", "predecir_mascara", "predecir"])
-    parser.add_argument("--image_path", required=True)
+                        choices=["mask_precit", "predecir_mascara", "predecir",
+                                 "estado", "vigilar", "segmentar_lote", "servir",
+                                 "trabajo"])
+    parser.add_argument("--image_path", required=False)
     parser.add_argument("--mask_path", required=False)
+    parser.add_argument("--calentar", action="store_true",
+                        help="Calentar los modelos antes de atender la petición")
+    parser.add_argument("--dos_etapas", action="store_true",
+                        help="Segmentar en dos etapas (también PWAT_DOS_ETAPAS=1)")
+    parser.add_argument("--procesos_radiomica", type=int, default=None,
+                        help="Procesos para calcular en paralelo las clases de "
+                             "características (también PWAT_RADIOMICA_PROCESOS)")
+    parser.add_argument("--concurrencia", type=int, default=2,
+                        help="Modos vigilar y servir: imágenes procesadas a la vez")
+    parser.add_argument("--intervalo", type=float, default=1.0,
+                        help="Modo vigilar: segundos entre comprobaciones")
+    parser.add_argument("--sondeo", action="store_true",
+                        help="Modo vigilar: sondear en lugar de usar inotify")
+    parser.add_argument("--existentes", action="store_true",
+                        help="Modo vigilar: procesar también las imágenes ya presentes")
+    parser.add_argument("--socket", default=None,
+                        help="Modo servir: socket Unix en lugar de stdin/stdout")
+    parser.add_argument("--manifiesto", default=None,
+                        help="Modo trabajo: directorio, lista de rutas o JSONL")
+    parser.add_argument("--diario", default=None,
+                        help="Modo trabajo: diario de progreso")
+    parser.add_argument("--cada", type=int, default=10,
+                        help="Modo trabajo: imágenes por punto de control")
+    parser.add_argument("--reintentos", type=int, default=3,
+                        help="Modo trabajo: intentos por imagen")
+    parser.add_argument("--metricas", type=int, default=None, metavar="PUERTO",
+                        help="Modos vigilar, servir y trabajo: endpoint /metrics "
+                             "en este puerto (también PWAT_METRICAS_PUERTO)")
+    parser.add_argument("--lote", type=int, default=16,
+                        help="Modo segmentar_lote: imágenes por pasada del modelo "
+                             "(--image_path puede ser un paquete, ver paquete.py)")
+    recursos.agregar_argumentos(parser)
     args = parser.parse_args()
 
-    if args.mode == "mask_precit":
+    if args.mode not in ("estado", "vigilar", "segmentar_lote", "servir",
+                         "trabajo") and not args.image_path:
+        parser.error("--image_path es obligatorio para el modo " + args.mode)
+    if args.mode == "trabajo" and not args.manifiesto:
+        parser.error("--manifiesto es obligatorio para el modo trabajo")
+
+    if args.dos_etapas:
+        # Por entorno, para que la memoización distinga ambos modos
+        os.environ['PWAT_DOS_ETAPAS'] = '1'
+    if args.procesos_radiomica is not None:
+        os.environ['PWAT_RADIOMICA_PROCESOS'] = str(args.procesos_radiomica)
+    if args.metricas is not None:
+        os.environ['PWAT_METRICAS_PUERTO'] = str(args.metricas)
+
+    if args.calentar or os.getenv('PWAT_CALENTAR') == '1':
+        if args.mode in ("mask_precit", "predecir_mascara", "predecir"):
+            # Solo si hay que inferir: un resultado memoizado no carga los modelos
+            _calentar_al_cargar = True
+        else:
+            calentar_modelos()
+
+    if args.mode == "estado":
+        # Informe de disponibilidad: tiempos de carga y calentamiento por modelo
+        print(json.dumps(calentar_modelos()))
+    elif args.mode == "vigilar":
+        vigilar(args.image_path or IMGS_DIR, max_concurrencia=args.concurrencia,
+                intervalo=args.intervalo, usar_inotify=not args.sondeo,
+                existentes=args.existentes)
+    elif args.mode == "trabajo":
+        print(json.dumps(trabajo(args.manifiesto, args.diario, cada=args.cada,
+                                 max_intentos=args.reintentos)))
+    elif args.mode == "servir":
+        servir(args.socket, max_concurrencia=args.concurrencia)
+    elif args.mode == "segmentar_lote":
+        # --image_path es aquí un directorio o un paquete (por defecto IMGS_DIR)
+        from paquete import es_paquete
+        from preprocesamiento import archivos_por_nombre
+        directorio = os.path.join(IMGS_DIR, args.image_path or '')
+        if es_paquete(directorio):
+            mascaras = predecir_mascaras_paquete(directorio, tamano_lote=args.lote)
+        else:
+            rutas = list(archivos_por_nombre(directorio).values())
+            mascaras = predecir_mascaras_lote(rutas, tamano_lote=args.lote)
+        print(json.dumps({'mascaras': sum(m is not None for m in mascaras),
+                          'errores': sum(m is None for m in mascaras)}))
+    elif args.mode == "mask_precit":
         mask_precit(args.image_path)
     elif args.mode == "predecir_mascara":
-        result = predecir_mascara(os.path.join(IMGS_DIR, args.image_path))
+        image_path = os.path.join(IMGS_DIR, args.image_path)
+        previo = buscar_resultado(image_path)
+        result = (reutilizar_resultado(image_path, previo) if previo
+                  else predecir_mascara(image_path))
         print(f"Mask saved at: {result}")
     elif args.mode == "predecir":
         if not args.mask_path:
@@ -666,5 +1820,14 @@ if __name__ == "__main__":
         if not args.image_path:
             raise ValueError(
                 "Favor de proporcionar la ruta de la imagen con --image_path")
-        predecir(os.path.join(IMGS_DIR, args.image_path),
-                 os.path.join(MASKS_DIR, args.mask_path))
+        image_path = os.path.join(IMGS_DIR, args.image_path)
+        mask_path = os.path.join(MASKS_DIR, args.mask_path)
+        categorias = categorias_memoizadas(image_path, mask_path)
+        if categorias is not None:
+            print(json.dumps(categorias))
+        else:
+            predecir(image_path, mask_path)
+
+    # Las máscaras y los NRRD deben estar en disco antes de que el backend
+    # los lea tras terminar el proceso
+    vaciar_escrituras()
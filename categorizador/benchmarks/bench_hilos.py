@@ -0,0 +1,134 @@
+"""
+Compara el rendimiento de varios procesos PWAT concurrentes con y sin
+perfil de hilos (ver recursos.py).
+
+Para cada cantidad de procesos se lanzan dos rondas: una con los valores
+por defecto de cada librería y otra repartiendo los núcleos disponibles
+entre los procesos (--hilos = núcleos / procesos, con afinidad opcional).
+Cada proceso carga los modelos, espera a que todos estén listos y ejecuta
+`mask_precit` sobre la misma imagen `--repeticiones` veces.
+
+Como la imagen se repite, sin --con_cache los trabajadores corren con
+PWAT_CACHE=0, PWAT_FEATURE_STORE=0 y PWAT_ESCRITOR=0 (igual que
+benchmarks/carga.py): cada repetición es una inferencia completa y no una
+consulta a la memoización. Las máscaras van a un directorio temporal en
+lugar de predicts/.
+
+Uso:
+    python benchmarks/bench_hilos.py --image_path foto.jpg --procesos 1 2 4
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+CATEGORIZADOR_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def trabajador(args):
+    """Ejecuta las repeticiones dentro de un proceso con PWAT ya cargado."""
+    sys.path.insert(0, CATEGORIZADOR_DIR)
+    # PWAT lee --hilos/--afinidad de sys.argv al importarse
+    with contextlib.redirect_stdout(io.StringIO()):
+        import PWAT
+        PWAT.calentar_modelos()
+    # No ensuciar las máscaras reales con las del benchmark
+    PWAT.predictions_dir = tempfile.mkdtemp(prefix='bench_hilos_')
+
+    print('listo', flush=True)
+    sys.stdin.readline()
+
+    inicio = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(args.repeticiones):
+            PWAT.mask_precit(os.path.abspath(args.image_path))
+    fin = time.time()
+    print(json.dumps({'inicio': inicio, 'fin': fin,
+                      'operaciones': args.repeticiones}), flush=True)
+
+
+def ronda(args, procesos, con_perfil):
+    """Lanza `procesos` trabajadores a la vez y mide el rendimiento agregado."""
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(
+        os, 'sched_getaffinity') else list(range(os.cpu_count() or 1))
+    hilos = max(1, len(cpus) // procesos)
+
+    entorno = dict(os.environ)
+    if not args.con_cache:
+        entorno.update({'PWAT_CACHE': '0', 'PWAT_FEATURE_STORE': '0',
+                        'PWAT_ESCRITOR': '0'})
+
+    hijos = []
+    for indice in range(procesos):
+        comando = [sys.executable, os.path.abspath(__file__), '--trabajador',
+                   '--image_path', args.image_path,
+                   '--repeticiones', str(args.repeticiones)]
+        if con_perfil:
+            comando += ['--hilos', str(hilos)]
+            if args.fijar_nucleos:
+                propias = cpus[indice * hilos:(indice + 1) * hilos] or cpus
+                comando += ['--afinidad', ','.join(str(c) for c in propias)]
+        hijos.append(subprocess.Popen(
+            comando, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+            env=entorno))
+
+    # Barrera: todos los procesos deben haber cargado los modelos
+    for hijo in hijos:
+        if hijo.stdout.readline().strip() != 'listo':
+            raise RuntimeError('Un trabajador terminó antes de estar listo')
+    for hijo in hijos:
+        hijo.stdin.write('go\n')
+        hijo.stdin.flush()
+
+    informes = []
+    for hijo in hijos:
+        salida, _ = hijo.communicate()
+        if hijo.returncode != 0:
+            raise RuntimeError(f'Trabajador falló con código {hijo.returncode}')
+        informes.append(json.loads(salida.strip().splitlines()[-1]))
+
+    duracion = max(i['fin'] for i in informes) - min(i['inicio'] for i in informes)
+    operaciones = sum(i['operaciones'] for i in informes)
+    return {
+        'procesos': procesos,
+        'perfil': {'hilos': hilos, 'afinidad': args.fijar_nucleos} if con_perfil else None,
+        'operaciones': operaciones,
+        'segundos': round(duracion, 3),
+        'imagenes_por_segundo': round(operaciones / duracion, 3) if duracion else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--image_path', required=True)
+    parser.add_argument('--procesos', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument('--repeticiones', type=int, default=10)
+    parser.add_argument('--fijar_nucleos', action='store_true',
+                        help='Fijar cada proceso a su propio bloque de núcleos')
+    parser.add_argument('--con_cache', action='store_true',
+                        help='Dejar activas la memoización y el almacén de características')
+    parser.add_argument('--trabajador', action='store_true',
+                        help=argparse.SUPPRESS)
+    args, _ = parser.parse_known_args()
+
+    if args.trabajador:
+        trabajador(args)
+        return
+
+    resultados = []
+    for procesos in args.procesos:
+        for con_perfil in (False, True):
+            resultado = ronda(args, procesos, con_perfil)
+            resultados.append(resultado)
+            print(json.dumps(resultado), file=sys.stderr)
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == '__main__':
+    main()
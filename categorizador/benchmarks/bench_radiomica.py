@@ -0,0 +1,98 @@
+"""
+Latencia de la extracción radiómica de una imagen, en serie y con las
+clases de características repartidas en procesos (ver radiomica.py).
+
+La entrada es una ROI sintética de 256x256 (textura aleatoria suavizada con
+una herida elíptica), la misma resolución a la que PWAT.py lleva cada par
+imagen/máscara. Antes de medir se calienta el pool, y se comprueba que el
+vector en paralelo es idéntico al de la extracción en serie.
+
+Uso:
+    python benchmarks/bench_radiomica.py --procesos 2 4 7 --repeticiones 20 \\
+        [--image_path foto.jpg --mask_path mascara.jpg]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+CATEGORIZADOR_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CATEGORIZADOR_DIR)
+
+import cv2  # noqa: E402
+import numpy as np  # noqa: E402
+
+import radiomica  # noqa: E402
+
+
+def roi_sintetica(semilla=0, lado=256):
+    """Imagen gris con textura y máscara elíptica, ambas uint8 (lado, lado)."""
+    rng = np.random.default_rng(semilla)
+    ruido = rng.integers(0, 256, (lado, lado), dtype=np.uint8)
+    imagen = cv2.GaussianBlur(ruido, (7, 7), 2)
+    mascara = np.zeros((lado, lado), dtype=np.uint8)
+    cv2.ellipse(mascara, (lado // 2, lado // 2), (lado // 3, lado // 4), 20, 0, 360, 1, -1)
+    return imagen, mascara
+
+
+def medir(imagen, mascara, procesos, repeticiones):
+    """Latencias en milisegundos de `repeticiones` extracciones."""
+    latencias = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        radiomica.ejecutar_extractor(imagen, mascara, procesos=procesos)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    return latencias
+
+
+def resumen(latencias):
+    ordenadas = sorted(latencias)
+    return {
+        'p50_ms': round(statistics.median(ordenadas), 2),
+        'p95_ms': round(ordenadas[min(len(ordenadas) - 1, int(0.95 * len(ordenadas)))], 2),
+        'media_ms': round(statistics.fmean(ordenadas), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--procesos', type=int, nargs='+', default=[2, 4, 7])
+    parser.add_argument('--repeticiones', type=int, default=20)
+    parser.add_argument('--image_path', default=None)
+    parser.add_argument('--mask_path', default=None)
+    parser.add_argument('--informe', default=None, help='Archivo JSON de salida')
+    args = parser.parse_args()
+
+    if args.image_path and args.mask_path:
+        imagen, mascara = radiomica.preparar_entradas(
+            cv2.imread(args.image_path, cv2.IMREAD_GRAYSCALE),
+            cv2.imread(args.mask_path, cv2.IMREAD_GRAYSCALE))
+    else:
+        imagen, mascara = roi_sintetica()
+
+    referencia = radiomica.ejecutar_extractor(imagen, mascara, procesos=0)
+    serie = resumen(medir(imagen, mascara, 0, args.repeticiones))
+    informe = {'roi_pixeles': int(mascara.sum()), 'grupos': len(radiomica.grupos_de_clases()),
+               'cpus': os.cpu_count(), 'serie': serie, 'paralelo': {}}
+
+    for procesos in args.procesos:
+        # Calentamiento: crea el pool e importa en los trabajadores
+        resultado = radiomica.ejecutar_extractor(imagen, mascara, procesos=procesos)
+        if list(resultado) != list(referencia) or any(
+                not np.array_equal(np.asarray(resultado[k]), np.asarray(referencia[k]))
+                for k in referencia if not k.startswith('diagnostics_')):
+            raise RuntimeError(f'El vector con {procesos} procesos difiere del de la extracción en serie')
+        medida = resumen(medir(imagen, mascara, procesos, args.repeticiones))
+        medida['aceleracion_p50'] = round(serie['p50_ms'] / medida['p50_ms'], 2)
+        informe['paralelo'][str(procesos)] = medida
+
+    if args.informe:
+        with open(args.informe, 'w', encoding='utf-8') as f:
+            json.dump(informe, f, indent=2)
+    print(json.dumps(informe, indent=2))
+
+
+if __name__ == '__main__':
+    main()
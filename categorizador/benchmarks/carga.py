@@ -0,0 +1,376 @@
+"""
+Generador de carga local para PWAT.py.
+
+Reproduce un conjunto de pares imagen/máscara contra la CLI de PWAT, igual
+que lo hacen los controladores de Node (un proceso por petición), o con
+--servir contra un único proceso `--mode servir`, con concurrencia y tasa
+de peticiones configurables. Registra latencias
+p50/p95/p99, rendimiento, tasa de error y RSS pico, y escribe un informe
+JSON.
+
+Con --modelos_falsos se usan los modelos de benchmarks/modelos_falsos.py,
+por lo que puede ejecutarse en cualquier máquina de CI sin TensorFlow ni
+los artefactos entrenados.
+
+Uso:
+    python benchmarks/carga.py --imgs predicts/imgs --masks predicts/masks \\
+        --modo predecir --concurrencia 4 --tasa 2 --peticiones 100 \\
+        --informe carga.json [--modelos_falsos]
+"""
+import argparse
+import base64
+import itertools
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CATEGORIZADOR_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, CATEGORIZADOR_DIR)
+
+from preprocesamiento import archivos_por_nombre  # noqa: E402
+
+
+def percentil(valores_ordenados, p):
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not valores_ordenados:
+        return None
+    rango = max(1, int(-(-p * len(valores_ordenados) // 100)))
+    return valores_ordenados[min(rango, len(valores_ordenados)) - 1]
+
+
+def cargar_pares(dir_imgs, dir_masks=None):
+    """
+    Empareja imágenes y máscaras por nombre base.
+
+    Returns:
+        list: Tuplas (ruta_imagen, ruta_mascara|None) con rutas absolutas.
+    """
+    imagenes = archivos_por_nombre(os.path.abspath(dir_imgs))
+    if not dir_masks:
+        return [(ruta, None) for ruta in imagenes.values()]
+    mascaras = archivos_por_nombre(os.path.abspath(dir_masks))
+    return [(ruta, mascaras[base]) for base, ruta in imagenes.items()
+            if base in mascaras]
+
+
+class ObjetivoCLI:
+    """
+    Ejecuta cada petición como un proceso `PWAT.py --mode ...` nuevo.
+
+    Args:
+        modo (str): 'mask_precit', 'predecir_mascara' o 'predecir'.
+        modelos_falsos (bool): Usar los modelos de reemplazo livianos.
+        entorno (dict): Variables de entorno extra para los procesos.
+        directorio (str): Directorio de trabajo de los procesos.
+    """
+
+    def __init__(self, modo, modelos_falsos=False, entorno=None, directorio=None):
+        self.modo = modo
+        script = os.path.join(BENCH_DIR, 'modelos_falsos.py') if modelos_falsos \
+            else os.path.join(CATEGORIZADOR_DIR, 'PWAT.py')
+        self.base = [sys.executable, script, '--mode', modo]
+        self.entorno = dict(os.environ, **(entorno or {}))
+        self.directorio = directorio or CATEGORIZADOR_DIR
+
+    def iniciar(self):
+        return self
+
+    def detener(self):
+        pass
+
+    def ejecutar(self, par):
+        ruta_imagen, ruta_mascara = par
+        comando = self.base + ['--image_path', ruta_imagen]
+        if self.modo == 'predecir':
+            comando += ['--mask_path', ruta_mascara]
+        proceso = subprocess.run(comando, capture_output=True, text=True,
+                                 env=self.entorno, cwd=self.directorio)
+        if proceso.returncode != 0:
+            raise RuntimeError(proceso.stderr.strip().splitlines()[-1:]
+                               or f'código {proceso.returncode}')
+        if self.modo != 'predecir_mascara':
+            # Igual que el backend: debe haber una línea JSON en la salida
+            lineas = [l for l in proceso.stdout.splitlines() if l.startswith('{')]
+            if not lineas:
+                raise RuntimeError('La salida no contiene JSON')
+            json.loads(lineas[-1])
+
+    def rss_pico_kb(self):
+        """RSS máximo alcanzado por cualquiera de los procesos hijos."""
+        return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+
+class ObjetivoServidor:
+    """
+    Envía las peticiones a un único proceso `PWAT.py --mode servir` por
+    stdin, con la imagen en base64, y empareja las respuestas por 'id'.
+    """
+
+    def __init__(self, modo, modelos_falsos=False, entorno=None, directorio=None,
+                 concurrencia=1):
+        self.modo = modo
+        script = os.path.join(BENCH_DIR, 'modelos_falsos.py') if modelos_falsos \
+            else os.path.join(CATEGORIZADOR_DIR, 'PWAT.py')
+        self.comando = [sys.executable, script, '--mode', 'servir',
+                        '--concurrencia', str(concurrencia)]
+        self.entorno = dict(os.environ, **(entorno or {}))
+        self.directorio = directorio or CATEGORIZADOR_DIR
+        self._contador = itertools.count()
+        self._esperando = {}
+        self._bloqueo = threading.Lock()
+        self._proceso = None
+
+    def iniciar(self):
+        self._proceso = subprocess.Popen(
+            self.comando, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            text=True, env=self.entorno, cwd=self.directorio)
+        # La primera línea JSON indica que los modelos están cargados
+        for linea in self._proceso.stdout:
+            if linea.startswith('{') and 'sirviendo' in linea:
+                break
+        else:
+            raise RuntimeError('El proceso servir terminó sin arrancar')
+        threading.Thread(target=self._leer, daemon=True).start()
+        return self
+
+    def _leer(self):
+        for linea in self._proceso.stdout:
+            if not linea.startswith('{'):
+                continue
+            respuesta = json.loads(linea)
+            with self._bloqueo:
+                espera = self._esperando.pop(respuesta.get('id'), None)
+            if espera is not None:
+                espera[1].update(respuesta)
+                espera[0].set()
+
+    def ejecutar(self, par):
+        ruta_imagen, ruta_mascara = par
+        identificador = next(self._contador)
+        peticion = {'id': identificador, 'modo': self.modo,
+                    'imagen': _base64(ruta_imagen)}
+        if self.modo == 'predecir':
+            peticion['mascara'] = _base64(ruta_mascara)
+        evento, respuesta = threading.Event(), {}
+        with self._bloqueo:
+            self._esperando[identificador] = (evento, respuesta)
+            self._proceso.stdin.write(json.dumps(peticion) + '\n')
+            self._proceso.stdin.flush()
+        if not evento.wait(timeout=600):
+            raise RuntimeError('Sin respuesta del proceso servir')
+        if not respuesta.get('ok'):
+            raise RuntimeError(respuesta.get('error'))
+
+    def detener(self):
+        if self._proceso is not None:
+            self._proceso.stdin.close()
+            self._proceso.wait()
+
+    def rss_pico_kb(self):
+        """RSS máximo del proceso servir (VmHWM), que sigue vivo al medir."""
+        try:
+            with open(f'/proc/{self._proceso.pid}/status') as f:
+                for linea in f:
+                    if linea.startswith('VmHWM:'):
+                        return int(linea.split()[1])
+        except (OSError, AttributeError):
+            pass
+        return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+
+def _base64(ruta):
+    with open(ruta, 'rb') as f:
+        return base64.b64encode(f.read()).decode('ascii')
+
+
+def ejecutar_carga(objetivo, pares, concurrencia=1, tasa=0.0, peticiones=None,
+                   duracion=None):
+    """
+    Lanza peticiones contra `objetivo` y mide el resultado.
+
+    Con `tasa` > 0 las peticiones se programan a intervalos fijos (carga de
+    lazo abierto) y la latencia se mide desde el instante programado, de
+    modo que la espera en cola también cuenta. Con `tasa` = 0 cada
+    trabajador lanza la siguiente petición al terminar la anterior.
+
+    Args:
+        objetivo: Objeto con ejecutar(par) y rss_pico_kb().
+        pares (list): Pares imagen/máscara; se recorren en ciclo.
+        concurrencia (int): Peticiones simultáneas como máximo.
+        tasa (float): Peticiones por segundo (0 = tan rápido como se pueda).
+        peticiones (int): Número total de peticiones.
+        duracion (float): Segundos de prueba (si no se da `peticiones`).
+
+    Returns:
+        dict: Informe con latencias, rendimiento, errores y RSS.
+    """
+    if not pares:
+        raise ValueError('No hay pares imagen/máscara para reproducir')
+    if peticiones is None and duracion is None:
+        peticiones = len(pares)
+
+    latencias = []
+    errores = []
+    bloqueo = threading.Lock()
+    ciclo = itertools.cycle(pares)
+
+    def una(par, programada):
+        try:
+            objetivo.ejecutar(par)
+            exito = True
+        except Exception as e:
+            exito = False
+            error = str(e)
+        fin = time.perf_counter()
+        with bloqueo:
+            if exito:
+                latencias.append(fin - programada)
+            else:
+                errores.append({'imagen': os.path.basename(par[0]), 'error': error})
+
+    inicio = time.perf_counter()
+    enviadas = 0
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        cupos = threading.BoundedSemaphore(concurrencia) if tasa <= 0 else None
+        while True:
+            if peticiones is not None and enviadas >= peticiones:
+                break
+            ahora = time.perf_counter()
+            if duracion is not None and ahora - inicio >= duracion:
+                break
+            if tasa > 0:
+                programada = inicio + enviadas / tasa
+                if programada > ahora:
+                    time.sleep(programada - ahora)
+            else:
+                cupos.acquire()
+                programada = time.perf_counter()
+
+            futuro = pool.submit(una, next(ciclo), programada)
+            if cupos is not None:
+                futuro.add_done_callback(lambda _: cupos.release())
+            enviadas += 1
+    total = time.perf_counter() - inicio
+
+    ordenadas = sorted(latencias)
+    completadas = len(latencias) + len(errores)
+    return {
+        'peticiones': completadas,
+        'exitosas': len(latencias),
+        'errores': len(errores),
+        'tasa_error': len(errores) / completadas if completadas else 0.0,
+        'duracion_s': round(total, 3),
+        'rendimiento_rps': round(len(latencias) / total, 3) if total else None,
+        'latencia_ms': {
+            'p50': _ms(percentil(ordenadas, 50)),
+            'p95': _ms(percentil(ordenadas, 95)),
+            'p99': _ms(percentil(ordenadas, 99)),
+            'media': _ms(sum(ordenadas) / len(ordenadas)) if ordenadas else None,
+            'max': _ms(ordenadas[-1]) if ordenadas else None,
+        },
+        'rss_pico_mb': round(objetivo.rss_pico_kb() / 1024.0, 1),
+        'muestra_errores': errores[:10],
+    }
+
+
+def _ms(segundos):
+    return None if segundos is None else round(segundos * 1000.0, 2)
+
+
+def copiar_pares(pares, destino):
+    """
+    Copia los pares al espacio de trabajo: `predecir` escribe los NRRD junto
+    a la imagen y no se quiere ensuciar el conjunto original.
+    """
+    copias = []
+    for subdir in ('imgs', 'masks'):
+        os.makedirs(os.path.join(destino, subdir), exist_ok=True)
+    for par in pares:
+        nuevo = []
+        for subdir, ruta in zip(('imgs', 'masks'), par):
+            if ruta is None:
+                nuevo.append(None)
+                continue
+            copia = os.path.join(destino, subdir, os.path.basename(ruta))
+            shutil.copy2(ruta, copia)
+            nuevo.append(copia)
+        copias.append(tuple(nuevo))
+    return copias
+
+
+def crear_objetivo(args, directorio):
+    """Construye el objetivo indicado en la línea de comandos."""
+    entorno = {}
+    if not args.con_cache:
+        # Sin memoización: cada petición recorre el pipeline completo,
+        # escrituras incluidas
+        entorno.update({'PWAT_CACHE': '0', 'PWAT_FEATURE_STORE': '0',
+                        'PWAT_ESCRITOR': '0'})
+    if args.latencia_falsa_ms:
+        entorno['PWAT_FALSO_LATENCIA_MS'] = str(args.latencia_falsa_ms)
+    if args.servir:
+        return ObjetivoServidor(args.modo, args.modelos_falsos, entorno,
+                                directorio, concurrencia=args.concurrencia)
+    return ObjetivoCLI(args.modo, args.modelos_falsos, entorno, directorio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--imgs', required=True, help='Directorio de imágenes')
+    parser.add_argument('--masks', default=None,
+                        help='Directorio de máscaras (obligatorio en modo predecir)')
+    parser.add_argument('--modo', default='mask_precit',
+                        choices=['mask_precit', 'predecir_mascara', 'predecir'])
+    parser.add_argument('--concurrencia', type=int, default=1)
+    parser.add_argument('--tasa', type=float, default=0.0,
+                        help='Peticiones por segundo (0 = lazo cerrado)')
+    parser.add_argument('--peticiones', type=int, default=None)
+    parser.add_argument('--duracion', type=float, default=None,
+                        help='Segundos de prueba si no se indica --peticiones')
+    parser.add_argument('--informe', default=None, help='Archivo JSON de salida')
+    parser.add_argument('--modelos_falsos', action='store_true')
+    parser.add_argument('--latencia_falsa_ms', type=float, default=0.0)
+    parser.add_argument('--servir', action='store_true',
+                        help='Un proceso --mode servir en lugar de uno por petición')
+    parser.add_argument('--con_cache', action='store_true',
+                        help='Permitir memoización, almacén de características y escritor en segundo plano')
+    args = parser.parse_args()
+
+    if args.modo == 'predecir' and not args.masks:
+        parser.error('--masks es obligatorio en modo predecir')
+
+    pares = cargar_pares(args.imgs, args.masks)
+    with tempfile.TemporaryDirectory() as temporal:
+        # PWAT.py escribe las máscaras en ../backend/... relativo al cwd
+        directorio = os.path.join(temporal, 'cwd')
+        os.makedirs(directorio)
+        pares_trabajo = copiar_pares(pares, os.path.join(temporal, 'entrada'))
+        objetivo = crear_objetivo(args, directorio).iniciar()
+        try:
+            informe = ejecutar_carga(objetivo, pares_trabajo, args.concurrencia,
+                                     args.tasa, args.peticiones, args.duracion)
+        finally:
+            objetivo.detener()
+
+    informe['configuracion'] = {
+        'modo': args.modo, 'concurrencia': args.concurrencia, 'tasa': args.tasa,
+        'pares': len(pares), 'modelos_falsos': args.modelos_falsos,
+        'con_cache': args.con_cache, 'servir': args.servir,
+    }
+    texto = json.dumps(informe, indent=2)
+    if args.informe:
+        with open(args.informe, 'w', encoding='utf-8') as f:
+            f.write(texto)
+    print(texto)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""
+Modelos de reemplazo livianos para ejecutar PWAT.py sin TensorFlow,
+pyradiomics, xgboost ni los artefactos entrenados.
+
+Igual que los falsos de tests/test_pwat.py, se registran módulos en
+sys.modules antes de importar PWAT.py. TensorFlow, pyradiomics, xgboost y
+joblib.load se reemplazan siempre; las demás dependencias livianas (nrrd, sklearn,
+SimpleITK, ...) solo si no están instaladas. numpy, pandas, PIL y OpenCV
+deben estar disponibles: la carga y el preprocesamiento de imágenes, el
+guardado de máscaras y el flujo de la CLI se ejecutan de verdad.
+
+PWAT_FALSO_LATENCIA_MS agrega una espera fija a cada inferencia de
+segmentación para simular el costo del modelo real.
+
+Uso (lo invoca benchmarks/carga.py):
+    python benchmarks/modelos_falsos.py --mode mask_precit --image_path foto.jpg
+"""
+import importlib
+import os
+import runpy
+import sys
+import time
+import types
+
+CATEGORIZADOR_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _latencia():
+    milisegundos = float(os.getenv('PWAT_FALSO_LATENCIA_MS', '0'))
+    if milisegundos > 0:
+        time.sleep(milisegundos / 1000.0)
+
+
+class SegmentadorFalso:
+    """Devuelve un disco centrado como mapa de probabilidad."""
+
+    def predict(self, imagen, verbose=0):
+        import numpy as np
+        _latencia()
+        lote, alto, ancho = imagen.shape[:3]
+        yy, xx = np.mgrid[:alto, :ancho]
+        radio = min(alto, ancho) / 4
+        disco = ((yy - alto / 2) ** 2 + (xx - ancho / 2) ** 2) <= radio ** 2
+        mapa = np.where(disco, 0.9, 0.1).astype(np.float32)
+        return np.broadcast_to(mapa[None, :, :, None], (lote, alto, ancho, 1)).copy()
+
+
+class ClasificadorFalso:
+    """Clasificador que siempre predice la misma clase."""
+
+    n_features_in_ = 4
+
+    def __init__(self, clase):
+        self.clase = clase
+
+    def predict(self, datos):
+        import numpy as np
+        return np.full(len(datos), self.clase)
+
+    def predict_proba(self, datos):
+        import numpy as np
+        probabilidades = np.zeros((len(datos), 5))
+        probabilidades[:, self.clase - 1] = 1.0
+        return probabilidades
+
+
+class ExtractorFalso:
+    """Reemplazo de RadiomicsFeatureExtractor con características fijas."""
+
+    def __init__(self, *args, **kwargs):
+        self.enabledFeatures = {'shape2D': [], 'firstorder': [], 'glcm': []}
+
+    def disableAllFeatures(self):
+        self.enabledFeatures = {}
+
+    def enableFeatureClassByName(self, clase):
+        self.enabledFeatures[clase] = []
+
+    def execute(self, imagen, mascara):
+        return {
+            'diagnostics_Versions_PyRadiomics': 'falso',
+            'diagnostics_Image-original_Mean': 0.0,
+            'diagnostics_Mask-original_VoxelNum': 1,
+            'diagnostics_Mask-original_VolumeNum': 1,
+            'original_firstorder_Mean': 1.0,
+            'original_firstorder_Energy': 2.0,
+            'original_shape2D_Perimeter': 3.0,
+            'original_glcm_Contrast': 4.0,
+        }
+
+
+def _modulo_si_falta(nombre, **atributos):
+    try:
+        importlib.import_module(nombre)
+    except ImportError:
+        _modulo(nombre, **atributos)
+
+
+def _modulo(nombre, **atributos):
+    modulo = types.ModuleType(nombre)
+    modulo.__dict__.update(atributos)
+    sys.modules[nombre] = modulo
+    return modulo
+
+
+def instalar():
+    """Registra los módulos falsos en sys.modules."""
+    identidad = lambda valor, *args, **kwargs: valor
+
+    class Capa:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def build(self, input_shape):
+            return None
+
+        def get_config(self):
+            return {}
+
+    backend = _modulo(
+        'tensorflow.keras.backend', flatten=identidad, sum=identidad,
+        greater=identidad, cast=identidad, round=identidad, clip=identidad,
+        pow=identidad, mean=identidad, epsilon=lambda: 1e-7, floatx=lambda: 'float32')
+    losses = _modulo('tensorflow.keras.losses',
+                     BinaryCrossentropy=lambda: (lambda a, b: 0.0))
+    modelos = _modulo('tensorflow.keras.models',
+                      load_model=lambda *a, **k: SegmentadorFalso())
+    capas = _modulo('tensorflow.keras.layers', Layer=Capa, Conv2D=Capa,
+                    Multiply=Capa)
+    imagen = _modulo('tensorflow.keras.preprocessing.image',
+                     load_img=identidad, img_to_array=identidad)
+    preprocesado = _modulo('tensorflow.keras.preprocessing', image=imagen)
+    keras = _modulo('tensorflow.keras', backend=backend, losses=losses,
+                    models=modelos, layers=capas, preprocessing=preprocesado)
+    _modulo('tensorflow', keras=keras, float32='float32', cast=identidad)
+
+    # Las dependencias livianas primero: sklearn importa el joblib real
+    _modulo_si_falta('nrrd', write=lambda ruta, datos: None)
+    _modulo_si_falta('SimpleITK', GetImageFromArray=identidad,
+                     ProcessObject=types.SimpleNamespace(
+                         SetGlobalDefaultNumberOfThreads=lambda hilos: None))
+    _modulo_si_falta('six')
+    _modulo_si_falta('imblearn')
+    _modulo_si_falta('imblearn.over_sampling', RandomOverSampler=object)
+    _modulo_si_falta('sklearn')
+    _modulo_si_falta('sklearn.preprocessing', StandardScaler=object)
+    _modulo_si_falta('sklearn.ensemble', RandomForestClassifier=object)
+    _modulo_si_falta('tqdm', tqdm=identidad)
+    _modulo_si_falta('joblib')
+
+    def cargar_joblib(ruta):
+        nombre = os.path.splitext(os.path.basename(ruta))[0]
+        return ClasificadorFalso(int(nombre[-1]) % 5 + 1)
+
+    class BoosterFalso:
+        def load_model(self, ruta):
+            raise FileNotFoundError(ruta)
+
+    # Solo se reemplaza joblib.load, que PWAT.py usa para los modelos
+    sys.modules['joblib'].load = cargar_joblib
+    _modulo('xgboost', Booster=BoosterFalso, XGBClassifier=ClasificadorFalso,
+            DMatrix=identidad)
+    extractor = _modulo('radiomics.featureextractor',
+                        RadiomicsFeatureExtractor=ExtractorFalso)
+    _modulo('radiomics', featureextractor=extractor)
+
+
+def ejecutar_pwat(argv):
+    """Ejecuta la CLI de PWAT.py con los modelos falsos instalados."""
+    instalar()
+    sys.path.insert(0, CATEGORIZADOR_DIR)
+    sys.argv = [os.path.join(CATEGORIZADOR_DIR, 'PWAT.py')] + list(argv)
+    runpy.run_path(sys.argv[0], run_name='__main__')
+
+
+if __name__ == '__main__':
+    ejecutar_pwat(sys.argv[1:])
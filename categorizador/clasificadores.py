@@ -0,0 +1,151 @@
+"""
+Carga y evaluación vectorizada de los clasificadores PWAT (Categoria3-8).
+
+Este módulo no depende de TensorFlow: permite puntuar matrices de
+características ya extraídas (por ejemplo desde el almacén de
+características) con cualquier versión de los modelos.
+"""
+import os
+
+import numpy as np
+
+CATEGORIAS = ["Cat3", "Cat4", "Cat5", "Cat6", "Cat7", "Cat8"]
+
+# Valores usados cuando un clasificador falla, en PWAT.py y al reclasificar
+VALORES_POR_DEFECTO = {3: 2, 6: 3}
+VALOR_POR_DEFECTO_GENERICO = 1
+
+
+def valor_por_defecto(categoria):
+    """Devuelve el valor de respaldo para la categoría indicada (3-8)."""
+    return VALORES_POR_DEFECTO.get(categoria, VALOR_POR_DEFECTO_GENERICO)
+
+
+def cargar_xgboost(model_dir, model_name):
+    """
+    Carga un modelo XGBoost desde JSON y, si falla, desde PKL.
+
+    Args:
+        model_dir (str): Directorio de modelos.
+        model_name (str): Nombre base del modelo (p. ej. 'Categoria3').
+
+    Returns:
+        tuple: (modelo, tipo) con tipo 'xgboost_json' o 'xgboost_pkl'.
+    """
+    import xgboost
+    from joblib import load
+
+    try:
+        modelo = xgboost.Booster()
+        modelo.load_model(os.path.join(model_dir, f"{model_name}.json"))
+        return modelo, 'xgboost_json'
+    except Exception:
+        return load(os.path.join(model_dir, f"{model_name}.pkl")), 'xgboost_pkl'
+
+
+def cargar_clasificadores(model_dir):
+    """
+    Carga los seis clasificadores de un directorio de modelos.
+
+    Args:
+        model_dir (str): Directorio con Categoria3/6 (.json o .pkl) y
+            Categoria4/5/7/8 (.joblib).
+
+    Returns:
+        list: Tuplas (categoria, modelo, tipo) en el orden Cat3..Cat8.
+    """
+    from joblib import load
+
+    clasificadores = []
+    for categoria in range(3, 9):
+        nombre = f"Categoria{categoria}"
+        if categoria in (3, 6):
+            modelo, tipo = cargar_xgboost(model_dir, nombre)
+        else:
+            modelo = load(os.path.join(model_dir, f"{nombre}.joblib"))
+            tipo = 'sklearn'
+        clasificadores.append((categoria, modelo, tipo))
+    return clasificadores
+
+
+def predecir_crudo(modelo, tipo, matriz):
+    """
+    Ejecuta la predicción cruda de un clasificador sobre una matriz.
+
+    Args:
+        modelo: Booster/XGBClassifier o modelo sklearn.
+        tipo (str): 'xgboost_json', 'xgboost_pkl' o 'sklearn'.
+        matriz (np.array): Características, una fila por imagen.
+
+    Returns:
+        np.array: Salida sin decodificar del modelo.
+    """
+    if tipo.startswith('xgboost'):
+        import xgboost as xgb
+        datos = np.asarray(matriz, dtype=np.float64)
+        if tipo == 'xgboost_json':
+            return modelo.predict(xgb.DMatrix(datos))
+        return modelo.predict_proba(datos)
+    return modelo.predict(np.asarray(matriz, dtype=np.float32))
+
+
+def decodificar(prediccion, tipo, filas):
+    """
+    Convierte la salida cruda de un clasificador en categorías enteras.
+
+    Las salidas multiclase se reducen con argmax (+1 porque las clases
+    empiezan en 1); las de un solo valor se redondean.
+
+    Args:
+        prediccion (np.array): Salida de predecir_crudo().
+        tipo (str): Tipo de modelo.
+        filas (int): Número de filas evaluadas.
+
+    Returns:
+        np.array: Vector de enteros de longitud `filas`.
+    """
+    prediccion = np.asarray(prediccion)
+    if not tipo.startswith('xgboost'):
+        return prediccion.reshape(-1).astype(np.int64)
+    if prediccion.ndim == 2 and prediccion.shape[1] > 1:
+        return np.argmax(prediccion, axis=1).astype(np.int64) + 1
+    if prediccion.ndim == 1 and filas == 1 and len(prediccion) > 1:
+        return np.array([int(np.argmax(prediccion)) + 1])
+    return np.rint(prediccion.reshape(-1).astype(np.float64)).astype(np.int64)
+
+
+def predecir_lote(clasificadores, matriz, al_fallar=None):
+    """
+    Puntúa todas las filas de `matriz` con los seis clasificadores.
+
+    Un clasificador que falla no interrumpe el lote: su columna se rellena
+    con el valor por defecto de la categoría.
+
+    Args:
+        clasificadores (list): Tuplas (categoria, modelo, tipo).
+        matriz (np.array): Características (n_imagenes, n_caracteristicas).
+        al_fallar (callable): Se llama con la categoría (3-8) de cada
+            clasificador que falló, p. ej. para contarlo en las métricas.
+
+    Returns:
+        np.array: Enteros de forma (n_imagenes, 6) en el orden Cat3..Cat8.
+    """
+    matriz = np.atleast_2d(matriz)
+    filas = matriz.shape[0]
+    resultados = np.empty((filas, len(clasificadores)), dtype=np.int64)
+    for columna, (categoria, modelo, tipo) in enumerate(clasificadores):
+        try:
+            crudo = predecir_crudo(modelo, tipo, matriz)
+            resultados[:, columna] = decodificar(crudo, tipo, filas)
+        except Exception as e:
+            if os.getenv('DEBUG_PWAT') == '1':
+                print(f"ERROR con la categoría {categoria}: {e}")
+            resultados[:, columna] = valor_por_defecto(categoria)
+            if al_fallar is not None:
+                al_fallar(categoria)
+    return resultados
+
+
+def a_diccionario(fila):
+    """Convierte una fila de predecir_lote() al formato {'Cat3': n, ...}."""
+    return {c: int(v) for c, v in zip(CATEGORIAS, fila)}
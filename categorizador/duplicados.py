@@ -0,0 +1,218 @@
+"""
+Índice de hashes perceptuales para detectar subidas casi idénticas.
+
+Cada imagen procesada se resume en un pHash de 64 bits (DCT de la imagen en
+gris a 32x32). Dos copias de la misma foto, aunque se hayan recodificado o
+redimensionado, quedan a pocos bits de distancia de Hamming.
+
+La búsqueda usa hashing multi-índice: el hash se divide en `bloques` partes
+de igual tamaño, cada una con su propio índice en SQLite. Si dos hashes
+difieren en a lo sumo d bits, al menos un bloque difiere en a lo sumo
+d // bloques bits, de modo que basta consultar, por bloque, los valores a
+esa distancia. El costo de una búsqueda depende del número de candidatos y
+no del tamaño del archivo.
+
+Un pHash cercano no basta para reutilizar un resultado clínico: heridas
+distintas fotografiadas con el mismo encuadre o fondo también quedan a
+pocos bits. Por eso cada candidato se confirma comparando los píxeles de
+ambas imágenes a la resolución del modelo (diferencia_media()).
+"""
+import contextlib
+import functools
+import itertools
+import os
+import sqlite3
+import time
+
+import numpy as np
+from PIL import Image
+
+BITS = 64
+LADO_DCT = 32
+LADO_HASH = 8
+BLOQUES = 4
+DISTANCIA_MAXIMA = 2
+LADO_COMPARACION = 256
+# Diferencia media máxima (0-255) entre dos copias de la misma foto
+DIFERENCIA_MAXIMA = 4.0
+MAX_VARIABLES_SQL = 900
+
+
+@functools.lru_cache(maxsize=None)
+def _matriz_dct(n):
+    """Matriz de la DCT-II ortonormal de tamaño n."""
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    matriz = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matriz[0] /= np.sqrt(2.0)
+    return matriz
+
+
+def phash(imagen):
+    """
+    Calcula el hash perceptual de una imagen.
+
+    Args:
+        imagen (str | PIL.Image.Image): Ruta o imagen ya abierta.
+
+    Returns:
+        int: Hash de 64 bits (entero sin signo).
+    """
+    if isinstance(imagen, Image.Image):
+        img = imagen
+    else:
+        img = Image.open(imagen)
+        # En JPEG decodifica directamente a escala reducida
+        img.draft('L', (LADO_DCT * 2, LADO_DCT * 2))
+    gris = np.asarray(img.convert('L').resize((LADO_DCT, LADO_DCT), Image.LANCZOS),
+                      dtype=np.float64)
+    dct = _matriz_dct(LADO_DCT)
+    coeficientes = (dct @ gris @ dct.T)[:LADO_HASH, :LADO_HASH].flatten()
+    # La componente continua no participa de la mediana
+    bits = coeficientes > np.median(coeficientes[1:])
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def distancia(a, b):
+    """Distancia de Hamming entre dos hashes."""
+    return bin(a ^ b).count('1')
+
+
+def diferencia_media(a, b, lado=LADO_COMPARACION):
+    """
+    Diferencia absoluta media entre dos imágenes en gris redimensionadas a
+    lado x lado, la resolución a la que las ve el modelo.
+
+    Args:
+        a, b (str | PIL.Image.Image): Rutas o imágenes ya abiertas.
+
+    Returns:
+        float: Diferencia media por píxel, entre 0 y 255.
+    """
+    grises = []
+    for imagen in (a, b):
+        img = imagen if isinstance(imagen, Image.Image) else Image.open(imagen)
+        grises.append(np.asarray(img.convert('L').resize((lado, lado), Image.BILINEAR),
+                                 dtype=np.int16))
+    return float(np.abs(grises[0] - grises[1]).mean())
+
+
+def _con_signo(valor):
+    # SQLite guarda enteros de 64 bits con signo
+    return valor - (1 << BITS) if valor >= 1 << (BITS - 1) else valor
+
+
+def _sin_signo(valor):
+    return valor + (1 << BITS) if valor < 0 else valor
+
+
+def _vecinos(valor, bits, radio):
+    """Todos los valores de `bits` bits a distancia <= radio de `valor`."""
+    for r in range(radio + 1):
+        for posiciones in itertools.combinations(range(bits), r):
+            vecino = valor
+            for p in posiciones:
+                vecino ^= 1 << p
+            yield vecino
+
+
+class IndicePerceptual:
+    """
+    Índice persistente de hashes perceptuales con búsqueda multi-índice.
+
+    Args:
+        ruta_db (str): Archivo SQLite (puede compartirse con memo.py).
+        bloques (int): Partes en que se divide el hash. Solo se usa al
+            crear el índice; después se respeta el valor guardado.
+    """
+
+    def __init__(self, ruta_db, bloques=BLOQUES):
+        if BITS % bloques:
+            raise ValueError(f"bloques debe dividir {BITS}: {bloques}")
+        self.ruta_db = ruta_db
+        os.makedirs(os.path.dirname(os.path.abspath(ruta_db)), exist_ok=True)
+        with self._conectar() as conexion:
+            conexion.execute(
+                'CREATE TABLE IF NOT EXISTS phash_meta (clave TEXT PRIMARY KEY, valor TEXT NOT NULL)')
+            fila = conexion.execute(
+                "SELECT valor FROM phash_meta WHERE clave = 'bloques'").fetchone()
+            if fila:
+                bloques = int(fila[0])
+            else:
+                conexion.execute("INSERT INTO phash_meta VALUES ('bloques', ?)",
+                                 (str(bloques),))
+            columnas = ''.join(f', b{i} INTEGER NOT NULL' for i in range(bloques))
+            conexion.execute(
+                'CREATE TABLE IF NOT EXISTS phash ('
+                'hash_imagen TEXT PRIMARY KEY, phash INTEGER NOT NULL, '
+                f'ruta_imagen TEXT NOT NULL, creado REAL NOT NULL{columnas})')
+            for i in range(bloques):
+                conexion.execute(
+                    f'CREATE INDEX IF NOT EXISTS idx_phash_b{i} ON phash (b{i})')
+        self.bloques = bloques
+        self.bits_bloque = BITS // bloques
+
+    @contextlib.contextmanager
+    def _conectar(self):
+        conexion = sqlite3.connect(self.ruta_db, timeout=30)
+        try:
+            conexion.execute('PRAGMA journal_mode=WAL')
+            with conexion:
+                yield conexion
+        finally:
+            conexion.close()
+
+    def _partir(self, valor):
+        mascara = (1 << self.bits_bloque) - 1
+        return [(valor >> (i * self.bits_bloque)) & mascara
+                for i in range(self.bloques)]
+
+    def agregar(self, valor, hash_imagen, ruta_imagen):
+        """
+        Registra (o actualiza) el hash perceptual de una imagen.
+
+        Args:
+            valor (int): Hash perceptual de phash().
+            hash_imagen (str): sha256 del contenido (clave en memo.py).
+            ruta_imagen (str): Ruta de la imagen procesada.
+        """
+        fila = [hash_imagen, _con_signo(valor), os.path.abspath(ruta_imagen),
+                time.time()] + self._partir(valor)
+        marcadores = ', '.join('?' * len(fila))
+        with self._conectar() as conexion:
+            conexion.execute(f'INSERT OR REPLACE INTO phash VALUES ({marcadores})', fila)
+
+    def buscar(self, valor, distancia_maxima=DISTANCIA_MAXIMA, limite=5):
+        """
+        Busca imágenes a distancia de Hamming <= `distancia_maxima`.
+
+        Returns:
+            list: Hasta `limite` dicts {'hash_imagen', 'ruta_imagen',
+            'distancia'}, del más cercano al más lejano (y del más reciente
+            al más antiguo a igual distancia).
+        """
+        radio = distancia_maxima // self.bloques
+        candidatos = {}
+        with self._conectar() as conexion:
+            for i, parte in enumerate(self._partir(valor)):
+                vecinos = list(_vecinos(parte, self.bits_bloque, radio))
+                for inicio in range(0, len(vecinos), MAX_VARIABLES_SQL):
+                    grupo = vecinos[inicio:inicio + MAX_VARIABLES_SQL]
+                    marcadores = ', '.join('?' * len(grupo))
+                    for hash_imagen, otro, ruta, creado in conexion.execute(
+                            'SELECT hash_imagen, phash, ruta_imagen, creado FROM phash '
+                            f'WHERE b{i} IN ({marcadores})', grupo):
+                        candidatos[hash_imagen] = (_sin_signo(otro), ruta, creado)
+
+        encontrados = []
+        for hash_imagen, (otro, ruta, creado) in candidatos.items():
+            d = distancia(valor, otro)
+            if d <= distancia_maxima:
+                encontrados.append((d, -creado, hash_imagen, ruta))
+        encontrados.sort()
+        return [{'hash_imagen': h, 'ruta_imagen': r, 'distancia': d}
+                for d, _, h, r in encontrados[:limite]]
+
+    def __len__(self):
+        with self._conectar() as conexion:
+            return conexion.execute('SELECT COUNT(*) FROM phash').fetchone()[0]
@@ -0,0 +1,197 @@
+"""
+Escritura de máscaras y artefactos en segundo plano.
+
+Las escrituras se encolan en hilos de fondo para que la respuesta no espere
+a la codificación ni al fsync del almacenamiento compartido. Cada archivo
+se escribe de forma atómica (archivo temporal en el mismo directorio,
+fsync y renombrado), de modo que un lector nunca ve un archivo a medias.
+
+Las escrituras a una misma ruta se asignan siempre al mismo hilo, por lo
+que se aplican en el orden en que se pidieron. Cuando hay `max_pendientes`
+escrituras en curso, escribir() bloquea al llamador (contrapresión) en vez
+de acumular memoria sin límite.
+
+ejecutar() usa los mismos hilos, la misma cola y el mismo orden por clave
+para tareas que no son un archivo atómico, como agregar una fila al
+almacén de características.
+"""
+import functools
+import os
+import threading
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+def _ruta_temporal(ruta):
+    # Conserva la extensión: PIL y pynrrd eligen el formato por ella
+    directorio, nombre = os.path.split(ruta)
+    base, extension = os.path.splitext(nombre)
+    return os.path.join(
+        directorio, f".{base}.{os.getpid()}.{threading.get_ident()}.tmp{extension}")
+
+
+def escribir_atomico(ruta, contenido, fsync=True):
+    """
+    Escribe un archivo de forma atómica.
+
+    Args:
+        ruta (str): Ruta final.
+        contenido (bytes | callable): Bytes a escribir, o una función que
+            recibe la ruta temporal y crea allí el archivo.
+        fsync (bool): Forzar la llegada a disco del archivo y del
+            directorio antes de volver.
+    """
+    temporal = _ruta_temporal(ruta)
+    try:
+        if callable(contenido):
+            contenido(temporal)
+            if fsync:
+                with open(temporal, 'rb+') as f:
+                    os.fsync(f.fileno())
+        else:
+            with open(temporal, 'wb') as f:
+                f.write(contenido)
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    if fsync and hasattr(os, 'O_DIRECTORY'):
+        descriptor = os.open(os.path.dirname(os.path.abspath(ruta)), os.O_DIRECTORY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+
+
+class Escritor:
+    """
+    Escritor en segundo plano con cola acotada.
+
+    Args:
+        hilos (int): Hilos de escritura.
+        max_pendientes (int): Escrituras encoladas o en curso como máximo.
+        fsync (bool): Sincronizar cada archivo con el disco.
+    """
+
+    def __init__(self, hilos=2, max_pendientes=32, fsync=True):
+        self.fsync = fsync
+        self._carriles = [ThreadPoolExecutor(max_workers=1, thread_name_prefix='escritor')
+                          for _ in range(max(1, hilos))]
+        self._cupos = threading.BoundedSemaphore(max_pendientes)
+        self._bloqueo = threading.Lock()
+        self._pendientes = {}
+        self.escritos = 0
+        self.errores = 0
+
+    @property
+    def en_cola(self):
+        """Escrituras encoladas o en curso."""
+        with self._bloqueo:
+            return sum(len(v) for v in self._pendientes.values())
+
+    def escribir(self, ruta, contenido):
+        """
+        Encola la escritura atómica de `ruta`.
+
+        Bloquea mientras la cola esté llena.
+
+        Returns:
+            Future: Se completa cuando el archivo está en disco; su
+            result() relanza el error de escritura, si lo hubo.
+        """
+        ruta = os.path.abspath(ruta)
+        return self._encolar(ruta, contenido, functools.partial(
+            escribir_atomico, ruta, contenido, fsync=self.fsync))
+
+    def ejecutar(self, clave, funcion):
+        """
+        Encola `funcion()` en el hilo de `clave`, con la misma contrapresión
+        y el mismo orden que las escrituras; vaciar() también la espera.
+
+        Returns:
+            Future: Se completa cuando `funcion` termina.
+        """
+        return self._encolar(os.path.abspath(clave), None, funcion)
+
+    def _encolar(self, ruta, contenido, accion):
+        self._cupos.acquire()
+        futuro = Future()
+        with self._bloqueo:
+            self._pendientes.setdefault(ruta, []).append((futuro, contenido))
+        carril = self._carriles[zlib.crc32(ruta.encode('utf-8')) % len(self._carriles)]
+        try:
+            carril.submit(self._ejecutar, ruta, accion, futuro)
+        except BaseException:
+            self._terminar(ruta, futuro)
+            raise
+        return futuro
+
+    def _ejecutar(self, ruta, accion, futuro):
+        try:
+            accion()
+        except BaseException as e:
+            with self._bloqueo:
+                self.errores += 1
+            if os.getenv('DEBUG_PWAT') == '1':
+                print(f"Error escribiendo {ruta}: {e}")
+            self._terminar(ruta, futuro)
+            futuro.set_exception(e)
+        else:
+            with self._bloqueo:
+                self.escritos += 1
+            self._terminar(ruta, futuro)
+            futuro.set_result(ruta)
+
+    def _terminar(self, ruta, futuro):
+        with self._bloqueo:
+            pendientes = self._pendientes.get(ruta, [])
+            self._pendientes[ruta] = [p for p in pendientes if p[0] is not futuro]
+            if not self._pendientes[ruta]:
+                del self._pendientes[ruta]
+        self._cupos.release()
+
+    def pendiente(self, ruta):
+        """
+        Devuelve los bytes de la última escritura aún no terminada de `ruta`
+        (para leerla antes de que llegue a disco), o None.
+        """
+        with self._bloqueo:
+            pendientes = self._pendientes.get(os.path.abspath(ruta))
+            if pendientes and isinstance(pendientes[-1][1], bytes):
+                return pendientes[-1][1]
+        return None
+
+    def despues_de(self, ruta, funcion):
+        """
+        Llama a `funcion()` cuando la última escritura pendiente de `ruta`
+        llegue a disco (de inmediato si no hay ninguna). Si esa escritura
+        falla, `funcion` no se llama.
+        """
+        with self._bloqueo:
+            pendientes = self._pendientes.get(os.path.abspath(ruta))
+            futuro = pendientes[-1][0] if pendientes else None
+        if futuro is None:
+            funcion()
+        else:
+            futuro.add_done_callback(
+                lambda f: f.exception() is None and funcion())
+
+    def vaciar(self, timeout=None):
+        """Espera a que todas las escrituras encoladas estén en disco."""
+        with self._bloqueo:
+            futuros = [f for v in self._pendientes.values() for f, _ in v]
+        for futuro in futuros:
+            try:
+                futuro.result(timeout=timeout)
+            except Exception:
+                pass
+
+    def cerrar(self):
+        """Vacía la cola y detiene los hilos."""
+        self.vaciar()
+        for carril in self._carriles:
+            carril.shutdown(wait=True)
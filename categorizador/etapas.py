@@ -0,0 +1,105 @@
+"""
+Geometría de la segmentación en dos etapas.
+
+La primera pasada (imagen completa reducida al tamaño del modelo) da un
+mapa de probabilidad grueso; de él se obtiene la caja de la herida, que se
+amplía con un margen y se vuelve a segmentar recortada a la resolución
+nativa del modelo. El resultado fino se pega en coordenadas de la imagen
+completa sobre el mapa grueso ampliado.
+
+No depende de TensorFlow: PWAT.py le pasa los mapas ya predichos.
+"""
+import cv2
+import numpy as np
+from PIL import Image
+
+MARGEN = 0.15
+FRACCION_COMPONENTE = 0.1
+FRACCION_MAXIMA = 0.7
+
+
+def redimensionar_mapa(prob, tamano):
+    """
+    Redimensiona un mapa de probabilidad con interpolación bilineal.
+
+    Args:
+        prob (np.array): Mapa (H, W) o (H, W, 1).
+        tamano (tuple): (ancho, alto) de salida.
+
+    Returns:
+        np.array: Mapa float32 (alto, ancho).
+    """
+    prob = np.asarray(prob, dtype=np.float32)
+    plano = Image.fromarray(prob.reshape(prob.shape[:2]), mode='F')
+    return np.array(plano.resize(tamano, Image.BILINEAR), dtype=np.float32)
+
+
+def caja_herida(prob, tamano_imagen, threshold=0.5, margen=MARGEN,
+                fraccion_componente=FRACCION_COMPONENTE,
+                fraccion_maxima=FRACCION_MAXIMA):
+    """
+    Calcula la región a segmentar en la segunda pasada.
+
+    Se toman las componentes conexas de la máscara gruesa con al menos
+    `fraccion_componente` del área de la mayor (descarta ruido), se
+    encierran en una caja, se agrega `margen` por lado y se lleva a un
+    cuadrado dentro de la imagen.
+
+    Args:
+        prob (np.array): Mapa grueso (h, w) o (h, w, 1).
+        tamano_imagen (tuple): (ancho, alto) de la imagen original.
+        threshold (float): Umbral de la máscara gruesa.
+        margen (float): Margen por lado, como fracción del lado de la caja.
+        fraccion_maxima (float): Si la caja ocupa más que esto de la imagen
+            en ambos ejes, la segunda pasada no aporta y se devuelve None.
+
+    Returns:
+        tuple: (x0, y0, x1, y1) en píxeles de la imagen original, o None.
+    """
+    prob = np.asarray(prob)
+    mascara = (prob.reshape(prob.shape[:2]) > threshold).astype(np.uint8)
+    n, _, stats, _ = cv2.connectedComponentsWithStats(mascara, connectivity=8)
+    if n <= 1:
+        return None
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    validas = stats[1:][areas >= fraccion_componente * areas.max()]
+    x0 = validas[:, cv2.CC_STAT_LEFT].min()
+    y0 = validas[:, cv2.CC_STAT_TOP].min()
+    x1 = (validas[:, cv2.CC_STAT_LEFT] + validas[:, cv2.CC_STAT_WIDTH]).max()
+    y1 = (validas[:, cv2.CC_STAT_TOP] + validas[:, cv2.CC_STAT_HEIGHT]).max()
+
+    # De la rejilla gruesa a píxeles de la imagen original
+    ancho, alto = tamano_imagen
+    escala_x = ancho / mascara.shape[1]
+    escala_y = alto / mascara.shape[0]
+    x0, x1 = x0 * escala_x, x1 * escala_x
+    y0, y1 = y0 * escala_y, y1 * escala_y
+
+    lado = max(x1 - x0, y1 - y0) * (1 + 2 * margen)
+    lado = min(lado, ancho, alto)
+    if lado >= fraccion_maxima * ancho and lado >= fraccion_maxima * alto:
+        return None
+    cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+    x0 = int(round(min(max(cx - lado / 2, 0), ancho - lado)))
+    y0 = int(round(min(max(cy - lado / 2, 0), alto - lado)))
+    lado = int(round(lado))
+    return x0, y0, min(x0 + lado, ancho), min(y0 + lado, alto)
+
+
+def componer(prob_gruesa, prob_fina, caja, tamano_imagen):
+    """
+    Lleva el resultado de ambas pasadas a coordenadas de la imagen completa.
+
+    Args:
+        prob_gruesa (np.array): Mapa de la primera pasada.
+        prob_fina (np.array): Mapa de la segunda pasada sobre el recorte.
+        caja (tuple): (x0, y0, x1, y1) del recorte.
+        tamano_imagen (tuple): (ancho, alto) de la imagen original.
+
+    Returns:
+        np.array: Mapa float32 (alto, ancho, 1).
+    """
+    prob = redimensionar_mapa(prob_gruesa, tamano_imagen)
+    x0, y0, x1, y1 = caja
+    prob[y0:y1, x0:x1] = redimensionar_mapa(prob_fina, (x1 - x0, y1 - y0))
+    return prob[:, :, None]
@@ -0,0 +1,195 @@
+"""
+Evaluación de máscaras guardadas contra su verdad de terreno, sin TensorFlow.
+
+Empareja cada máscara predicha (p. ej. en predicts/masks) con la máscara
+verdadera del mismo nombre base, las carga con load_and_preprocess_mask y
+calcula dice, IoU, precisión, recall y F1 con NumPy en un pool de procesos.
+Los resultados por imagen se emiten a medida que llegan (JSON por línea) y
+al final se imprime el agregado.
+
+Las métricas reproducen las de PWAT.py (dice_coefficient, iou_metric,
+precision_metric, recall_metric, f1_score) para máscaras binarias.
+
+Uso:
+    python evaluar_segmentacion.py --pred predicts/masks --gt verdad/ \\
+        --salida por_imagen.jsonl --procesos 8
+"""
+import argparse
+import json
+import sys
+from multiprocessing import Pool
+
+import numpy as np
+
+from preprocesamiento import archivos_por_nombre, load_and_preprocess_mask
+
+# Mismas constantes que las métricas Keras de PWAT.py
+SMOOTH = 1e-6
+EPSILON = 1e-7
+
+METRICAS = ('dice', 'iou', 'precision', 'recall', 'f1')
+
+
+def conteos(y_true, y_pred):
+    """
+    Cuenta verdaderos positivos, falsos positivos y falsos negativos.
+
+    Args:
+        y_true (np.array): Máscara (H, W, 1) o lote (N, H, W, 1) verdadero.
+        y_pred (np.array): Máscaras predichas, misma forma.
+
+    Returns:
+        tuple: (tp, fp, fn) sumados sobre los ejes espaciales.
+    """
+    verdad = np.asarray(y_true) > 0.5
+    prediccion = np.asarray(y_pred) > 0.5
+    ejes = (-3, -2, -1) if verdad.ndim >= 3 else None
+    tp = np.count_nonzero(verdad & prediccion, axis=ejes)
+    fp = np.count_nonzero(~verdad & prediccion, axis=ejes)
+    fn = np.count_nonzero(verdad & ~prediccion, axis=ejes)
+    return tp, fp, fn
+
+
+def metricas_desde_conteos(tp, fp, fn):
+    """
+    Calcula las métricas de segmentación a partir de los conteos.
+
+    Args:
+        tp, fp, fn: Escalares o arrays de conteos.
+
+    Returns:
+        dict: dice, iou, precision, recall y f1 (escalares o arrays).
+    """
+    tp = np.asarray(tp, dtype=np.float64)
+    fp = np.asarray(fp, dtype=np.float64)
+    fn = np.asarray(fn, dtype=np.float64)
+    precision = tp / (tp + fp + EPSILON)
+    recall = tp / (tp + fn + EPSILON)
+    return {
+        'dice': (2.0 * tp + SMOOTH) / (2.0 * tp + fp + fn + SMOOTH),
+        'iou': tp / (tp + fp + fn + EPSILON),
+        'precision': precision,
+        'recall': recall,
+        'f1': 2.0 * (precision * recall) / (precision + recall + EPSILON),
+    }
+
+
+def emparejar(dir_pred, dir_gt):
+    """
+    Empareja máscaras predichas y verdaderas por nombre base.
+
+    Args:
+        dir_pred (str): Directorio de máscaras predichas.
+        dir_gt (str): Directorio de máscaras verdaderas.
+
+    Returns:
+        tuple: (pares, sin_verdad) con los pares (nombre, ruta_pred, ruta_gt)
+        y los nombres de predicciones sin máscara verdadera.
+    """
+    predichas = archivos_por_nombre(dir_pred)
+    verdaderas = archivos_por_nombre(dir_gt)
+    pares = [(base, ruta, verdaderas[base])
+             for base, ruta in predichas.items() if base in verdaderas]
+    sin_verdad = [base for base in predichas if base not in verdaderas]
+    return pares, sin_verdad
+
+
+def evaluar_par(par, target_size=(256, 256)):
+    """
+    Evalúa un par (nombre, ruta_pred, ruta_gt).
+
+    Returns:
+        dict: Métricas y conteos de la imagen, o {'imagen', 'error'}.
+    """
+    nombre, ruta_pred, ruta_gt = par
+    prediccion = load_and_preprocess_mask(ruta_pred, target_size=target_size)
+    verdad = load_and_preprocess_mask(ruta_gt, target_size=target_size)
+    if prediccion is None or verdad is None:
+        return {'imagen': nombre, 'error': 'No se pudo cargar la máscara'}
+    tp, fp, fn = conteos(verdad, prediccion)
+    resultado = {'imagen': nombre, 'tp': int(tp), 'fp': int(fp), 'fn': int(fn)}
+    resultado.update({k: float(v) for k, v in
+                      metricas_desde_conteos(tp, fp, fn).items()})
+    return resultado
+
+
+class Agregado:
+    """Acumula métricas por imagen sin guardar todos los resultados."""
+
+    def __init__(self):
+        self.imagenes = 0
+        self.errores = 0
+        self.sumas = dict.fromkeys(METRICAS, 0.0)
+        self.tp = self.fp = self.fn = 0
+
+    def agregar(self, resultado):
+        if 'error' in resultado:
+            self.errores += 1
+            return
+        self.imagenes += 1
+        for metrica in METRICAS:
+            self.sumas[metrica] += resultado[metrica]
+        self.tp += resultado['tp']
+        self.fp += resultado['fp']
+        self.fn += resultado['fn']
+
+    def resumen(self):
+        """
+        Returns:
+            dict: Medias por imagen ('media') y métricas sobre los píxeles de
+            todo el conjunto ('global').
+        """
+        media = {m: (s / self.imagenes if self.imagenes else None)
+                 for m, s in self.sumas.items()}
+        globales = {k: float(v) for k, v in
+                    metricas_desde_conteos(self.tp, self.fp, self.fn).items()}
+        return {'imagenes': self.imagenes, 'errores': self.errores,
+                'media': media, 'global': globales}
+
+
+def evaluar(pares, procesos=None, chunksize=16):
+    """
+    Evalúa los pares en un pool de procesos, entregando los resultados a
+    medida que terminan.
+
+    Yields:
+        dict: Resultado de evaluar_par() por cada par.
+    """
+    if procesos == 1:
+        for par in pares:
+            yield evaluar_par(par)
+        return
+    with Pool(processes=procesos) as pool:
+        for resultado in pool.imap_unordered(evaluar_par, pares, chunksize):
+            yield resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--pred', required=True,
+                        help='Directorio de máscaras predichas')
+    parser.add_argument('--gt', required=True,
+                        help='Directorio de máscaras verdaderas')
+    parser.add_argument('--salida', default=None,
+                        help='Archivo JSONL por imagen (por defecto, stderr)')
+    parser.add_argument('--procesos', type=int, default=None)
+    args = parser.parse_args()
+
+    pares, sin_verdad = emparejar(args.pred, args.gt)
+    agregado = Agregado()
+    destino = open(args.salida, 'w', encoding='utf-8') if args.salida else sys.stderr
+    try:
+        for resultado in evaluar(pares, procesos=args.procesos):
+            agregado.agregar(resultado)
+            destino.write(json.dumps(resultado) + '\n')
+    finally:
+        if args.salida:
+            destino.close()
+
+    resumen = agregado.resumen()
+    resumen['sin_verdad'] = len(sin_verdad)
+    print(json.dumps(resumen))
+
+
+if __name__ == '__main__':
+    main()
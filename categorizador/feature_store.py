@@ -0,0 +1,286 @@
+"""
+Almacén columnar de características radiómicas.
+
+Cada llamada a PWAT.predecir agrega el vector de características extraído,
+de modo que al reentrenar un modelo Categoria no haga falta volver a
+segmentar ni a ejecutar pyradiomics: basta con reclasificar el almacén.
+
+Estructura del directorio (solo se agrega, nunca se reescribe):
+
+    columnas.json        nombres de las características, en orden
+    caracteristicas.f64  matriz float64 fila a fila (memory-mapped al leer)
+    indice.jsonl         una línea por fila: {"id": ..., "fila": ..., "ts": ...}
+
+La fila se escribe antes que su línea de índice, por lo que un corte a
+mitad de escritura deja como mucho una fila huérfana que se sobrescribe en
+el siguiente `agregar`.
+
+El índice se lee de forma incremental: cada instancia recuerda hasta qué
+byte lo procesó y solo lee las líneas nuevas, así que agregar y buscar no
+recorren el archivo entero en cada llamada.
+
+Uso:
+    python feature_store.py info --almacen DIR
+    python feature_store.py reclasificar --almacen DIR --modelos DIR --salida res.json
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ALMACEN_POR_DEFECTO = os.path.join(BASE_DIR, 'feature_store')
+
+DTYPE = '<f8'
+
+
+class FeatureStore:
+    """Almacén de características indexado por identificador de imagen."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.ruta_columnas = os.path.join(ruta, 'columnas.json')
+        self.ruta_datos = os.path.join(ruta, 'caracteristicas.f64')
+        self.ruta_indice = os.path.join(ruta, 'indice.jsonl')
+        self.ruta_bloqueo = os.path.join(ruta, '.lock')
+        os.makedirs(ruta, exist_ok=True)
+        # Índice ya leído: entradas, última fila por id y bytes procesados
+        self._entradas = []
+        self._ultimas = {}
+        self._leido = 0
+        self._bloqueo_indice = threading.Lock()
+
+    @property
+    def columnas(self):
+        if not os.path.exists(self.ruta_columnas):
+            return None
+        with open(self.ruta_columnas, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _leer_indice(self):
+        """
+        Entradas completas del índice, leyendo solo lo agregado desde la
+        última llamada (una línea sin terminar se deja para la siguiente).
+        """
+        with self._bloqueo_indice:
+            try:
+                tamano = os.path.getsize(self.ruta_indice)
+            except OSError:
+                tamano = 0
+            if tamano < self._leido:
+                # El índice se reparó o se reemplazó: volver a leerlo
+                self._entradas, self._ultimas, self._leido = [], {}, 0
+            if tamano > self._leido:
+                with open(self.ruta_indice, 'rb') as f:
+                    f.seek(self._leido)
+                    nuevo = f.read(tamano - self._leido)
+                completo = nuevo[:nuevo.rfind(b'\n') + 1]
+                for linea in completo.splitlines():
+                    if not linea.strip():
+                        continue
+                    try:
+                        entrada = json.loads(linea)
+                    except json.JSONDecodeError:
+                        continue
+                    self._entradas.append(entrada)
+                    self._ultimas[entrada['id']] = entrada['fila']
+                self._leido += len(completo)
+            return self._entradas
+
+    def _preparar_indice(self):
+        """
+        Elimina una última línea del índice que quedó a medio escribir y
+        devuelve el número de filas completas.
+        """
+        if os.path.exists(self.ruta_indice):
+            with open(self.ruta_indice, 'r+b') as f:
+                fin = f.seek(0, os.SEEK_END)
+                if fin:
+                    f.seek(fin - 1)
+                    if f.read(1) != b'\n':
+                        # Buscar hacia atrás el último salto de línea
+                        inicio = fin
+                        while inicio > 0:
+                            paso = min(inicio, 65536)
+                            f.seek(inicio - paso)
+                            bloque = f.read(paso)
+                            posicion = bloque.rfind(b'\n')
+                            if posicion >= 0:
+                                inicio = inicio - paso + posicion + 1
+                                break
+                            inicio -= paso
+                        f.truncate(inicio)
+        return len(self._leer_indice())
+
+    def __len__(self):
+        return len(self._leer_indice())
+
+    def agregar(self, image_id, columnas, valores):
+        """
+        Agrega el vector de características de una imagen.
+
+        Args:
+            image_id (str): Identificador de la imagen (nombre de archivo).
+            columnas (list): Nombres de las características.
+            valores (array-like): Valores, en el mismo orden que `columnas`.
+
+        Returns:
+            int: Número de fila asignado.
+        """
+        columnas = [str(c) for c in columnas]
+        fila = np.asarray(valores, dtype=DTYPE).reshape(-1)
+        if len(fila) != len(columnas):
+            raise ValueError(
+                f'Se esperaban {len(columnas)} valores y se recibieron {len(fila)}')
+
+        with open(self.ruta_bloqueo, 'a') as bloqueo:
+            if fcntl is not None:
+                fcntl.flock(bloqueo, fcntl.LOCK_EX)
+            existentes = self.columnas
+            if existentes is None:
+                with open(self.ruta_columnas, 'w', encoding='utf-8') as f:
+                    json.dump(columnas, f)
+            elif existentes != columnas:
+                raise ValueError(
+                    'Las columnas no coinciden con las del almacén; '
+                    'use un almacén nuevo para otra configuración de radiomics.')
+
+            numero = self._preparar_indice()
+            modo = 'r+b' if os.path.exists(self.ruta_datos) else 'wb'
+            with open(self.ruta_datos, modo) as f:
+                f.seek(numero * fila.nbytes)
+                f.write(fila.tobytes())
+                f.truncate()
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self.ruta_indice, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(
+                    {'id': image_id, 'fila': numero, 'ts': time.time()}) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+        return numero
+
+    def matriz(self):
+        """
+        Devuelve todas las filas como un np.memmap de solo lectura.
+
+        Returns:
+            np.memmap: Forma (n_filas, n_columnas), o None si está vacío.
+        """
+        columnas = self.columnas
+        filas = len(self._leer_indice())
+        if not columnas or not filas:
+            return None
+        return np.memmap(self.ruta_datos, dtype=DTYPE, mode='r',
+                         shape=(filas, len(columnas)))
+
+    def ultimas(self):
+        """
+        Devuelve la última fila registrada de cada imagen.
+
+        Returns:
+            tuple: (ids, filas) con los identificadores y sus números de fila.
+        """
+        self._leer_indice()
+        with self._bloqueo_indice:
+            ultimas = dict(self._ultimas)
+        return list(ultimas.keys()), np.fromiter(
+            ultimas.values(), dtype=np.int64, count=len(ultimas))
+
+    def buscar(self, image_id):
+        """Devuelve el último vector guardado para `image_id`, o None."""
+        self._leer_indice()
+        fila = self._ultimas.get(image_id)
+        if fila is None:
+            return None
+        return np.array(self.matriz()[fila])
+
+
+_almacenes = {}
+
+
+def almacen_desde_entorno():
+    """
+    Devuelve el almacén configurado por PWAT_FEATURE_STORE.
+
+    Si la variable no está definida se usa `feature_store/` junto a este
+    archivo; con el valor '0' el almacén queda desactivado (None). La
+    instancia se reutiliza entre llamadas para conservar el índice leído.
+    """
+    ruta = os.getenv('PWAT_FEATURE_STORE', ALMACEN_POR_DEFECTO)
+    if ruta == '0':
+        return None
+    if ruta not in _almacenes:
+        _almacenes[ruta] = FeatureStore(ruta)
+    return _almacenes[ruta]
+
+
+def reclasificar(almacen, model_dir, tamano_lote=4096):
+    """
+    Puntúa con los modelos de `model_dir` la última versión de cada imagen.
+
+    Args:
+        almacen (FeatureStore): Almacén a reclasificar.
+        model_dir (str): Directorio con los modelos Categoria3-8.
+        tamano_lote (int): Filas por pasada vectorizada.
+
+    Returns:
+        dict: {image_id: {'Cat3': n, ..., 'Cat8': n}}
+    """
+    import clasificadores
+
+    ids, filas = almacen.ultimas()
+    matriz = almacen.matriz()
+    if matriz is None:
+        return {}
+    modelos = clasificadores.cargar_clasificadores(model_dir)
+    resultados = {}
+    for inicio in range(0, len(ids), tamano_lote):
+        bloque = filas[inicio:inicio + tamano_lote]
+        puntajes = clasificadores.predecir_lote(modelos, matriz[bloque])
+        for image_id, fila in zip(ids[inicio:inicio + tamano_lote], puntajes):
+            resultados[image_id] = clasificadores.a_diccionario(fila)
+    return resultados
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    info = subparsers.add_parser('info', help='Resumen del almacén')
+    info.add_argument('--almacen', default=ALMACEN_POR_DEFECTO)
+
+    rec = subparsers.add_parser(
+        'reclasificar', help='Puntúa todo el almacén con una versión de modelos')
+    rec.add_argument('--almacen', default=ALMACEN_POR_DEFECTO)
+    rec.add_argument('--modelos', default=os.path.join(BASE_DIR, 'modelos'))
+    rec.add_argument('--salida', required=True, help='Archivo JSON de salida')
+    rec.add_argument('--lote', type=int, default=4096)
+    args = parser.parse_args()
+
+    almacen = FeatureStore(args.almacen)
+    if args.comando == 'info':
+        ids, _ = almacen.ultimas()
+        print(json.dumps({
+            'filas': len(almacen),
+            'imagenes': len(ids),
+            'columnas': len(almacen.columnas or []),
+        }))
+    else:
+        inicio = time.perf_counter()
+        resultados = reclasificar(almacen, args.modelos, args.lote)
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f)
+        print(json.dumps({
+            'imagenes': len(resultados),
+            'segundos': round(time.perf_counter() - inicio, 3),
+            'salida': args.salida,
+        }))
@@ -0,0 +1,194 @@
+"""
+Memoización persistente de resultados PWAT en SQLite.
+
+Cada resultado (ruta de la máscara y categorías Cat3-Cat8) se guarda bajo la
+clave (hash del contenido de la imagen, versión de los modelos, umbral). La
+versión de los modelos es el hash combinado de todos los artefactos
+(best_model.keras y Categoria3-8); al cambiar cualquiera de ellos cambia la
+clave y las entradas antiguas se purgan automáticamente.
+
+Los hashes de los artefactos se recuerdan por (ruta, tamaño, mtime) para no
+releer en cada llamada archivos de cientos de MB.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS resultados (
+    hash_imagen TEXT NOT NULL,
+    version_modelos TEXT NOT NULL,
+    umbral REAL NOT NULL,
+    ruta_mascara TEXT NOT NULL,
+    firma_mascara TEXT NOT NULL,
+    categorias TEXT NOT NULL,
+    creado REAL NOT NULL,
+    ruta_imagen TEXT,
+    PRIMARY KEY (hash_imagen, version_modelos, umbral)
+);
+CREATE INDEX IF NOT EXISTS idx_resultados_version ON resultados (version_modelos);
+CREATE TABLE IF NOT EXISTS huellas (
+    ruta TEXT PRIMARY KEY,
+    tamano INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+"""
+
+BLOQUE = 1 << 20
+
+
+def hash_bytes(datos):
+    """sha256 hexadecimal de un bloque de bytes."""
+    return hashlib.sha256(datos).hexdigest()
+
+
+def hash_archivo(ruta):
+    """sha256 hexadecimal del contenido de un archivo, leído por bloques."""
+    sha = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(BLOQUE), b''):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+def firma_archivo(ruta):
+    """Devuelve 'tamaño:mtime_ns' de un archivo, o '' si no existe."""
+    try:
+        info = os.stat(ruta)
+    except OSError:
+        return ''
+    return f"{info.st_size}:{info.st_mtime_ns}"
+
+
+class MemoResultados:
+    """
+    Almacén de resultados indexado por contenido y versión de modelos.
+
+    Args:
+        ruta_db (str): Archivo SQLite (se crea si no existe).
+    """
+
+    def __init__(self, ruta_db):
+        self.ruta_db = ruta_db
+        directorio = os.path.dirname(os.path.abspath(ruta_db))
+        os.makedirs(directorio, exist_ok=True)
+        self._huellas = {}
+        with self._conectar() as conexion:
+            conexion.executescript(ESQUEMA)
+            columnas = {fila[1] for fila in conexion.execute('PRAGMA table_info(resultados)')}
+            if 'ruta_imagen' not in columnas:
+                # Bases creadas antes de guardar la imagen de origen
+                conexion.execute('ALTER TABLE resultados ADD COLUMN ruta_imagen TEXT')
+
+    @contextlib.contextmanager
+    def _conectar(self):
+        # Una conexión por operación: segura entre hilos y procesos
+        conexion = sqlite3.connect(self.ruta_db, timeout=30)
+        try:
+            conexion.execute('PRAGMA journal_mode=WAL')
+            with conexion:
+                yield conexion
+        finally:
+            conexion.close()
+
+    def huella(self, ruta):
+        """
+        Devuelve el sha256 de un artefacto, recalculándolo solo si cambió
+        su tamaño o mtime.
+        """
+        try:
+            info = os.stat(ruta)
+        except OSError:
+            return 'ausente'
+        clave = (ruta, info.st_size, info.st_mtime_ns)
+        if clave in self._huellas:
+            return self._huellas[clave]
+
+        with self._conectar() as conexion:
+            fila = conexion.execute(
+                'SELECT sha256 FROM huellas WHERE ruta = ? AND tamano = ? AND mtime_ns = ?',
+                clave).fetchone()
+            if fila:
+                sha = fila[0]
+            else:
+                sha = hash_archivo(ruta)
+                conexion.execute(
+                    'INSERT OR REPLACE INTO huellas VALUES (?, ?, ?, ?)',
+                    clave + (sha,))
+        self._huellas[clave] = sha
+        return sha
+
+    def version_modelos(self, artefactos):
+        """
+        Calcula la versión combinada de los artefactos y purga los
+        resultados de versiones anteriores si cambió.
+
+        Args:
+            artefactos (list): Rutas de todos los archivos de modelo.
+
+        Returns:
+            str: Hash sha256 de las huellas de los artefactos.
+        """
+        partes = [f"{os.path.basename(r)}={self.huella(r)}" for r in artefactos]
+        version = hash_bytes('\n'.join(partes).encode('utf-8'))
+        with self._conectar() as conexion:
+            fila = conexion.execute(
+                "SELECT valor FROM meta WHERE clave = 'version_modelos'").fetchone()
+            if not fila or fila[0] != version:
+                conexion.execute(
+                    'DELETE FROM resultados WHERE version_modelos != ?', (version,))
+                conexion.execute(
+                    "INSERT OR REPLACE INTO meta VALUES ('version_modelos', ?)",
+                    (version,))
+        return version
+
+    def buscar(self, hash_imagen, version, umbral):
+        """
+        Devuelve el resultado guardado si la máscara sigue intacta.
+
+        Returns:
+            dict: {'mascara', 'categorias'}, más 'ruta_imagen' si se guardó,
+            o None.
+        """
+        with self._conectar() as conexion:
+            fila = conexion.execute(
+                'SELECT ruta_mascara, firma_mascara, categorias, ruta_imagen FROM resultados '
+                'WHERE hash_imagen = ? AND version_modelos = ? AND umbral = ?',
+                (hash_imagen, version, float(umbral))).fetchone()
+        if not fila:
+            return None
+        ruta_mascara, firma, categorias, ruta_imagen = fila
+        if firma_archivo(ruta_mascara) != firma:
+            return None
+        resultado = {'mascara': ruta_mascara, 'categorias': json.loads(categorias)}
+        if ruta_imagen is not None:
+            resultado['ruta_imagen'] = ruta_imagen
+        return resultado
+
+    def guardar(self, hash_imagen, version, umbral, ruta_mascara, categorias,
+                ruta_imagen=None):
+        """
+        Guarda (o reemplaza) el resultado de una imagen. `ruta_imagen` es la
+        imagen que lo produjo, para reutilizar sus características.
+        """
+        ruta_mascara = os.path.abspath(ruta_mascara)
+        with self._conectar() as conexion:
+            conexion.execute(
+                'INSERT OR REPLACE INTO resultados (hash_imagen, version_modelos, umbral, '
+                'ruta_mascara, firma_mascara, categorias, creado, ruta_imagen) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (hash_imagen, version, float(umbral), ruta_mascara,
+                 firma_archivo(ruta_mascara), json.dumps(categorias), time.time(),
+                 ruta_imagen))
+
+    def __len__(self):
+        with self._conectar() as conexion:
+            return conexion.execute('SELECT COUNT(*) FROM resultados').fetchone()[0]
@@ -0,0 +1,256 @@
+"""
+Métricas de los procesos PWAT en el formato de texto de Prometheus.
+
+Sin dependencias externas: contadores e histogramas con etiquetas, medidores
+que se calculan al momento de exponerlos (profundidad de colas, tiempos de
+carga, memoria) y un servidor HTTP local que responde /metrics desde un
+hilo aparte. Los modos de larga duración de PWAT.py (servir, vigilar,
+trabajo) lo inician con --metricas PUERTO o PWAT_METRICAS_PUERTO.
+
+Registrar una observación es una suma bajo un candado, así que las métricas
+se acumulan siempre; el servidor solo las lee.
+"""
+import contextlib
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TIPO_CONTENIDO = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Cubetas de latencia en segundos: de una consulta memoizada a una
+# extracción radiómica lenta
+CUBETAS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatear_etiquetas(nombres, valores):
+    if not nombres:
+        return ''
+    pares = ','.join(f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores))
+    return '{' + pares + '}'
+
+
+def _formatear_numero(valor):
+    if math.isinf(valor):
+        return '+Inf' if valor > 0 else '-Inf'
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+
+class _Metrica:
+    tipo = 'untyped'
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._bloqueo = threading.Lock()
+
+    def _clave(self, etiquetas):
+        if set(etiquetas) != set(self.etiquetas):
+            raise ValueError(f"{self.nombre} espera las etiquetas {self.etiquetas}, "
+                             f"no {tuple(etiquetas)}")
+        return tuple(str(etiquetas[n]) for n in self.etiquetas)
+
+    def muestras(self):
+        """(sufijo, nombres, valores de etiqueta, valor) de cada serie."""
+        return []
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {_escapar(self.ayuda)}",
+                  f"# TYPE {self.nombre} {self.tipo}"]
+        for sufijo, nombres, valores, valor in self.muestras():
+            lineas.append(f"{self.nombre}{sufijo}{_formatear_etiquetas(nombres, valores)} "
+                          f"{_formatear_numero(valor)}")
+        return lineas
+
+
+class Contador(_Metrica):
+    """Contador monótono por combinación de etiquetas."""
+
+    tipo = 'counter'
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        super().__init__(nombre, ayuda, etiquetas)
+        self._valores = {}
+
+    def inc(self, cantidad=1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._bloqueo:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+    def valor(self, **etiquetas):
+        return self._valores.get(self._clave(etiquetas), 0)
+
+    def muestras(self):
+        with self._bloqueo:
+            valores = sorted(self._valores.items())
+        return [('', self.etiquetas, clave, valor) for clave, valor in valores]
+
+
+class Histograma(_Metrica):
+    """Histograma acumulado por combinación de etiquetas."""
+
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), cubetas=CUBETAS):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.cubetas = tuple(sorted(cubetas))
+        self._series = {}
+
+    def observar(self, valor, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._bloqueo:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [[0] * len(self.cubetas), 0, 0.0]
+            for i, limite in enumerate(self.cubetas):
+                if valor <= limite:
+                    serie[0][i] += 1
+            serie[1] += 1
+            serie[2] += valor
+
+    @contextlib.contextmanager
+    def medir(self, **etiquetas):
+        """Observa la duración del bloque `with`, aunque termine con error."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **etiquetas)
+
+    def cuenta(self, **etiquetas):
+        serie = self._series.get(self._clave(etiquetas))
+        return serie[1] if serie is not None else 0
+
+    def muestras(self):
+        with self._bloqueo:
+            series = sorted((clave, (list(s[0]), s[1], s[2]))
+                            for clave, s in self._series.items())
+        nombres_le = self.etiquetas + ('le',)
+        muestras = []
+        for clave, (cubetas, cuenta, suma) in series:
+            for limite, acumulado in zip(self.cubetas, cubetas):
+                muestras.append(('_bucket', nombres_le, clave + (_formatear_numero(limite),),
+                                 acumulado))
+            muestras.append(('_bucket', nombres_le, clave + ('+Inf',), cuenta))
+            muestras.append(('_sum', self.etiquetas, clave, suma))
+            muestras.append(('_count', self.etiquetas, clave, cuenta))
+        return muestras
+
+
+class Medidor(_Metrica):
+    """
+    Valor instantáneo calculado al exponer.
+
+    Args:
+        funcion (callable): Devuelve un número, None (sin muestra) o, si hay
+            etiquetas, un dict {valores de etiqueta (tuple): número}.
+    """
+
+    tipo = 'gauge'
+
+    def __init__(self, nombre, ayuda, funcion, etiquetas=()):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.funcion = funcion
+
+    def muestras(self):
+        try:
+            valor = self.funcion()
+        except Exception as e:
+            if os.getenv('DEBUG_PWAT') == '1':
+                print(f"No se pudo calcular la métrica {self.nombre}: {e}")
+            return []
+        if valor is None:
+            return []
+        if not self.etiquetas:
+            return [('', (), (), valor)]
+        return [('', self.etiquetas,
+                 tuple(map(str, clave if isinstance(clave, tuple) else (clave,))), v)
+                for clave, v in sorted(valor.items()) if v is not None]
+
+
+class Registro:
+    """Conjunto de métricas de un proceso."""
+
+    def __init__(self):
+        self._metricas = {}
+        self._bloqueo = threading.Lock()
+
+    def _agregar(self, metrica, reemplazar=False):
+        with self._bloqueo:
+            existente = self._metricas.get(metrica.nombre)
+            if existente is not None and not reemplazar:
+                if type(existente) is not type(metrica) or existente.etiquetas != metrica.etiquetas:
+                    raise ValueError(f"La métrica {metrica.nombre} ya existe con otra definición")
+                return existente
+            self._metricas[metrica.nombre] = metrica
+            return metrica
+
+    def contador(self, nombre, ayuda, etiquetas=()):
+        return self._agregar(Contador(nombre, ayuda, etiquetas))
+
+    def histograma(self, nombre, ayuda, etiquetas=(), cubetas=CUBETAS):
+        return self._agregar(Histograma(nombre, ayuda, etiquetas, cubetas))
+
+    def medidor(self, nombre, ayuda, funcion, etiquetas=()):
+        """Registra (o reemplaza) un medidor calculado por `funcion`."""
+        return self._agregar(Medidor(nombre, ayuda, funcion, etiquetas), reemplazar=True)
+
+    def exponer(self):
+        """Texto de todas las métricas en el formato de exposición de Prometheus."""
+        with self._bloqueo:
+            metricas = list(self._metricas.values())
+        lineas = []
+        for metrica in metricas:
+            lineas.extend(metrica.exponer())
+        return '\n'.join(lineas) + '\n'
+
+
+def rss_bytes():
+    """Memoria residente actual del proceso, o None si no se puede leer."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def servir_http(registro, puerto, host='127.0.0.1'):
+    """
+    Expone `registro` en http://host:puerto/metrics desde un hilo daemon.
+
+    Args:
+        registro (Registro): Métricas a exponer.
+        puerto (int): Puerto TCP (0 = uno libre, ver server_address).
+        host (str): Interfaz; por defecto solo local.
+
+    Returns:
+        ThreadingHTTPServer: El servidor, para cerrarlo con shutdown().
+    """
+    class Manejador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+                self.send_error(404)
+                return
+            cuerpo = registro.exponer().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', TIPO_CONTENIDO)
+            self.send_header('Content-Length', str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, formato, *args):
+            if os.getenv('DEBUG_PWAT') == '1':
+                super().log_message(formato, *args)
+
+    servidor = ThreadingHTTPServer((host, puerto), Manejador)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, name='metricas', daemon=True).start()
+    return servidor
@@ -0,0 +1,185 @@
+"""
+Renderizado de superposiciones imagen/máscara/predicción sin matplotlib.
+
+Genera, con composición directa en NumPy, un panel por imagen con:
+
+    original | superposición | predicción | [postprocesada] | [verdadera]
+
+En la superposición la máscara verdadera se pinta en verde, la predicha en
+rojo y su intersección en amarillo. Los paneles se escriben en lote con un
+pool de procesos, pensado para revisiones de QA en servidores sin pantalla.
+
+Uso:
+    python overlays.py --imgs predicts/imgs --pred predicts/masks \\
+        [--gt verdad/] --salida revision/ --procesos 8
+"""
+import argparse
+import json
+import os
+from multiprocessing import Pool
+
+import numpy as np
+from PIL import Image
+
+from preprocesamiento import (archivos_por_nombre, load_and_preprocess_mask,
+                              load_image_uint8)
+
+VERDE = np.array([0, 255, 0], dtype=np.uint16)
+ROJO = np.array([255, 0, 0], dtype=np.uint16)
+AMARILLO = np.array([255, 255, 0], dtype=np.uint16)
+ALFA = 0.45
+
+
+def a_uint8(imagen):
+    """Convierte una imagen en [0, 1] (o ya uint8) a uint8."""
+    imagen = np.asarray(imagen)
+    if imagen.dtype == np.uint8:
+        return imagen
+    return np.clip(imagen * 255.0 + 0.5, 0, 255).astype(np.uint8)
+
+
+def a_rgb(mascara):
+    """Convierte una máscara (H, W) o (H, W, 1) en una imagen RGB uint8."""
+    mascara = np.asarray(mascara)
+    gris = a_uint8(mascara.reshape(mascara.shape[:2]))
+    return np.repeat(gris[:, :, None], 3, axis=2)
+
+
+def superponer(imagen, verdad=None, prediccion=None, alfa=ALFA):
+    """
+    Pinta las máscaras sobre la imagen con mezcla alfa en aritmética entera.
+
+    Args:
+        imagen (np.array): Imagen RGB uint8 (H, W, 3).
+        verdad (np.array): Máscara verdadera binaria, opcional.
+        prediccion (np.array): Máscara predicha binaria, opcional.
+        alfa (float): Opacidad del color de las máscaras.
+
+    Returns:
+        np.array: Imagen RGB uint8 con las máscaras superpuestas.
+    """
+    salida = imagen.astype(np.uint16)
+    forma = imagen.shape[:2]
+    v = (np.asarray(verdad).reshape(forma) > 0.5 if verdad is not None
+         else np.zeros(forma, bool))
+    p = (np.asarray(prediccion).reshape(forma) > 0.5 if prediccion is not None
+         else np.zeros(forma, bool))
+    peso = int(round(alfa * 256))
+    for zona, color in ((v & ~p, VERDE), (p & ~v, ROJO), (v & p, AMARILLO)):
+        if zona.any():
+            salida[zona] = (salida[zona] * (256 - peso) + color * peso) >> 8
+    return salida.astype(np.uint8)
+
+
+def componer_panel(imagen, verdad=None, prediccion=None, postprocesada=None):
+    """
+    Compone el panel de revisión de una imagen.
+
+    Args:
+        imagen (np.array): Imagen RGB, uint8 o float en [0, 1].
+        verdad (np.array): Máscara verdadera, opcional.
+        prediccion (np.array): Mapa o máscara de predicción.
+        postprocesada (np.array): Máscara binarizada; si falta se usa
+            `prediccion`.
+
+    Returns:
+        np.array: Panel RGB uint8 con los cuadros uno al lado del otro.
+    """
+    imagen = a_uint8(imagen)
+    if postprocesada is None:
+        postprocesada = prediccion
+    cuadros = [imagen, superponer(imagen, verdad, postprocesada)]
+    if prediccion is not None:
+        cuadros.append(a_rgb(prediccion))
+    if postprocesada is not None and postprocesada is not prediccion:
+        cuadros.append(a_rgb(postprocesada))
+    if verdad is not None:
+        cuadros.append(a_rgb(verdad))
+    return np.concatenate(cuadros, axis=1)
+
+
+def guardar_panel(panel, ruta):
+    """Guarda un panel RGB uint8 (el formato lo decide la extensión)."""
+    Image.fromarray(panel, mode='RGB').save(ruta)
+
+
+def renderizar_item(item, target_size=(256, 256)):
+    """
+    Carga, compone y guarda el panel de un elemento del lote.
+
+    Args:
+        item (tuple): (nombre, ruta_imagen, ruta_prediccion, ruta_verdad|None,
+            ruta_salida).
+
+    Returns:
+        dict: {'imagen', 'salida'} o {'imagen', 'error'}.
+    """
+    nombre, ruta_imagen, ruta_pred, ruta_gt, ruta_salida = item
+    imagen = load_image_uint8(ruta_imagen, target_size=target_size)
+    prediccion = load_and_preprocess_mask(ruta_pred, target_size=target_size)
+    verdad = (load_and_preprocess_mask(ruta_gt, target_size=target_size)
+              if ruta_gt else None)
+    if imagen is None or prediccion is None or (ruta_gt and verdad is None):
+        return {'imagen': nombre, 'error': 'No se pudo cargar la entrada'}
+    guardar_panel(componer_panel(imagen, verdad, prediccion), ruta_salida)
+    return {'imagen': nombre, 'salida': ruta_salida}
+
+
+def preparar_lote(dir_imgs, dir_pred, dir_salida, dir_gt=None, formato='png'):
+    """
+    Empareja imágenes, predicciones y (opcionalmente) verdades por nombre.
+
+    Returns:
+        list: Elementos listos para renderizar_item().
+    """
+    os.makedirs(dir_salida, exist_ok=True)
+    imagenes = archivos_por_nombre(dir_imgs)
+    predicciones = archivos_por_nombre(dir_pred)
+    verdades = archivos_por_nombre(dir_gt) if dir_gt else {}
+    lote = []
+    for nombre, ruta_pred in predicciones.items():
+        if nombre not in imagenes or (dir_gt and nombre not in verdades):
+            continue
+        lote.append((nombre, imagenes[nombre], ruta_pred, verdades.get(nombre),
+                     os.path.join(dir_salida, f"{nombre}_revision.{formato}")))
+    return lote
+
+
+def renderizar_lote(lote, procesos=None, chunksize=16):
+    """
+    Renderiza un lote en un pool de procesos.
+
+    Yields:
+        dict: Resultado de renderizar_item() por cada elemento.
+    """
+    if procesos == 1:
+        for item in lote:
+            yield renderizar_item(item)
+        return
+    with Pool(processes=procesos) as pool:
+        yield from pool.imap_unordered(renderizar_item, lote, chunksize)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--imgs', required=True, help='Directorio de imágenes')
+    parser.add_argument('--pred', required=True, help='Directorio de máscaras predichas')
+    parser.add_argument('--gt', default=None, help='Directorio de máscaras verdaderas')
+    parser.add_argument('--salida', required=True, help='Directorio de salida')
+    parser.add_argument('--formato', default='png', choices=['png', 'jpg'])
+    parser.add_argument('--procesos', type=int, default=None)
+    args = parser.parse_args()
+
+    lote = preparar_lote(args.imgs, args.pred, args.salida, args.gt, args.formato)
+    escritos = errores = 0
+    for resultado in renderizar_lote(lote, procesos=args.procesos):
+        if 'error' in resultado:
+            errores += 1
+        else:
+            escritos += 1
+    print(json.dumps({'paneles': escritos, 'errores': errores,
+                      'salida': args.salida}))
+
+
+if __name__ == '__main__':
+    main()
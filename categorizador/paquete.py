@@ -0,0 +1,251 @@
+"""
+Paquetes de imágenes preredimensionadas para los trabajos por lotes.
+
+Un paquete es un directorio con arreglos uint8 ya decodificados y
+redimensionados, repartidos en trozos que se abren como mapas de memoria:
+
+    indice.json           archivos originales, tamaño y trozos
+    imagenes_00000.npy    (n, H, W, 3) como load_image_uint8(), para segmentar
+    grises_00000.npy      (n, H, W) gris redimensionado como en
+                          radiomica.preparar_entradas(), para puntuar
+    mascaras_00000.npy    (n, H, W) máscara binaria 0/1, opcional
+
+Leer un lote es tomar un corte de un trozo: sin abrir archivos sueltos, sin
+decodificar y sin copiar. Los lotes nunca cruzan trozos.
+
+Uso:
+    python paquete.py --imgs predicts/imgs [--masks predicts/masks] \\
+        --salida imgs.paquete [--por_trozo 256] [--procesos N]
+"""
+import argparse
+import json
+import os
+from multiprocessing import Pool
+
+import cv2
+import numpy as np
+
+from preprocesamiento import archivos_por_nombre, load_image_uint8
+
+INDICE = 'indice.json'
+VERSION = 1
+CAMPOS = ('imagenes', 'grises', 'mascaras')
+
+
+def es_paquete(ruta):
+    """Indica si `ruta` es un paquete completo (su índice se escribe al final)."""
+    return os.path.isfile(os.path.join(ruta, INDICE))
+
+
+def preparar_item(item):
+    """
+    Decodifica y redimensiona una imagen (y su máscara).
+
+    Args:
+        item (tuple): (ruta_imagen, ruta_mascara o None, tamano).
+
+    Returns:
+        dict: {'imagenes', 'grises', 'mascaras'} o {'error'}.
+    """
+    ruta_imagen, ruta_mascara, tamano = item
+    imagen = load_image_uint8(ruta_imagen, target_size=tamano)
+    gris = cv2.imread(ruta_imagen, cv2.IMREAD_GRAYSCALE)
+    if imagen is None or gris is None:
+        return {'error': 'No se pudo decodificar la imagen'}
+    resultado = {'imagenes': imagen, 'grises': cv2.resize(gris, tamano)}
+    if ruta_mascara is not None:
+        mascara = cv2.imread(ruta_mascara, cv2.IMREAD_GRAYSCALE)
+        if mascara is None:
+            return {'error': 'No se pudo decodificar la máscara'}
+        resultado['mascaras'] = cv2.resize((mascara > 0).astype(np.uint8), tamano,
+                                           interpolation=cv2.INTER_NEAREST)
+    return resultado
+
+
+def _guardar_npy(ruta, arreglo):
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, 'wb') as f:
+        np.save(f, arreglo)
+    os.replace(temporal, ruta)
+
+
+def _borrar_trozos_sobrantes(salida, campos, trozos):
+    """
+    Borra los trozos de un paquete anterior: los de número >= `trozos` y
+    los de campos que el paquete nuevo no tiene (p. ej. mascaras).
+    """
+    for nombre in os.listdir(salida):
+        campo, _, resto = nombre.rpartition('_')
+        numero = resto[:-len('.npy')]
+        if (campo in CAMPOS and resto.endswith('.npy') and numero.isdigit()
+                and (campo not in campos or int(numero) >= trozos)):
+            os.remove(os.path.join(salida, nombre))
+
+
+def _preparar_todos(items, procesos, chunksize=16):
+    if procesos == 1:
+        for item in items:
+            yield preparar_item(item)
+        return
+    with Pool(processes=procesos) as pool:
+        yield from pool.imap(preparar_item, items, chunksize)
+
+
+def empaquetar(dir_imgs, salida, dir_masks=None, por_trozo=256,
+               tamano=(256, 256), procesos=None):
+    """
+    Convierte un directorio de imágenes (y sus máscaras) en un paquete.
+
+    Args:
+        dir_imgs (str): Directorio de imágenes.
+        salida (str): Directorio del paquete (se crea). Si ya contiene un
+            paquete, se reemplaza: su índice se borra antes de escribir el
+            primer trozo y los trozos que sobran se borran al final.
+        dir_masks (str): Directorio de máscaras, emparejadas por nombre base.
+            Las imágenes sin máscara no se incluyen.
+        por_trozo (int): Imágenes por trozo.
+        tamano (tuple): (ancho, alto) de los arreglos.
+        procesos (int): Procesos para decodificar (1 = en este proceso).
+
+    Returns:
+        dict: El índice del paquete.
+    """
+    imagenes = archivos_por_nombre(dir_imgs)
+    mascaras = archivos_por_nombre(dir_masks) if dir_masks else {}
+    omitidos = [n for n in imagenes if dir_masks and n not in mascaras]
+    rutas = [(ruta, mascaras.get(nombre) if dir_masks else None)
+             for nombre, ruta in imagenes.items() if nombre not in omitidos]
+    os.makedirs(salida, exist_ok=True)
+    # Sin índice, nadie lee una mezcla de trozos viejos y nuevos
+    if es_paquete(salida):
+        os.remove(os.path.join(salida, INDICE))
+
+    campos = CAMPOS if dir_masks else CAMPOS[:2]
+    indice = {'version': VERSION, 'tamano': list(tamano), 'campos': list(campos),
+              'archivos': [], 'trozos': [], 'errores': {},
+              'sin_mascara': [os.path.basename(imagenes[n]) for n in omitidos]}
+
+    def cerrar_trozo(pendientes):
+        numero = len(indice['trozos'])
+        for campo in campos:
+            _guardar_npy(os.path.join(salida, f"{campo}_{numero:05d}.npy"),
+                         np.stack([p[campo] for p in pendientes]))
+        indice['trozos'].append(len(pendientes))
+
+    items = [(ruta, ruta_mascara, tuple(tamano)) for ruta, ruta_mascara in rutas]
+    pendientes = []
+    for (ruta, _), resultado in zip(rutas, _preparar_todos(items, procesos)):
+        if 'error' in resultado:
+            indice['errores'][os.path.basename(ruta)] = resultado['error']
+            continue
+        indice['archivos'].append(os.path.basename(ruta))
+        pendientes.append(resultado)
+        if len(pendientes) == por_trozo:
+            cerrar_trozo(pendientes)
+            pendientes = []
+    if pendientes:
+        cerrar_trozo(pendientes)
+    _borrar_trozos_sobrantes(salida, campos, len(indice['trozos']))
+
+    # El índice va al final: sin él el paquete no se considera completo
+    temporal = os.path.join(salida, f"{INDICE}.{os.getpid()}.tmp")
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(indice, f, indent=2)
+    os.replace(temporal, os.path.join(salida, INDICE))
+    return indice
+
+
+class Paquete:
+    """
+    Lectura de un paquete mediante mapas de memoria de solo lectura.
+
+    Args:
+        ruta (str): Directorio del paquete.
+    """
+
+    def __init__(self, ruta):
+        if not es_paquete(ruta):
+            raise ValueError(f"{ruta} no es un paquete (falta {INDICE})")
+        self.ruta = ruta
+        with open(os.path.join(ruta, INDICE), encoding='utf-8') as f:
+            self.indice = json.load(f)
+        if self.indice.get('version') != VERSION:
+            raise ValueError(f"Versión de paquete no soportada: {self.indice.get('version')}")
+        self.archivos = self.indice['archivos']
+        self.nombres = [os.path.splitext(a)[0] for a in self.archivos]
+        self.tamano = tuple(self.indice['tamano'])
+        self.tiene_mascaras = 'mascaras' in self.indice['campos']
+        self._posiciones = {nombre: i for i, nombre in enumerate(self.nombres)}
+        self._inicios = np.cumsum([0] + self.indice['trozos']).tolist()
+        self._mapas = {}
+
+    def __len__(self):
+        return len(self.archivos)
+
+    def trozo(self, numero):
+        """
+        Arreglos de un trozo, mapeados en memoria.
+
+        Returns:
+            dict: {campo: np.memmap} para cada campo del paquete.
+        """
+        mapas = self._mapas.get(numero)
+        if mapas is None:
+            mapas = {campo: np.load(os.path.join(self.ruta, f"{campo}_{numero:05d}.npy"),
+                                    mmap_mode='r')
+                     for campo in self.indice['campos']}
+            self._mapas[numero] = mapas
+        return mapas
+
+    def lotes(self, tamano_lote):
+        """
+        Recorre el paquete en lotes de hasta `tamano_lote` imágenes.
+
+        Yields:
+            tuple: (archivos, imagenes, grises, mascaras), donde los
+            arreglos son vistas del mapa de memoria (mascaras es None si el
+            paquete no las tiene).
+        """
+        for numero, cantidad in enumerate(self.indice['trozos']):
+            mapas = self.trozo(numero)
+            base = self._inicios[numero]
+            for inicio in range(0, cantidad, tamano_lote):
+                fin = min(inicio + tamano_lote, cantidad)
+                yield (self.archivos[base + inicio:base + fin],
+                       mapas['imagenes'][inicio:fin], mapas['grises'][inicio:fin],
+                       mapas['mascaras'][inicio:fin] if self.tiene_mascaras else None)
+
+    def item(self, nombre):
+        """
+        Arreglos de una imagen por su nombre base.
+
+        Returns:
+            dict: {campo: vista (H, W[, 3])}.
+        """
+        posicion = self._posiciones[nombre]
+        numero = int(np.searchsorted(self._inicios, posicion, side='right')) - 1
+        mapas = self.trozo(numero)
+        return {campo: mapa[posicion - self._inicios[numero]] for campo, mapa in mapas.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--imgs', required=True, help='Directorio de imágenes')
+    parser.add_argument('--masks', default=None, help='Directorio de máscaras (opcional)')
+    parser.add_argument('--salida', required=True, help='Directorio del paquete')
+    parser.add_argument('--por_trozo', type=int, default=256)
+    parser.add_argument('--tamano', type=int, nargs=2, default=[256, 256],
+                        metavar=('ANCHO', 'ALTO'))
+    parser.add_argument('--procesos', type=int, default=None)
+    args = parser.parse_args()
+
+    indice = empaquetar(args.imgs, args.salida, dir_masks=args.masks,
+                        por_trozo=args.por_trozo, tamano=tuple(args.tamano),
+                        procesos=args.procesos)
+    print(json.dumps({'imagenes': len(indice['archivos']), 'trozos': len(indice['trozos']),
+                      'errores': len(indice['errores']),
+                      'sin_mascara': len(indice['sin_mascara'])}))
+
+
+if __name__ == '__main__':
+    main()
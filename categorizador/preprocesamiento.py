@@ -0,0 +1,119 @@
+"""
+Carga y preprocesamiento de imágenes y máscaras.
+
+No depende de TensorFlow, de modo que las herramientas de evaluación y
+revisión pueden usarlo sin cargar el modelo de segmentación.
+"""
+import os
+import sys
+
+from PIL import Image
+import numpy as np
+
+EXTENSIONES_IMAGEN = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+
+
+def load_and_preprocess_image(image_path, target_size=(256, 256)):
+    """
+    Carga y preprocesa una imagen.
+
+    Args:
+        image_path (str): Ruta a la imagen.
+        target_size (tuple): Tamaño al que redimensionar la imagen.
+
+    Returns:
+        np.array: Imagen preprocesada.
+    """
+    try:
+        img = Image.open(image_path).convert('RGB')
+    except Exception as e:
+        # stderr: en el modo servir stdout es el canal de respuestas JSON
+        print(f"Error al abrir la imagen {image_path}: {e}", file=sys.stderr)
+        return None
+    img = img.resize(target_size)
+    img = np.array(img)
+    img = img / 255.0  # Normalización
+    return img
+
+
+def load_image_uint8(image_path, target_size=(256, 256)):
+    """
+    Carga una imagen RGB redimensionada sin normalizar (uint8).
+
+    Args:
+        image_path (str): Ruta a la imagen.
+        target_size (tuple): Tamaño al que redimensionar la imagen.
+
+    Returns:
+        np.array: Imagen uint8 (H, W, 3), o None si no se pudo abrir.
+    """
+    try:
+        img = Image.open(image_path).convert('RGB')
+    except Exception as e:
+        print(f"Error al abrir la imagen {image_path}: {e}", file=sys.stderr)
+        return None
+    return np.asarray(img.resize(target_size), dtype=np.uint8)
+
+
+def cargar_lote_uint8(rutas, target_size=(256, 256)):
+    """
+    Carga varias imágenes en un único arreglo uint8 preasignado, listo para
+    el modelo envuelto con la normalización en el grafo.
+
+    Args:
+        rutas (list): Rutas de las imágenes.
+        target_size (tuple): Tamaño al que redimensionar las imágenes.
+
+    Returns:
+        tuple: (lote, validas) con el arreglo (N, H, W, 3) uint8 de las
+        imágenes que se pudieron abrir y sus índices en `rutas`.
+    """
+    lote = np.empty((len(rutas), target_size[1], target_size[0], 3), dtype=np.uint8)
+    validas = []
+    for i, ruta in enumerate(rutas):
+        imagen = load_image_uint8(ruta, target_size=target_size)
+        if imagen is not None:
+            lote[len(validas)] = imagen
+            validas.append(i)
+    return lote[:len(validas)], validas
+
+
+def load_and_preprocess_mask(mask_path, target_size=(256, 256)):
+    """
+    Carga y preprocesa una máscara.
+
+    Args:
+        mask_path (str): Ruta a la máscara.
+        target_size (tuple): Tamaño al que redimensionar la máscara.
+
+    Returns:
+        np.array: Máscara preprocesada.
+    """
+    try:
+        mask = Image.open(mask_path).convert('L')  # Escala de grises
+    except Exception as e:
+        print(f"Error al abrir la máscara {mask_path}: {e}", file=sys.stderr)
+        return None
+    mask = mask.resize(target_size)
+    mask = np.array(mask)
+    mask = (mask > 127).astype(np.float32)  # Binarización
+    mask = np.expand_dims(mask, axis=-1)
+    return mask
+
+
+def archivos_por_nombre(directorio):
+    """
+    Indexa las imágenes de un directorio por nombre base (sin extensión).
+
+    Args:
+        directorio (str): Directorio a recorrer (no recursivo).
+
+    Returns:
+        dict: {nombre_base: ruta}, en orden alfabético.
+    """
+    archivos = {}
+    for nombre in sorted(os.listdir(directorio)):
+        base, ext = os.path.splitext(nombre)
+        if ext.lower() in EXTENSIONES_IMAGEN:
+            archivos.setdefault(base, os.path.join(directorio, nombre))
+    return archivos
@@ -0,0 +1,256 @@
+"""
+Extracción de características radiómicas con PyRadiomics.
+
+No depende de TensorFlow: la usan PWAT.py y las herramientas que vuelven a
+puntuar máscaras sin cargar el modelo de segmentación (reumbralizar.py).
+
+Con PWAT_RADIOMICA_PROCESOS=N (N > 1) las clases de características de una
+misma imagen (forma, primer orden, GLCM, GLRLM, GLSZM, GLDM, NGTDM) se
+calculan a la vez en N procesos y se combinan en el mismo orden que da la
+extracción en serie. Por defecto (0) la extracción sigue en serie hasta
+tener mediciones de benchmarks/bench_radiomica.py en el hardware de
+producción.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import cv2
+import numpy as np
+import pandas as pd
+import radiomics
+import radiomics.featureextractor
+import SimpleITK as sitk
+
+# Claves de diagnóstico que no son características
+keys_to_exclude = [
+    'diagnostics_Versions_PyRadiomics',
+    'diagnostics_Versions_Numpy',
+    'diagnostics_Versions_SimpleITK',
+    'diagnostics_Versions_PyWavelet',
+    'diagnostics_Versions_Python',
+    'diagnostics_Configuration_Settings',
+    'diagnostics_Image-original_Spacing',
+    'diagnostics_Image-original_Size',
+    'diagnostics_Image-original_Mean',
+    'diagnostics_Image-original_Minimum',
+    'diagnostics_Image-original_Maximum',
+    'diagnostics_Mask-original_Hash',
+    'diagnostics_Mask-original_Spacing',
+    'diagnostics_Mask-original_Size',
+    'diagnostics_Configuration_EnabledImageTypes',
+    'diagnostics_Image-original_Hash',
+    'diagnostics_Image-original_Dimensionality',
+    'diagnostics_Mask-original_CenterOfMass',
+    'diagnostics_Mask-original_BoundingBox',
+    'diagnostics_Mask-original_CenterOfMassIndex'
+]
+
+
+def a_sitk(arreglo):
+    """
+    Imagen SimpleITK equivalente a escribir `arreglo` con nrrd.write() y
+    leerlo de vuelta: pynrrd guarda en orden Fortran, por eso se traspone.
+    """
+    return sitk.GetImageFromArray(np.ascontiguousarray(arreglo.T))
+
+
+def preparar_entradas(img, mask):
+    """
+    Valida y redimensiona la imagen y la máscara en gris a 256x256.
+
+    Returns:
+        tuple: (img, mask) uint8, con la máscara binaria 0/1.
+    """
+    # Validar que la máscara no esté vacía
+    if np.max(mask) == 0:
+        raise ValueError(
+            f'La máscara está completamente vacía (todos los pixeles son 0). Verifique que la máscara contenga regiones segmentadas.')
+
+    # Normalizar a máscara binaria con tipo compatible para OpenCV
+    # Evitar tipos int64 que provocan error en cv2.resize (func != 0)
+    mask = (mask > 0).astype(np.uint8)
+
+    img = cv2.resize(img, (256, 256))
+    # Mantener máscara binaria usando interpolación de vecino más cercano
+    mask = cv2.resize(mask, (256, 256), interpolation=cv2.INTER_NEAREST)
+    return img, mask
+
+
+def procesos_por_defecto():
+    """Procesos para la extracción en paralelo (PWAT_RADIOMICA_PROCESOS, 0 = en serie)."""
+    return int(os.getenv('PWAT_RADIOMICA_PROCESOS') or 0)
+
+
+def grupos_de_clases():
+    """
+    Reparte las clases de características habilitadas en tareas
+    independientes, en el orden en que las emite execute(): primero las de
+    forma (una sola tarea) y después las demás.
+
+    Returns:
+        list: Tuplas de nombres de clase.
+    """
+    clases = list(radiomics.featureextractor.RadiomicsFeatureExtractor().enabledFeatures)
+    formas = tuple(c for c in clases if c.startswith('shape'))
+    return ([formas] if formas else []) + [(c,) for c in clases if not c.startswith('shape')]
+
+
+_extractores = {}
+
+
+def _iniciar_trabajador():
+    logging.getLogger('radiomics').setLevel(logging.ERROR)
+    # El paralelismo es entre clases: un solo hilo de ITK por proceso
+    sitk.ProcessObject.SetGlobalDefaultNumberOfThreads(1)
+
+
+def _extraer_grupo(imagen, mascara, clases):
+    """Ejecuta PyRadiomics con solo las clases `clases` habilitadas."""
+    extractor = _extractores.get(clases)
+    if extractor is None:
+        extractor = radiomics.featureextractor.RadiomicsFeatureExtractor()
+        extractor.disableAllFeatures()
+        for clase in clases:
+            extractor.enableFeatureClassByName(clase)
+        _extractores[clases] = extractor
+    return extractor.execute(a_sitk(imagen), a_sitk(mascara))
+
+
+_pool = None
+_procesos_pool = 0
+_bloqueo_pool = threading.Lock()
+
+
+def _contexto_procesos():
+    """
+    Contexto forkserver. El pool se crea de forma perezosa, cuando el
+    proceso ya tiene hilos (servidor, escritor, recarga de modelos), y un
+    fork desde ahí puede heredar un candado tomado por otro hilo. Los
+    trabajadores salen del servidor de forks, que tiene un solo hilo y solo
+    precarga este módulo.
+
+    Igual que con spawn, cada trabajador vuelve a ejecutar el script
+    principal como __mp_main__: su código fuera de
+    `if __name__ == '__main__'` debe ser barato (PWAT.py carga los modelos
+    al primer uso, no al importarse).
+    """
+    contexto = multiprocessing.get_context('forkserver')
+    contexto.set_forkserver_preload([__name__])
+    return contexto
+
+
+def _pool_procesos(procesos):
+    """Pool persistente de procesos (ver _contexto_procesos())."""
+    global _pool, _procesos_pool
+    with _bloqueo_pool:
+        if _pool is None or _procesos_pool != procesos:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(
+                max_workers=procesos, mp_context=_contexto_procesos(),
+                initializer=_iniciar_trabajador)
+            _procesos_pool = procesos
+        return _pool
+
+
+def _descartar_pool(pool):
+    global _pool
+    with _bloqueo_pool:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def ejecutar_extractor(imagen, mascara, procesos=None):
+    """
+    Ejecuta PyRadiomics sobre una imagen y su máscara.
+
+    Args:
+        imagen: Ruta NRRD, imagen SimpleITK o arreglo uint8 (ver a_sitk()).
+        mascara: Igual que `imagen`.
+        procesos (int): Procesos para calcular las clases de características
+            en paralelo (por defecto procesos_por_defecto()). Solo se
+            aplica a arreglos; si el pool falla se extrae en serie.
+
+    Returns:
+        OrderedDict: Resultado de execute(), con las mismas claves y en el
+        mismo orden que la extracción en serie.
+    """
+    procesos = procesos_por_defecto() if procesos is None else procesos
+    if (procesos > 1 and isinstance(imagen, np.ndarray) and isinstance(mascara, np.ndarray)
+            and 'forkserver' in multiprocessing.get_all_start_methods()):
+        pool = _pool_procesos(procesos)
+        try:
+            futuros = [pool.submit(_extraer_grupo, imagen, mascara, grupo)
+                       for grupo in grupos_de_clases()]
+            partes = [futuro.result() for futuro in futuros]
+        except BrokenProcessPool as e:
+            _descartar_pool(pool)
+            if os.getenv('DEBUG_PWAT') == '1':
+                print(f"Pool de PyRadiomics caído, extrayendo en serie: {e}")
+        else:
+            # Los diagnósticos se repiten en cada parte: cuenta la primera
+            resultado = OrderedDict()
+            for parte in partes:
+                for clave, valor in parte.items():
+                    resultado.setdefault(clave, valor)
+            return resultado
+
+    if isinstance(imagen, np.ndarray):
+        imagen, mascara = a_sitk(imagen), a_sitk(mascara)
+    extractor = radiomics.featureextractor.RadiomicsFeatureExtractor()
+    return extractor.execute(imagen, mascara)
+
+
+def extraer_caracteristicas(imagen, mascara, image_id, procesos=None):
+    """
+    Ejecuta PyRadiomics y arma la fila de características que esperan los
+    clasificadores Categoria3-8.
+
+    Args:
+        imagen: Ruta NRRD, imagen SimpleITK o arreglo uint8 de la imagen.
+        mascara: Ruta NRRD, imagen SimpleITK o arreglo uint8 de la máscara.
+        image_id (str): Identificador de la imagen.
+        procesos (int): Ver ejecutar_extractor().
+
+    Returns:
+        pd.DataFrame: Una fila con las características numéricas.
+    """
+    # Silenciar los mensajes no deseados de PyRadiomics
+    logging.getLogger('radiomics').setLevel(logging.ERROR)
+
+    result = ejecutar_extractor(imagen, mascara, procesos=procesos)
+
+    # Filtrar el diccionario 'result'
+    filtered_features = {
+        k: v
+        for k, v in result.items()
+        if k not in keys_to_exclude
+    }
+
+    # Construir el diccionario final
+    filtered_data = {
+        'imagen': image_id,
+        **filtered_features
+    }
+    df = pd.DataFrame([filtered_data])
+
+    # Eliminar columnas no numéricas y de diagnóstico
+    df = df.drop(['imagen'], axis=1)
+
+    # Eliminar las primeras 2 columnas de diagnósticos restantes
+    if len(df.columns) > 2:
+        df = df.drop(df.columns[:2], axis=1)
+
+    # Asegurar que todos los valores sean numéricos
+    for col in df.columns:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    # Rellenar NaN con 0 si los hay
+    df = df.fillna(0)
+    return df
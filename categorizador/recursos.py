@@ -0,0 +1,158 @@
+"""
+Perfil de hilos y núcleos para los procesos PWAT.
+
+TensorFlow, OpenMP (xgboost, sklearn), BLAS y OpenCV crean por defecto un
+hilo por núcleo cada uno. Con varios procesos PWAT a la vez los núcleos se
+sobresuscriben; este módulo fija un presupuesto común para todas las
+librerías a partir de `--hilos`/`--afinidad` o de las variables de entorno
+PWAT_HILOS/PWAT_AFINIDAD.
+
+Las variables de entorno deben aplicarse antes de importar TensorFlow,
+numpy o cv2 (aplicar_entorno); el resto se ajusta una vez importadas las
+librerías (aplicar_librerias) y cargados los modelos (ajustar_modelos).
+"""
+import argparse
+import os
+
+# Variables que leen los runtimes de OpenMP/BLAS/TensorFlow al inicializarse
+VARIABLES_HILOS = [
+    'OMP_NUM_THREADS',
+    'OPENBLAS_NUM_THREADS',
+    'MKL_NUM_THREADS',
+    'NUMEXPR_NUM_THREADS',
+    'VECLIB_MAXIMUM_THREADS',
+    'TF_NUM_INTRAOP_THREADS',
+]
+
+
+def parsear_cpus(texto):
+    """
+    Convierte una lista de CPUs como '0-3,6' en [0, 1, 2, 3, 6].
+
+    Args:
+        texto (str): Rangos y números separados por comas.
+
+    Returns:
+        list: Identificadores de CPU ordenados.
+    """
+    cpus = set()
+    for parte in texto.split(','):
+        parte = parte.strip()
+        if not parte:
+            continue
+        if '-' in parte:
+            inicio, fin = parte.split('-', 1)
+            cpus.update(range(int(inicio), int(fin) + 1))
+        else:
+            cpus.add(int(parte))
+    return sorted(cpus)
+
+
+def agregar_argumentos(parser):
+    """Agrega --hilos y --afinidad a un ArgumentParser."""
+    parser.add_argument('--hilos', type=int, default=None,
+                        help='Hilos por librería (TF, OpenMP, BLAS, OpenCV)')
+    parser.add_argument('--afinidad', default=None,
+                        help="CPUs a las que fijar el proceso, p. ej. '0-3'")
+    return parser
+
+
+def perfil_desde_argv(argv=None, entorno=None):
+    """
+    Construye el perfil de recursos a partir de la línea de comandos o del
+    entorno. La línea de comandos tiene prioridad.
+
+    Args:
+        argv (list): Argumentos (sin el nombre del programa).
+        entorno (dict): Variables de entorno (por defecto os.environ).
+
+    Returns:
+        dict: {'hilos': int|None, 'afinidad': list|None}, o None si no se
+        pidió ningún límite.
+    """
+    entorno = os.environ if entorno is None else entorno
+    parser = agregar_argumentos(argparse.ArgumentParser(add_help=False))
+    args, _ = parser.parse_known_args(argv or [])
+
+    hilos = args.hilos
+    if hilos is None and entorno.get('PWAT_HILOS'):
+        hilos = int(entorno['PWAT_HILOS'])
+    afinidad = args.afinidad or entorno.get('PWAT_AFINIDAD')
+
+    if hilos is None and not afinidad:
+        return None
+    if hilos is not None and hilos < 1:
+        raise ValueError('--hilos debe ser mayor o igual a 1')
+    return {
+        'hilos': hilos,
+        'afinidad': parsear_cpus(afinidad) if afinidad else None,
+    }
+
+
+def aplicar_entorno(perfil):
+    """
+    Fija las variables de hilos y la afinidad de CPU del proceso actual.
+    Debe llamarse antes de importar las librerías numéricas.
+
+    Args:
+        perfil (dict): Resultado de perfil_desde_argv(), o None.
+
+    Returns:
+        dict: El mismo perfil.
+    """
+    if not perfil:
+        return perfil
+    if perfil['hilos'] is not None:
+        for variable in VARIABLES_HILOS:
+            os.environ[variable] = str(perfil['hilos'])
+        # Un solo grupo de operaciones independientes por proceso
+        os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+    if perfil['afinidad'] and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, perfil['afinidad'])
+    return perfil
+
+
+def aplicar_librerias(perfil):
+    """
+    Ajusta los pools de hilos de TensorFlow y OpenCV ya importados.
+    Debe llamarse antes de ejecutar la primera operación de TensorFlow.
+
+    Args:
+        perfil (dict): Resultado de perfil_desde_argv(), o None.
+    """
+    if not perfil or perfil['hilos'] is None:
+        return
+    hilos = perfil['hilos']
+    try:
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(hilos)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    except (ImportError, AttributeError, RuntimeError):
+        # RuntimeError: el runtime de TF ya estaba inicializado
+        pass
+    try:
+        import cv2
+        cv2.setNumThreads(hilos)
+    except (ImportError, AttributeError):
+        pass
+
+
+def ajustar_modelos(perfil, modelos):
+    """
+    Limita los hilos de los clasificadores ya cargados.
+
+    Args:
+        perfil (dict): Resultado de perfil_desde_argv(), o None.
+        modelos (list): Boosters de xgboost o estimadores sklearn/XGBClassifier.
+    """
+    if not perfil or perfil['hilos'] is None:
+        return
+    hilos = perfil['hilos']
+    for modelo in modelos:
+        try:
+            if hasattr(modelo, 'set_param'):
+                modelo.set_param({'nthread': hilos})
+            elif hasattr(modelo, 'n_jobs'):
+                modelo.n_jobs = hilos
+        except Exception:
+            pass
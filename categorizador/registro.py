@@ -0,0 +1,146 @@
+"""
+Registro de modelos con recarga en caliente.
+
+Los procesos de larga duración (servir, vigilar, trabajo) consultan
+periódicamente el tamaño y el mtime de los artefactos del modelo. Cuando
+cambian y se mantienen estables durante dos comprobaciones seguidas (para
+no leer un archivo a medio copiar), la nueva versión se carga, se calienta
+y se valida en un hilo aparte, y solo entonces reemplaza a la vigente.
+
+El reemplazo es un cambio de referencia: quien obtuvo la versión anterior
+con vigente() termina con ella. Si la carga o la validación fallan, se
+sigue sirviendo la versión anterior y esa combinación de archivos no se
+vuelve a intentar hasta que cambie de nuevo.
+"""
+import os
+import threading
+import time
+
+
+def firma_artefactos(artefactos):
+    """
+    Firma barata de un conjunto de archivos.
+
+    Returns:
+        tuple: (ruta, tamaño, mtime_ns) por archivo; None si no existe.
+    """
+    firma = []
+    for ruta in artefactos:
+        try:
+            info = os.stat(ruta)
+            firma.append((ruta, info.st_size, info.st_mtime_ns))
+        except OSError:
+            firma.append((ruta, None, None))
+    return tuple(firma)
+
+
+class RegistroModelos:
+    """
+    Mantiene la versión vigente de los modelos y la recarga al cambiar.
+
+    Args:
+        artefactos (list): Archivos cuyo cambio dispara una recarga.
+        cargar (callable): Devuelve una nueva versión cargada.
+        validar (callable): Recibe la versión cargada y lanza una excepción
+            si no es apta (se usa también para calentarla).
+        vigente: Versión ya cargada al crear el registro.
+        al_cambiar (callable): Se llama con (nueva, anterior) tras el
+            reemplazo.
+        intervalo (float): Segundos entre comprobaciones.
+    """
+
+    def __init__(self, artefactos, cargar, validar=None, vigente=None,
+                 al_cambiar=None, intervalo=5.0):
+        self.artefactos = list(artefactos)
+        self.cargar = cargar
+        self.validar = validar
+        self.al_cambiar = al_cambiar
+        self.intervalo = intervalo
+        self._vigente = vigente
+        self._firma = firma_artefactos(self.artefactos)
+        self._candidata = None
+        self._fallida = None
+        self._bloqueo = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = None
+        self.recargas = 0
+        self.ultimo_error = None
+        self.ultima_recarga_s = None
+
+    def vigente(self):
+        """Versión de los modelos en uso."""
+        return self._vigente
+
+    def comprobar(self):
+        """
+        Comprueba los artefactos una vez y recarga si corresponde.
+
+        Returns:
+            bool: True si se reemplazó la versión vigente.
+        """
+        firma = firma_artefactos(self.artefactos)
+        if firma == self._firma or firma == self._fallida:
+            self._candidata = None
+            return False
+        if firma != self._candidata:
+            # Esperar a la siguiente comprobación por si la copia sigue
+            self._candidata = firma
+            return False
+        self._candidata = None
+        return self._recargar(firma)
+
+    def _recargar(self, firma):
+        inicio = time.perf_counter()
+        try:
+            nueva = self.cargar()
+            if self.validar is not None:
+                self.validar(nueva)
+        except Exception as e:
+            self._fallida = firma
+            self.ultimo_error = f"{type(e).__name__}: {e}"
+            if os.getenv('DEBUG_PWAT') == '1':
+                print(f"Recarga de modelos descartada: {self.ultimo_error}")
+            return False
+        if firma_artefactos(self.artefactos) != firma:
+            # Cambiaron mientras se cargaban: se reintenta con la siguiente
+            return False
+
+        with self._bloqueo:
+            anterior, self._vigente = self._vigente, nueva
+            self._firma = firma
+            self.recargas += 1
+            self.ultimo_error = None
+            self.ultima_recarga_s = round(time.perf_counter() - inicio, 4)
+        if self.al_cambiar is not None:
+            self.al_cambiar(nueva, anterior)
+        if os.getenv('DEBUG_PWAT') == '1':
+            print(f"Modelos recargados en {self.ultima_recarga_s} s")
+        return True
+
+    def iniciar(self):
+        """Comprueba los artefactos cada `intervalo` segundos en un hilo aparte."""
+        if self._hilo is not None:
+            return
+        self._hilo = threading.Thread(target=self._vigilar, name='registro-modelos',
+                                      daemon=True)
+        self._hilo.start()
+
+    def _vigilar(self):
+        while not self._detener.wait(self.intervalo):
+            try:
+                self.comprobar()
+            except Exception as e:
+                if os.getenv('DEBUG_PWAT') == '1':
+                    print(f"Error comprobando los modelos: {e}")
+
+    def detener(self):
+        """Detiene el hilo de comprobación."""
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+
+    def estado(self):
+        """Resumen de las recargas, para estado_modelos()."""
+        return {'recargas': self.recargas, 'ultimo_error': self.ultimo_error,
+                'ultima_recarga_s': self.ultima_recarga_s}
@@ -0,0 +1,222 @@
+"""
+Mapas de probabilidad cuantizados y reumbralizado sin TensorFlow.
+
+predecir_mascara() guarda junto a cada máscara `<nombre>.prob.npz`: el mapa
+de probabilidad del modelo cuantizado a 256 niveles (uint8, cubetas de
+ancho 1/256) y comprimido. Con este módulo se regeneran las máscaras
+binarias de un directorio completo con otro umbral y, opcionalmente, se
+vuelven a calcular las categorías PWAT, sin cargar el modelo de
+segmentación.
+
+Para umbrales múltiplos de 1/256 (0.25, 0.5, 0.75, ...) la máscara
+regenerada es idéntica a la que daría el modelo, salvo probabilidades
+exactamente iguales al umbral; para los demás puede diferir solo en
+píxeles cuya probabilidad cae en la misma cubeta que el umbral.
+
+Uso:
+    python reumbralizar.py --dir predicts/masks --umbral 0.4 \\
+        [--salida otra/] [--puntuar --imgs predicts/imgs] [--informe r.json]
+"""
+import argparse
+import json
+import os
+from multiprocessing import Pool
+
+import numpy as np
+from PIL import Image
+
+SUFIJO = '.prob.npz'
+NIVELES = 256
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def cuantizar(prob):
+    """Cuantiza un mapa de probabilidad en [0, 1] a uint8 (H, W)."""
+    prob = np.asarray(prob, dtype=np.float32)
+    prob = prob.reshape(prob.shape[:2])
+    return np.minimum(np.floor(prob * NIVELES), NIVELES - 1).astype(np.uint8)
+
+
+def descuantizar(cuantizado):
+    """Probabilidad representativa (centro de la cubeta) de cada nivel."""
+    return (cuantizado.astype(np.float32) + 0.5) / NIVELES
+
+
+def ruta_probabilidad(ruta_mascara):
+    """Ruta del mapa de probabilidad que acompaña a una máscara."""
+    return os.path.splitext(ruta_mascara)[0] + SUFIJO
+
+
+def escribir_cuantizado(cuantizado, destino):
+    """
+    Codifica un mapa cuantizado en el formato de `<nombre>.prob.npz`.
+
+    Es la función que recibe escribir_atomico() (PWAT.guardar_probabilidad):
+    `destino` es la ruta temporal, que conserva la extensión .npz.
+    """
+    np.savez_compressed(destino, prob=cuantizado)
+
+
+def cargar_cuantizado(ruta):
+    """Devuelve el mapa cuantizado uint8 (H, W) guardado en `ruta`."""
+    with np.load(ruta) as datos:
+        return datos['prob']
+
+
+def binarizar(cuantizado, umbral=0.5):
+    """Máscara uint8 0/255, equivalente a postprocess_mask() con `umbral`."""
+    return np.where(descuantizar(cuantizado) > umbral, 255, 0).astype(np.uint8)
+
+
+def reumbralizar_item(item):
+    """
+    Regenera la máscara binaria de un mapa de probabilidad.
+
+    Args:
+        item (tuple): (ruta_probabilidad, ruta_salida, umbral).
+
+    Returns:
+        dict: {'imagen', 'mascara', 'pixeles'} o {'imagen', 'error'}.
+    """
+    import escritor
+
+    ruta_prob, ruta_salida, umbral = item
+    nombre = os.path.basename(ruta_prob)[:-len(SUFIJO)]
+    try:
+        mascara = binarizar(cargar_cuantizado(ruta_prob), umbral)
+        # Atómica: el backend puede estar leyendo la máscara anterior
+        escritor.escribir_atomico(
+            ruta_salida, lambda temporal: Image.fromarray(mascara, mode='L').save(temporal),
+            fsync=os.getenv('PWAT_ESCRITOR_FSYNC') != '0')
+    except Exception as e:
+        return {'imagen': nombre, 'error': str(e)}
+    return {'imagen': nombre, 'mascara': ruta_salida,
+            'pixeles': int(np.count_nonzero(mascara))}
+
+
+def preparar_lote(dir_prob, umbral, dir_salida=None, extension='.jpg'):
+    """
+    Lista los mapas de `dir_prob` con la ruta de su nueva máscara (por
+    defecto se reemplazan las máscaras de `dir_prob`).
+
+    Returns:
+        list: Elementos para reumbralizar_item().
+    """
+    dir_salida = dir_salida or dir_prob
+    os.makedirs(dir_salida, exist_ok=True)
+    lote = []
+    for nombre in sorted(os.listdir(dir_prob)):
+        if nombre.endswith(SUFIJO):
+            base = nombre[:-len(SUFIJO)]
+            lote.append((os.path.join(dir_prob, nombre),
+                         os.path.join(dir_salida, base + extension), umbral))
+    return lote
+
+
+def reumbralizar_lote(lote, procesos=None, chunksize=16):
+    """
+    Procesa un lote en un pool de procesos.
+
+    Yields:
+        dict: Resultado de reumbralizar_item() por cada elemento.
+    """
+    if procesos == 1:
+        for item in lote:
+            yield reumbralizar_item(item)
+        return
+    with Pool(processes=procesos) as pool:
+        yield from pool.imap_unordered(reumbralizar_item, lote, chunksize)
+
+
+def puntuar(pares, model_dir):
+    """
+    Calcula las categorías PWAT de pares (imagen, máscara) en disco con
+    PyRadiomics en memoria y los clasificadores Categoria3-8.
+
+    Args:
+        pares (dict): {nombre: (imagen, ruta_mascara)}, donde la imagen es
+            una ruta o el arreglo en gris ya cargado (p. ej. de un paquete).
+        model_dir (str): Directorio con los modelos Categoria3-8.
+
+    Returns:
+        dict: {nombre: {'Cat3': n, ...} o {'error': ...}}.
+    """
+    import cv2
+    import pandas as pd
+
+    import clasificadores
+    import radiomica
+
+    resultados = {}
+    nombres, filas = [], []
+    for nombre, (ruta_imagen, ruta_mascara) in pares.items():
+        try:
+            img = (ruta_imagen if isinstance(ruta_imagen, np.ndarray)
+                   else cv2.imread(ruta_imagen, cv2.IMREAD_GRAYSCALE))
+            mask = cv2.imread(ruta_mascara, cv2.IMREAD_GRAYSCALE)
+            if img is None or mask is None:
+                raise ValueError('No se pudo cargar la imagen o la máscara')
+            img, mask = radiomica.preparar_entradas(img, mask)
+            filas.append(radiomica.extraer_caracteristicas(img, mask, nombre))
+            nombres.append(nombre)
+        except Exception as e:
+            resultados[nombre] = {'error': str(e)}
+
+    if filas:
+        matriz = pd.concat(filas, ignore_index=True).fillna(0).values
+        categorias = clasificadores.predecir_lote(
+            clasificadores.cargar_clasificadores(model_dir), matriz)
+        for nombre, fila in zip(nombres, categorias):
+            resultados[nombre] = clasificadores.a_diccionario(fila)
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--dir', required=True,
+                        help='Directorio con las máscaras y sus .prob.npz')
+    parser.add_argument('--umbral', type=float, required=True)
+    parser.add_argument('--salida', default=None,
+                        help='Directorio de las nuevas máscaras (por defecto --dir)')
+    parser.add_argument('--procesos', type=int, default=None)
+    parser.add_argument('--puntuar', action='store_true',
+                        help='Volver a calcular las categorías PWAT')
+    parser.add_argument('--imgs', default=None,
+                        help='Directorio de imágenes o paquete (obligatorio con --puntuar)')
+    parser.add_argument('--modelos', default=os.path.join(BASE_DIR, 'modelos'))
+    parser.add_argument('--informe', default=None, help='Archivo JSON de salida')
+    args = parser.parse_args()
+    if args.puntuar and not args.imgs:
+        parser.error('--imgs es obligatorio con --puntuar')
+
+    lote = preparar_lote(args.dir, args.umbral, args.salida)
+    mascaras, errores = {}, {}
+    for resultado in reumbralizar_lote(lote, procesos=args.procesos):
+        if 'error' in resultado:
+            errores[resultado['imagen']] = resultado['error']
+        else:
+            mascaras[resultado['imagen']] = resultado['mascara']
+
+    informe = {'umbral': args.umbral, 'mascaras': len(mascaras),
+               'errores': errores}
+    if args.puntuar:
+        from paquete import Paquete, es_paquete
+        from preprocesamiento import archivos_por_nombre
+        if es_paquete(args.imgs):
+            # Gris ya redimensionado: una vista del mapa por imagen
+            paquete = Paquete(args.imgs)
+            imagenes = {nombre: paquete.item(nombre)['grises'] for nombre in paquete.nombres}
+        else:
+            imagenes = archivos_por_nombre(args.imgs)
+        pares = {nombre: (imagenes[nombre], ruta)
+                 for nombre, ruta in mascaras.items() if nombre in imagenes}
+        informe['categorias'] = puntuar(pares, args.modelos)
+
+    if args.informe:
+        with open(args.informe, 'w', encoding='utf-8') as f:
+            json.dump(informe, f, indent=2)
+    print(json.dumps({k: v for k, v in informe.items() if k != 'categorias'}))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+"""
+Protocolo del modo `servir` de PWAT.py: peticiones y respuestas en JSON, una
+por línea, sobre stdin/stdout o un socket Unix.
+
+Una petición lleva la imagen (y en modo `predecir` la máscara) de una de
+estas formas, sin pasar por el directorio predicts/:
+
+    "imagen": "<base64>"                 bytes codificados (JPEG, PNG, ...)
+    "imagen": "<base64>", "imagen_forma": [H, W, 3], "imagen_dtype": "uint8"
+                                         arreglo crudo en orden C
+    "imagen_shm": {"nombre": "...", "forma": [H, W, 3], "dtype": "uint8"}
+                                         arreglo en memoria compartida
+    "image_path": "foto.jpg"             ruta, como en la CLI
+
+Ejemplo:
+
+    {"id": 7, "modo": "mask_precit", "imagen": "/9j/4AAQ...", "devolver_mascara": true}
+    -> {"id": 7, "ok": true, "categorias": {"Cat3": 2, ...}, "mascara": "<base64 PNG>"}
+
+Con "mascara_shm" la máscara (uint8 0/255) se escribe en un bloque de
+memoria compartida del cliente en lugar de devolverse en base64.
+"""
+import base64
+import io
+import json
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python < 3.8
+    shared_memory = None
+
+
+class PeticionInvalida(ValueError):
+    """La petición no trae los campos necesarios o están mal formados."""
+
+
+def _abrir_shm(nombre):
+    """Se conecta a un bloque existente sin que este proceso lo libere al salir."""
+    if shared_memory is None:
+        raise PeticionInvalida('Memoria compartida no disponible en esta versión de Python')
+    try:
+        return shared_memory.SharedMemory(name=nombre, track=False)
+    except TypeError:  # Python < 3.13: desregistrar del resource_tracker
+        bloque = shared_memory.SharedMemory(name=nombre)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(bloque._name, 'shared_memory')
+        except Exception:
+            pass
+        return bloque
+
+
+def leer_shm(descriptor):
+    """
+    Copia un arreglo desde un bloque de memoria compartida.
+
+    Args:
+        descriptor (dict): {'nombre', 'forma', 'dtype'}.
+
+    Returns:
+        np.array: Copia del arreglo (el bloque se cierra al volver).
+    """
+    try:
+        forma = tuple(descriptor['forma'])
+        dtype = np.dtype(descriptor.get('dtype', 'uint8'))
+        bloque = _abrir_shm(descriptor['nombre'])
+    except (KeyError, TypeError) as e:
+        raise PeticionInvalida(f'Descriptor de memoria compartida inválido: {e}')
+    try:
+        return np.ndarray(forma, dtype=dtype, buffer=bloque.buf).copy()
+    finally:
+        bloque.close()
+
+
+def escribir_shm(descriptor, arreglo):
+    """Escribe `arreglo` en el bloque de memoria compartida del cliente."""
+    bloque = _abrir_shm(descriptor['nombre'])
+    try:
+        destino = np.ndarray(arreglo.shape, dtype=arreglo.dtype, buffer=bloque.buf)
+        destino[...] = arreglo
+    finally:
+        bloque.close()
+
+
+def cargar_fuente(peticion, clave):
+    """
+    Obtiene la entrada `clave` ('imagen' o 'mascara') de la petición.
+
+    Returns:
+        bytes | np.array | str | None: Bytes codificados, arreglo crudo,
+        ruta (`{clave}_path` / `image_path`) o None si no viene.
+    """
+    if f'{clave}_shm' in peticion:
+        return leer_shm(peticion[f'{clave}_shm'])
+    if clave in peticion:
+        try:
+            datos = base64.b64decode(peticion[clave], validate=True)
+        except (ValueError, TypeError) as e:
+            raise PeticionInvalida(f"'{clave}' no es base64 válido: {e}")
+        if f'{clave}_forma' in peticion:
+            dtype = np.dtype(peticion.get(f'{clave}_dtype', 'uint8'))
+            return np.frombuffer(datos, dtype=dtype).reshape(peticion[f'{clave}_forma'])
+        return datos
+    ruta = peticion.get(f'{clave}_path') or (clave == 'imagen' and peticion.get('image_path'))
+    return ruta or None
+
+
+def entregar_mascara(mascara, peticion):
+    """
+    Devuelve la máscara como pide el cliente.
+
+    Args:
+        mascara (np.array): Máscara uint8 (H, W) con valores 0/255.
+        peticion (dict): Petición original.
+
+    Returns:
+        dict: Campos a agregar a la respuesta.
+    """
+    if 'mascara_shm' in peticion:
+        escribir_shm(peticion['mascara_shm'], mascara)
+        return {'mascara_forma': list(mascara.shape)}
+    if peticion.get('devolver_mascara'):
+        buffer = io.BytesIO()
+        Image.fromarray(mascara, mode='L').save(buffer, format='PNG')
+        return {'mascara': base64.b64encode(buffer.getvalue()).decode('ascii')}
+    return {}
+
+
+class Servidor:
+    """
+    Atiende peticiones JSON por línea con una función `manejar(peticion)`.
+
+    Args:
+        manejar (callable): Recibe el dict de la petición y devuelve el dict
+            de la respuesta (sin 'id' ni 'ok').
+        max_concurrencia (int): Peticiones atendidas a la vez.
+    """
+
+    def __init__(self, manejar, max_concurrencia=1):
+        self.manejar = manejar
+        self.max_concurrencia = max_concurrencia
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrencia,
+                                        thread_name_prefix='servir')
+        self._cupos = threading.BoundedSemaphore(max_concurrencia)
+
+    def responder(self, linea):
+        """Procesa una línea de petición y devuelve la respuesta (dict)."""
+        identificador = None
+        try:
+            peticion = json.loads(linea)
+            if not isinstance(peticion, dict):
+                raise PeticionInvalida('La petición debe ser un objeto JSON')
+            identificador = peticion.get('id')
+            respuesta = {'id': identificador, 'ok': True}
+            respuesta.update(self.manejar(peticion))
+        except Exception as e:
+            if os.getenv('DEBUG_PWAT') == '1':
+                print(f"Error atendiendo la petición {identificador}: {e}")
+            respuesta = {'id': identificador, 'ok': False, 'error': str(e)}
+        return respuesta
+
+    def atender_flujo(self, entrada, salida):
+        """
+        Atiende un flujo de texto hasta EOF. Las respuestas pueden salir en
+        distinto orden que las peticiones; se asocian por 'id'.
+        """
+        bloqueo = threading.Lock()
+
+        def atender(linea):
+            try:
+                respuesta = json.dumps(self.responder(linea))
+                with bloqueo:
+                    salida.write(respuesta + '\n')
+                    salida.flush()
+            finally:
+                self._cupos.release()
+
+        # Solo se retienen las peticiones en curso (y las que fallaron al
+        # escribir, para relanzar su error al final): el flujo puede durar
+        # lo que dure el proceso
+        pendientes = set()
+        bloqueo_pendientes = threading.Lock()
+
+        def terminar(futuro):
+            if futuro.exception() is None:
+                with bloqueo_pendientes:
+                    pendientes.discard(futuro)
+
+        for linea in entrada:
+            if not linea.strip():
+                continue
+            self._cupos.acquire()
+            futuro = self._pool.submit(atender, linea)
+            with bloqueo_pendientes:
+                pendientes.add(futuro)
+            futuro.add_done_callback(terminar)
+        with bloqueo_pendientes:
+            restantes = list(pendientes)
+        for futuro in restantes:
+            futuro.result()
+
+    def atender_socket(self, ruta):
+        """Escucha en un socket Unix; cada conexión es un flujo de líneas."""
+        if os.path.exists(ruta):
+            os.remove(ruta)
+        servidor = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        servidor.bind(ruta)
+        servidor.listen()
+        try:
+            while True:
+                conexion, _ = servidor.accept()
+                threading.Thread(target=self._atender_conexion, args=(conexion,),
+                                 daemon=True).start()
+        finally:
+            servidor.close()
+            os.remove(ruta)
+
+    def _atender_conexion(self, conexion):
+        with conexion, conexion.makefile('r', encoding='utf-8') as entrada, \
+                conexion.makefile('w', encoding='utf-8') as salida:
+            try:
+                self.atender_flujo(entrada, salida)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Permite importar los módulos de categorizador/ desde las pruebas
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
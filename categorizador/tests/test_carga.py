@@ -0,0 +1,72 @@
+import importlib.util
+import os
+import threading
+import time
+
+import pytest
+
+RUTA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                    "benchmarks", "carga.py")
+spec = importlib.util.spec_from_file_location("carga", RUTA)
+carga = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(carga)
+
+
+class ObjetivoFalso:
+    def __init__(self, fallar=()):
+        self.fallar = set(fallar)
+        self.simultaneas = 0
+        self.max_simultaneas = 0
+        self.bloqueo = threading.Lock()
+
+    def ejecutar(self, par):
+        with self.bloqueo:
+            self.simultaneas += 1
+            self.max_simultaneas = max(self.max_simultaneas, self.simultaneas)
+        time.sleep(0.01)
+        with self.bloqueo:
+            self.simultaneas -= 1
+        if par[0] in self.fallar:
+            raise RuntimeError("falla")
+
+    def rss_pico_kb(self):
+        return 2048
+
+
+def test_percentil_nearest_rank():
+    valores = list(range(1, 101))
+    assert carga.percentil(valores, 50) == 50
+    assert carga.percentil(valores, 99) == 99
+    assert carga.percentil([7], 95) == 7
+    assert carga.percentil([], 50) is None
+
+
+def test_cargar_pares_matches_by_name(tmp_path):
+    (tmp_path / "imgs").mkdir()
+    (tmp_path / "masks").mkdir()
+    for nombre in ("a.jpg", "b.jpg", "notas.txt"):
+        (tmp_path / "imgs" / nombre).write_bytes(b"x")
+    (tmp_path / "masks" / "a.png").write_bytes(b"x")
+
+    pares = carga.cargar_pares(str(tmp_path / "imgs"), str(tmp_path / "masks"))
+    assert [(os.path.basename(i), os.path.basename(m)) for i, m in pares] == [("a.jpg", "a.png")]
+    assert len(carga.cargar_pares(str(tmp_path / "imgs"))) == 2
+
+
+def test_ejecutar_carga_reports_latency_errors_and_respects_concurrency():
+    objetivo = ObjetivoFalso(fallar={"malo.jpg"})
+    pares = [("a.jpg", None), ("malo.jpg", None)]
+
+    informe = carga.ejecutar_carga(objetivo, pares, concurrencia=2, peticiones=10)
+
+    assert informe["peticiones"] == 10
+    assert informe["exitosas"] == 5 and informe["errores"] == 5
+    assert informe["tasa_error"] == pytest.approx(0.5)
+    assert informe["latencia_ms"]["p50"] >= 10
+    assert informe["rss_pico_mb"] == 2.0
+    assert objetivo.max_simultaneas <= 2
+
+
+def test_ejecutar_carga_rejects_empty_input():
+    with pytest.raises(ValueError):
+        carga.ejecutar_carga(ObjetivoFalso(), [])
@@ -0,0 +1,78 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+import duplicados
+
+
+def _foto(semilla, lado=200):
+    generador = np.random.default_rng(semilla)
+    base = generador.random((8, 8, 3)) * 255
+    img = Image.fromarray(base.astype(np.uint8)).resize((lado, lado), Image.BILINEAR)
+    return img
+
+
+def test_phash_is_stable_under_reencoding_and_resizing(tmp_path):
+    original = _foto(1)
+    original.save(tmp_path / "a.png")
+    original.resize((150, 150)).save(tmp_path / "a.jpg", quality=60)
+    _foto(2).save(tmp_path / "b.png")
+
+    h_original = duplicados.phash(str(tmp_path / "a.png"))
+    h_copia = duplicados.phash(str(tmp_path / "a.jpg"))
+    h_otra = duplicados.phash(str(tmp_path / "b.png"))
+
+    assert duplicados.distancia(h_original, h_copia) <= 4
+    assert duplicados.distancia(h_original, h_otra) > 12
+
+
+def test_buscar_matches_brute_force(tmp_path):
+    indice = duplicados.IndicePerceptual(str(tmp_path / "db.sqlite"))
+    azar = random.Random(0)
+    hashes = {f"h{i}": azar.getrandbits(64) for i in range(300)}
+    consulta = azar.getrandbits(64)
+    # Vecinos cercanos con bits repartidos entre varios bloques
+    for i, bits in enumerate([(0,), (5, 20), (1, 17, 33, 49, 60), (3, 19, 35, 51, 2, 63, 40)]):
+        valor = consulta
+        for b in bits:
+            valor ^= 1 << b
+        hashes[f"cerca{i}"] = valor
+    for clave, valor in hashes.items():
+        indice.agregar(valor, clave, f"/imgs/{clave}.jpg")
+
+    encontrados = indice.buscar(consulta, distancia_maxima=6, limite=100)
+    esperados = sorted((duplicados.distancia(consulta, v), k) for k, v in hashes.items()
+                       if duplicados.distancia(consulta, v) <= 6)
+
+    assert [(e["distancia"], e["hash_imagen"]) for e in encontrados] == esperados
+    assert [e["hash_imagen"] for e in encontrados] == ["cerca0", "cerca1", "cerca2"]
+    assert encontrados[0]["ruta_imagen"] == "/imgs/cerca0.jpg"
+
+
+def test_index_persists_and_keeps_block_layout(tmp_path):
+    ruta = str(tmp_path / "db.sqlite")
+    duplicados.IndicePerceptual(ruta, bloques=8).agregar(2**63 + 5, "h", "/x.jpg")
+
+    reabierto = duplicados.IndicePerceptual(ruta)
+
+    assert reabierto.bloques == 8 and len(reabierto) == 1
+    assert reabierto.buscar(2**63 + 4, 1)[0]["hash_imagen"] == "h"
+
+
+def test_pixel_difference_separates_copies_from_other_wounds(tmp_path):
+    original = _foto(1, lado=300)
+    original.save(tmp_path / "a.png")
+    original.resize((220, 220)).save(tmp_path / "a.jpg", quality=70)
+    # Mismo fondo y encuadre, con otra herida en el centro
+    otra = np.asarray(original).copy()
+    otra[100:200, 100:200] = (otra[100:200, 100:200] * 0.3).astype(np.uint8)
+    Image.fromarray(otra).save(tmp_path / "b.png")
+
+    copia = duplicados.diferencia_media(str(tmp_path / "a.png"), str(tmp_path / "a.jpg"))
+    distinta = duplicados.diferencia_media(str(tmp_path / "a.png"), str(tmp_path / "b.png"))
+
+    assert copia <= duplicados.DIFERENCIA_MAXIMA
+    assert distinta > duplicados.DIFERENCIA_MAXIMA
@@ -0,0 +1,104 @@
+import os
+import threading
+
+import pytest
+
+import escritor
+
+
+def test_atomic_write_accepts_bytes_or_function_and_leaves_no_temporaries(tmp_path):
+    ruta = tmp_path / "mascara.jpg"
+    escritor.escribir_atomico(str(ruta), b"jpeg")
+    assert ruta.read_bytes() == b"jpeg"
+
+    # La función recibe una ruta temporal con la misma extensión
+    vistas = []
+
+    def escribir(temporal):
+        vistas.append(temporal)
+        with open(temporal, "wb") as f:
+            f.write(b"nrrd")
+
+    escritor.escribir_atomico(str(tmp_path / "imagen.nrrd"), escribir)
+    assert vistas[0].endswith(".nrrd") and vistas[0] != str(tmp_path / "imagen.nrrd")
+    assert sorted(os.listdir(tmp_path)) == ["imagen.nrrd", "mascara.jpg"]
+
+    def fallar(temporal):
+        open(temporal, "wb").close()
+        raise RuntimeError("a medio escribir")
+
+    with pytest.raises(RuntimeError):
+        escritor.escribir_atomico(str(tmp_path / "roto.jpg"), fallar)
+    assert sorted(os.listdir(tmp_path)) == ["imagen.nrrd", "mascara.jpg"]
+
+
+def test_writer_keeps_order_per_path_and_exposes_pending_bytes(tmp_path):
+    fondo = escritor.Escritor(hilos=3, max_pendientes=8, fsync=False)
+    liberar = threading.Event()
+    ruta = str(tmp_path / "m.jpg")
+
+    def lenta(temporal):
+        liberar.wait(5)
+        with open(temporal, "wb") as f:
+            f.write(b"v1")
+
+    fondo.escribir(ruta, lenta)
+    futuro = fondo.escribir(ruta, b"v2")
+    # Mientras está en cola se puede leer sin esperar al disco
+    assert fondo.pendiente(ruta) == b"v2"
+    assert fondo.en_cola == 2
+
+    memoizado = []
+    fondo.despues_de(ruta, lambda: memoizado.append(open(ruta, "rb").read()))
+    liberar.set()
+    futuro.result(timeout=5)
+    fondo.cerrar()
+
+    assert open(ruta, "rb").read() == b"v2"
+    assert memoizado == [b"v2"]
+    assert fondo.pendiente(ruta) is None and fondo.en_cola == 0
+    assert fondo.escritos == 2 and fondo.errores == 0
+
+
+def test_writer_applies_backpressure_and_reports_errors(tmp_path):
+    fondo = escritor.Escritor(hilos=1, max_pendientes=1, fsync=False)
+    liberar = threading.Event()
+
+    def lenta(temporal):
+        liberar.wait(5)
+        open(temporal, "wb").close()
+
+    fondo.escribir(str(tmp_path / "a.jpg"), lenta)
+    encolada = threading.Event()
+    hilo = threading.Thread(target=lambda: (
+        fondo.escribir(str(tmp_path / "b.jpg"), b"b"), encolada.set()))
+    hilo.start()
+    # La cola está llena: el segundo productor espera
+    assert not encolada.wait(0.2)
+    liberar.set()
+    assert encolada.wait(5)
+    hilo.join()
+
+    fallida = fondo.escribir(str(tmp_path / "no_existe" / "c.jpg"), b"c")
+    llamadas = []
+    fondo.despues_de(str(tmp_path / "no_existe" / "c.jpg"), lambda: llamadas.append(1))
+    with pytest.raises(OSError):
+        fallida.result(timeout=5)
+    fondo.cerrar()
+    assert fondo.errores == 1 and llamadas == []
+    assert (tmp_path / "b.jpg").read_bytes() == b"b"
+
+
+def test_tasks_share_lanes_order_and_flush_with_writes(tmp_path):
+    fondo = escritor.Escritor(hilos=2, max_pendientes=4, fsync=False)
+    orden = []
+    liberar = threading.Event()
+
+    fondo.ejecutar(str(tmp_path / "indice"), lambda: (liberar.wait(5), orden.append(1)))
+    fondo.ejecutar(str(tmp_path / "indice"), lambda: orden.append(2))
+    assert fondo.en_cola == 2
+    liberar.set()
+    fondo.vaciar()
+
+    assert orden == [1, 2] and fondo.en_cola == 0
+    fondo.cerrar()
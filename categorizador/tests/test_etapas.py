@@ -0,0 +1,48 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("PIL.Image")
+pytest.importorskip("cv2")
+
+import etapas
+
+
+def _mapa(forma=(64, 64)):
+    return np.full(forma + (1,), 0.1, dtype=np.float32)
+
+
+def test_caja_herida_maps_to_image_pixels_with_margin():
+    prob = _mapa()
+    prob[20:30, 30:40] = 0.9          # herida de 10x10 celdas
+    prob[2, 2] = 0.9                  # ruido de una celda
+
+    caja = etapas.caja_herida(prob, (640, 480), margen=0.5)
+
+    x0, y0, x1, y1 = caja
+    # 100x75 px en la imagen; lado = 100 * 2 = 200, cuadrado y centrado
+    assert (x1 - x0, y1 - y0) == (200, 200)
+    assert (x0 + x1) / 2 == pytest.approx(350, abs=1)
+    assert (y0 + y1) / 2 == pytest.approx(187.5, abs=1)
+
+
+def test_caja_herida_clamps_to_image_and_skips_large_or_empty():
+    prob = _mapa()
+    prob[0:6, 58:64] = 0.9
+    x0, y0, x1, y1 = etapas.caja_herida(prob, (640, 640))
+    assert x1 == 640 and y0 == 0 and x1 - x0 == y1 - y0
+
+    assert etapas.caja_herida(_mapa(), (640, 640)) is None
+    grande = _mapa()
+    grande[4:60, 4:60] = 0.9
+    assert etapas.caja_herida(grande, (640, 640)) is None
+
+
+def test_componer_pastes_fine_map_into_full_resolution():
+    gruesa = _mapa((8, 8))
+    fina = np.full((16, 16, 1), 0.8, dtype=np.float32)
+
+    prob = etapas.componer(gruesa, fina, (10, 20, 30, 40), (100, 50))
+
+    assert prob.shape == (50, 100, 1)
+    assert np.allclose(prob[20:40, 10:30], 0.8)
+    assert np.allclose(prob[:20], 0.1) and np.allclose(prob[:, 30:], 0.1)
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+import evaluar_segmentacion
+
+
+def _save_mask(path, array):
+    Image.fromarray((array * 255).astype(np.uint8), mode="L").save(path)
+
+
+def test_metricas_desde_conteos_matches_keras_formulas():
+    metricas = evaluar_segmentacion.metricas_desde_conteos(6, 2, 4)
+
+    assert metricas["dice"] == pytest.approx(12 / 18)
+    assert metricas["iou"] == pytest.approx(6 / 12)
+    assert metricas["precision"] == pytest.approx(6 / 8)
+    assert metricas["recall"] == pytest.approx(6 / 10)
+    assert metricas["f1"] == pytest.approx(2 * 0.75 * 0.6 / 1.35)
+
+
+def test_conteos_are_per_image_for_batches():
+    verdad = np.zeros((2, 4, 4, 1))
+    verdad[0, :2] = 1
+    prediccion = np.zeros((2, 4, 4, 1))
+    prediccion[0, :1] = 1
+    prediccion[1, 3] = 1
+
+    tp, fp, fn = evaluar_segmentacion.conteos(verdad, prediccion)
+
+    assert tp.tolist() == [4, 0]
+    assert fp.tolist() == [0, 4]
+    assert fn.tolist() == [4, 0]
+
+
+@pytest.mark.parametrize("procesos", [1, 2])
+def test_evaluar_pairs_by_basename_and_aggregates(tmp_path, procesos):
+    pred_dir = tmp_path / "pred"
+    gt_dir = tmp_path / "gt"
+    pred_dir.mkdir()
+    gt_dir.mkdir()
+
+    full = np.ones((256, 256))
+    half = np.zeros((256, 256))
+    half[:128] = 1
+    _save_mask(pred_dir / "a.jpg", full)
+    _save_mask(gt_dir / "a.png", full)
+    _save_mask(pred_dir / "b.png", half)
+    _save_mask(gt_dir / "b.png", full)
+    _save_mask(pred_dir / "huerfana.png", full)
+
+    pares, sin_verdad = evaluar_segmentacion.emparejar(str(pred_dir), str(gt_dir))
+    assert [p[0] for p in pares] == ["a", "b"]
+    assert sin_verdad == ["huerfana"]
+
+    agregado = evaluar_segmentacion.Agregado()
+    resultados = {}
+    for resultado in evaluar_segmentacion.evaluar(pares, procesos=procesos):
+        agregado.agregar(resultado)
+        resultados[resultado["imagen"]] = resultado
+
+    assert resultados["a"]["dice"] == pytest.approx(1.0)
+    assert resultados["b"]["iou"] == pytest.approx(0.5)
+    resumen = agregado.resumen()
+    assert resumen["imagenes"] == 2
+    assert resumen["media"]["iou"] == pytest.approx(0.75)
+    assert resumen["global"]["recall"] == pytest.approx(0.75)
+    assert json.dumps(resumen)
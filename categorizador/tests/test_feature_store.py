@@ -0,0 +1,129 @@
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import clasificadores
+import feature_store
+
+
+class _ConstantModel:
+    def __init__(self, value):
+        self.value = value
+
+    def predict(self, data):
+        return np.full(len(data), self.value)
+
+
+class _ProbaModel:
+    def predict_proba(self, data):
+        probs = np.zeros((len(data), 4))
+        probs[:, 2] = 1.0
+        return probs
+
+
+class _FailingModel:
+    def predict(self, data):
+        raise RuntimeError("boom")
+
+
+def test_agregar_and_read_back_latest_vector(tmp_path):
+    store = feature_store.FeatureStore(str(tmp_path))
+    store.agregar("a.jpg", ["f1", "f2"], [1.0, 2.0])
+    store.agregar("b.jpg", ["f1", "f2"], [3.0, 4.0])
+    store.agregar("a.jpg", ["f1", "f2"], [5.0, 6.0])
+
+    assert len(store) == 3
+    assert store.columnas == ["f1", "f2"]
+    assert store.buscar("a.jpg").tolist() == [5.0, 6.0]
+    assert store.buscar("missing.jpg") is None
+    ids, rows = store.ultimas()
+    assert ids == ["a.jpg", "b.jpg"]
+    assert rows.tolist() == [2, 1]
+    assert store.matriz().shape == (3, 2)
+
+
+def test_agregar_rejects_mismatched_columns(tmp_path):
+    store = feature_store.FeatureStore(str(tmp_path))
+    store.agregar("a.jpg", ["f1", "f2"], [1.0, 2.0])
+    with pytest.raises(ValueError):
+        store.agregar("b.jpg", ["f1", "f3"], [1.0, 2.0])
+
+
+def test_agregar_overwrites_orphan_row_after_interrupted_write(tmp_path):
+    store = feature_store.FeatureStore(str(tmp_path))
+    store.agregar("a.jpg", ["f1"], [1.0])
+    with open(store.ruta_datos, "ab") as f:
+        f.write(np.array([9.0]).tobytes())
+    with open(store.ruta_indice, "a") as f:
+        f.write('{"id": "trunc')
+
+    store.agregar("b.jpg", ["f1"], [2.0])
+
+    assert store.matriz().tolist() == [[1.0], [2.0]]
+
+
+def test_predecir_lote_decodes_and_falls_back_per_category():
+    modelos = [
+        (3, _ProbaModel(), "xgboost_pkl"),
+        (4, _ConstantModel(4), "sklearn"),
+        (5, _FailingModel(), "sklearn"),
+        (6, _FailingModel(), "sklearn"),
+        (7, _ConstantModel(7), "sklearn"),
+        (8, _ConstantModel(8), "sklearn"),
+    ]
+    fallidas = []
+    resultados = clasificadores.predecir_lote(modelos, np.zeros((2, 3)),
+                                              al_fallar=fallidas.append)
+
+    assert resultados.tolist() == [[3, 4, 1, 3, 7, 8]] * 2
+    assert fallidas == [5, 6]
+    assert clasificadores.a_diccionario(resultados[0]) == {
+        "Cat3": 3, "Cat4": 4, "Cat5": 1, "Cat6": 3, "Cat7": 7, "Cat8": 8}
+
+
+def test_reclasificar_scores_latest_row_of_each_image(tmp_path, monkeypatch):
+    store = feature_store.FeatureStore(str(tmp_path))
+    store.agregar("a.jpg", ["f1"], [1.0])
+    store.agregar("b.jpg", ["f1"], [2.0])
+    store.agregar("a.jpg", ["f1"], [3.0])
+
+    seen = []
+
+    class _EchoModel:
+        def predict(self, data):
+            seen.append(data.ravel().tolist())
+            return data.ravel()
+
+    monkeypatch.setattr(
+        clasificadores, "cargar_clasificadores",
+        lambda model_dir: [(z, _EchoModel(), "sklearn") for z in range(3, 9)])
+
+    resultados = feature_store.reclasificar(store, "unused", tamano_lote=1)
+
+    assert resultados == {
+        "a.jpg": {c: 3 for c in clasificadores.CATEGORIAS},
+        "b.jpg": {c: 2 for c in clasificadores.CATEGORIAS},
+    }
+    assert json.dumps(resultados)
+    assert seen[0] == [3.0]
+
+
+def test_index_is_read_incrementally_and_sees_other_writers(tmp_path):
+    store = feature_store.FeatureStore(str(tmp_path))
+    other = feature_store.FeatureStore(str(tmp_path))
+    store.agregar("a.jpg", ["f1"], [1.0])
+    leido = store._leido
+
+    # Otro proceso agrega: la búsqueda lo ve leyendo solo lo nuevo
+    other.agregar("b.jpg", ["f1"], [2.0])
+    assert store.buscar("b.jpg").tolist() == [2.0]
+    assert store._leido > leido and len(store._entradas) == 2
+
+    # Una línea a medio escribir no se consume hasta completarse
+    with open(store.ruta_indice, "a") as f:
+        f.write('{"id": "c.jpg", "fi')
+    assert len(store) == 2
+    store.agregar("c.jpg", ["f1"], [3.0])
+    assert store.buscar("c.jpg").tolist() == [3.0] and len(store) == 3
@@ -0,0 +1,76 @@
+import memo
+
+
+def test_buscar_returns_saved_result_for_same_key(tmp_path):
+    mascara = tmp_path / "m.jpg"
+    mascara.write_bytes(b"mask")
+    almacen = memo.MemoResultados(str(tmp_path / "db.sqlite"))
+
+    almacen.guardar("h1", "v1", 0.5, str(mascara), {"Cat3": 2})
+
+    assert almacen.buscar("h1", "v1", 0.5) == {
+        "mascara": str(mascara), "categorias": {"Cat3": 2}}
+    assert almacen.buscar("h1", "v1", 0.6) is None
+    assert almacen.buscar("h2", "v1", 0.5) is None
+
+
+def test_buscar_misses_when_mask_changed_or_removed(tmp_path):
+    mascara = tmp_path / "m.jpg"
+    mascara.write_bytes(b"mask")
+    almacen = memo.MemoResultados(str(tmp_path / "db.sqlite"))
+    almacen.guardar("h1", "v1", 0.5, str(mascara), {"Cat3": 2})
+
+    mascara.write_bytes(b"otra mascara")
+    assert almacen.buscar("h1", "v1", 0.5) is None
+    mascara.unlink()
+    assert almacen.buscar("h1", "v1", 0.5) is None
+
+
+def test_version_change_purges_old_entries(tmp_path):
+    modelo = tmp_path / "Categoria4.joblib"
+    modelo.write_bytes(b"v1")
+    mascara = tmp_path / "m.jpg"
+    mascara.write_bytes(b"mask")
+    almacen = memo.MemoResultados(str(tmp_path / "db.sqlite"))
+
+    v1 = almacen.version_modelos([str(modelo), str(tmp_path / "ausente.pkl")])
+    almacen.guardar("h1", v1, 0.5, str(mascara), {"Cat4": 1})
+    assert almacen.version_modelos([str(modelo), str(tmp_path / "ausente.pkl")]) == v1
+    assert len(almacen) == 1
+
+    modelo.write_bytes(b"v2 reentrenado")
+    v2 = almacen.version_modelos([str(modelo), str(tmp_path / "ausente.pkl")])
+
+    assert v2 != v1
+    assert len(almacen) == 0
+
+
+def test_huella_is_reused_across_instances(tmp_path, monkeypatch):
+    modelo = tmp_path / "best_model.keras"
+    modelo.write_bytes(b"pesos")
+    ruta_db = str(tmp_path / "db.sqlite")
+    esperado = memo.MemoResultados(ruta_db).huella(str(modelo))
+
+    monkeypatch.setattr(memo, "hash_archivo", lambda ruta: "no-debe-usarse")
+
+    assert memo.MemoResultados(ruta_db).huella(str(modelo)) == esperado
+
+
+def test_source_image_is_kept_and_old_databases_are_migrated(tmp_path):
+    import sqlite3
+
+    ruta_db = tmp_path / "db.sqlite"
+    with sqlite3.connect(str(ruta_db)) as conexion:
+        conexion.execute(
+            "CREATE TABLE resultados (hash_imagen TEXT NOT NULL, version_modelos TEXT NOT NULL, "
+            "umbral REAL NOT NULL, ruta_mascara TEXT NOT NULL, firma_mascara TEXT NOT NULL, "
+            "categorias TEXT NOT NULL, creado REAL NOT NULL, "
+            "PRIMARY KEY (hash_imagen, version_modelos, umbral))")
+    mascara = tmp_path / "m.jpg"
+    mascara.write_bytes(b"mask")
+
+    almacen = memo.MemoResultados(str(ruta_db))
+    almacen.guardar("h1", "v1", 0.5, str(mascara), {"Cat3": 2},
+                    ruta_imagen="/imgs/herida_1.jpg")
+
+    assert almacen.buscar("h1", "v1", 0.5)["ruta_imagen"] == "/imgs/herida_1.jpg"
@@ -0,0 +1,64 @@
+import urllib.error
+import urllib.request
+
+import pytest
+
+import metricas
+
+
+def test_counters_histograms_and_gauges_use_the_prometheus_text_format():
+    registro = metricas.Registro()
+    peticiones = registro.contador("pwat_peticiones_total", "Peticiones", ("modo", "resultado"))
+    latencia = registro.histograma("pwat_etapa_segundos", "Latencia", ("etapa",),
+                                   cubetas=(0.1, 1.0))
+    registro.medidor("pwat_carga_segundos", "Carga", lambda: {"Categoria3": 0.5},
+                     ("modelo",))
+    registro.medidor("pwat_rss_bytes", "Memoria", lambda: None)
+
+    peticiones.inc(modo="servir_mask_precit", resultado="ok")
+    peticiones.inc(modo="servir_mask_precit", resultado="ok")
+    latencia.observar(0.05, etapa="radiomica")
+    latencia.observar(2.5, etapa="radiomica")
+    with pytest.raises(RuntimeError):
+        with latencia.medir(etapa="segmentacion"):
+            raise RuntimeError("falla")
+
+    texto = registro.exponer()
+    assert '# TYPE pwat_peticiones_total counter' in texto
+    assert 'pwat_peticiones_total{modo="servir_mask_precit",resultado="ok"} 2' in texto
+    assert 'pwat_etapa_segundos_bucket{etapa="radiomica",le="0.1"} 1' in texto
+    assert 'pwat_etapa_segundos_bucket{etapa="radiomica",le="1"} 1' in texto
+    assert 'pwat_etapa_segundos_bucket{etapa="radiomica",le="+Inf"} 2' in texto
+    assert 'pwat_etapa_segundos_sum{etapa="radiomica"} 2.55' in texto
+    assert latencia.cuenta(etapa="segmentacion") == 1
+    assert 'pwat_carga_segundos{modelo="Categoria3"} 0.5' in texto
+    # Un medidor sin valor deja solo la cabecera
+    assert texto.count("pwat_rss_bytes") == 2
+
+    with pytest.raises(ValueError):
+        peticiones.inc(modo="x")
+    assert registro.contador("pwat_peticiones_total", "Peticiones",
+                             ("modo", "resultado")) is peticiones
+
+
+def test_http_endpoint_serves_metrics_with_process_rss():
+    registro = metricas.Registro()
+    registro.contador("pwat_prueba_total", "Prueba").inc()
+    registro.medidor("pwat_proceso_rss_bytes", "Memoria", metricas.rss_bytes)
+    servidor = metricas.servir_http(registro, 0)
+    try:
+        host, puerto = servidor.server_address[:2]
+        with urllib.request.urlopen(f"http://{host}:{puerto}/metrics", timeout=5) as respuesta:
+            assert respuesta.headers["Content-Type"] == metricas.TIPO_CONTENIDO
+            texto = respuesta.read().decode("utf-8")
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"http://{host}:{puerto}/otra", timeout=5)
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+    assert "pwat_prueba_total 1" in texto
+    if metricas.rss_bytes() is not None:
+        muestra = [linea for linea in texto.splitlines()
+                   if linea.startswith("pwat_proceso_rss_bytes ")]
+        assert int(muestra[0].split()[1]) > 0
@@ -0,0 +1,48 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+import overlays
+
+
+def test_superponer_colors_each_region():
+    imagen = np.zeros((1, 3, 3), dtype=np.uint8)
+    verdad = np.array([[1, 1, 0]])
+    prediccion = np.array([[0, 1, 1]])
+
+    resultado = overlays.superponer(imagen, verdad, prediccion, alfa=1.0)
+
+    assert resultado[0, 0].tolist() == [0, 255, 0]
+    assert resultado[0, 1].tolist() == [255, 255, 0]
+    assert resultado[0, 2].tolist() == [255, 0, 0]
+
+
+def test_componer_panel_accepts_normalized_inputs():
+    imagen = np.full((4, 4, 3), 0.5)
+    mascara = np.ones((4, 4, 1), dtype=np.float32)
+
+    panel = overlays.componer_panel(imagen, mascara, mascara * 0.7, mascara)
+
+    assert panel.dtype == np.uint8
+    assert panel.shape == (4, 4 * 5, 3)
+    assert panel[0, 0].tolist() == [128, 128, 128]
+    assert panel[0, 8].tolist() == [179, 179, 179]
+
+
+@pytest.mark.parametrize("procesos", [1, 2])
+def test_renderizar_lote_writes_one_panel_per_pair(tmp_path, procesos):
+    imgs, pred = tmp_path / "imgs", tmp_path / "pred"
+    imgs.mkdir()
+    pred.mkdir()
+    for nombre in ("a", "b"):
+        Image.new("RGB", (64, 32), (10, 20, 30)).save(imgs / f"{nombre}.jpg")
+        Image.new("L", (64, 32), 255).save(pred / f"{nombre}.png")
+    Image.new("RGB", (8, 8)).save(imgs / "sin_mascara.jpg")
+
+    lote = overlays.preparar_lote(str(imgs), str(pred), str(tmp_path / "out"))
+    resultados = list(overlays.renderizar_lote(lote, procesos=procesos))
+
+    assert sorted(r["imagen"] for r in resultados) == ["a", "b"]
+    with Image.open(tmp_path / "out" / "a_revision.png") as panel:
+        assert panel.size == (256 * 3, 256)
@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+Image = pytest.importorskip("PIL.Image")
+
+import paquete  # noqa: E402
+from preprocesamiento import cargar_lote_uint8  # noqa: E402
+
+
+def _imagenes(tmp_path, tamanos):
+    imgs, masks = tmp_path / "imgs", tmp_path / "masks"
+    imgs.mkdir()
+    masks.mkdir()
+    rng = np.random.default_rng(0)
+    for i, (alto, ancho) in enumerate(tamanos):
+        Image.fromarray(rng.integers(0, 256, (alto, ancho, 3), dtype=np.uint8)).save(
+            imgs / f"img{i}.png")
+        mascara = np.zeros((alto, ancho), dtype=np.uint8)
+        mascara[alto // 4:alto // 2, ancho // 3:ancho // 2] = 255
+        cv2.imwrite(str(masks / f"img{i}.png"), mascara)
+    return imgs, masks
+
+
+def test_pack_matches_the_per_file_preprocessing(tmp_path):
+    imgs, masks = _imagenes(tmp_path, [(300, 400), (256, 256), (120, 90)])
+    (imgs / "roto.jpg").write_bytes(b"no es una imagen")
+    salida = tmp_path / "lote.paquete"
+
+    indice = paquete.empaquetar(str(imgs), str(salida), dir_masks=str(masks),
+                                por_trozo=2, procesos=1)
+    assert indice["trozos"] == [2, 1]
+    assert list(indice["errores"]) == [] and indice["sin_mascara"] == ["roto.jpg"]
+    assert json.loads((salida / paquete.INDICE).read_text())["archivos"] == indice["archivos"]
+
+    leido = paquete.Paquete(str(salida))
+    rutas = [str(imgs / archivo) for archivo in leido.archivos]
+    esperadas, _ = cargar_lote_uint8(rutas)
+    for nombre, ruta, esperada in zip(leido.nombres, rutas, esperadas):
+        item = leido.item(nombre)
+        assert np.array_equal(item["imagenes"], esperada)
+        gris = cv2.resize(cv2.imread(ruta, cv2.IMREAD_GRAYSCALE), (256, 256))
+        assert np.array_equal(item["grises"], gris)
+        mascara = cv2.imread(str(masks / f"{nombre}.png"), cv2.IMREAD_GRAYSCALE)
+        assert np.array_equal(item["mascaras"], cv2.resize(
+            (mascara > 0).astype(np.uint8), (256, 256), interpolation=cv2.INTER_NEAREST))
+
+
+def test_batches_are_read_only_views_that_never_cross_chunks(tmp_path):
+    imgs, _ = _imagenes(tmp_path, [(64, 64)] * 5)
+    salida = tmp_path / "lote.paquete"
+    (imgs / "sobra.txt").write_text("ignorado")
+    (imgs / "roto.jpg").write_bytes(b"no es una imagen")
+    indice = paquete.empaquetar(str(imgs), str(salida), por_trozo=3, procesos=1)
+    assert list(indice["errores"]) == ["roto.jpg"]
+
+    leido = paquete.Paquete(str(salida))
+    assert len(leido) == 5 and not leido.tiene_mascaras
+    lotes = list(leido.lotes(2))
+    assert [len(archivos) for archivos, *_ in lotes] == [2, 1, 2]
+    assert sum((archivos for archivos, *_ in lotes), []) == leido.archivos
+
+    _, imagenes, grises, mascaras = lotes[0]
+    assert mascaras is None
+    assert imagenes.shape == (2, 256, 256, 3) and imagenes.dtype == np.uint8
+    assert grises.shape == (2, 256, 256)
+    # Vistas del mapa de memoria del trozo, no copias
+    assert np.shares_memory(imagenes, leido.trozo(0)["imagenes"])
+    assert not imagenes.flags.writeable
+
+
+def test_incomplete_package_is_rejected(tmp_path):
+    (tmp_path / "imagenes_00000.npy").write_bytes(b"")
+    assert not paquete.es_paquete(str(tmp_path))
+    with pytest.raises(ValueError):
+        paquete.Paquete(str(tmp_path))
+
+
+def test_repacking_replaces_the_previous_package(tmp_path, monkeypatch):
+    imgs, masks = _imagenes(tmp_path, [(64, 64)] * 5)
+    salida = tmp_path / "lote.paquete"
+    paquete.empaquetar(str(imgs), str(salida), dir_masks=str(masks), por_trozo=2, procesos=1)
+    for archivo in ("img2.png", "img3.png", "img4.png"):
+        (imgs / archivo).unlink()
+
+    guardar_npy = paquete._guardar_npy
+
+    def guardar_sin_indice(ruta, arreglo):
+        # Mientras se escriben trozos nuevos no queda un índice viejo a la vista
+        assert not paquete.es_paquete(str(salida))
+        guardar_npy(ruta, arreglo)
+
+    monkeypatch.setattr(paquete, "_guardar_npy", guardar_sin_indice)
+    indice = paquete.empaquetar(str(imgs), str(salida), por_trozo=2, procesos=1)
+
+    assert indice["trozos"] == [2]
+    assert sorted(p.name for p in salida.iterdir()) == [
+        "grises_00000.npy", "imagenes_00000.npy", paquete.INDICE]
+    leido = paquete.Paquete(str(salida))
+    assert leido.archivos == ["img0.png", "img1.png"] and not leido.tiene_mascaras
@@ -0,0 +1,32 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+import preprocesamiento
+
+
+def _guardar(ruta, semilla, forma=(40, 60, 3)):
+    datos = np.random.default_rng(semilla).integers(0, 256, forma, dtype=np.uint8)
+    Image.fromarray(datos).save(ruta)
+
+
+def test_cargar_lote_uint8_matches_float_preprocessing(tmp_path):
+    rutas = [str(tmp_path / "a.png"), str(tmp_path / "falta.png"), str(tmp_path / "b.png")]
+    _guardar(rutas[0], 1)
+    _guardar(rutas[2], 2, forma=(80, 30, 3))
+
+    lote, validas = preprocesamiento.cargar_lote_uint8(rutas, target_size=(32, 16))
+
+    assert lote.dtype == np.uint8 and lote.shape == (2, 16, 32, 3)
+    assert validas == [0, 2]
+    for fila, indice in zip(lote, validas):
+        esperado = preprocesamiento.load_and_preprocess_image(
+            rutas[indice], target_size=(32, 16)).astype(np.float32)
+        # Misma normalización que hace NormalizarUint8 dentro del grafo
+        assert np.array_equal(fila.astype(np.float32) / np.float32(255.0), esperado)
+
+
+def test_cargar_lote_uint8_empty_when_nothing_loads(tmp_path):
+    lote, validas = preprocesamiento.cargar_lote_uint8([str(tmp_path / "x.png")])
+    assert lote.shape == (0, 256, 256, 3) and validas == []
@@ -296,8 +296,22 @@ def _install_stub_modules(monkeypatch, recorded):
     monkeypatch.setitem(sys.modules, "tqdm", tqdm_module)
 
 
+# Módulos de categorizador/ que PWAT.py importa; se descartan para que
+# vuelvan a importarse con los módulos falsos de cada prueba.
+LOCAL_MODULES = [
+    "clasificadores", "feature_store", "recursos", "preprocesamiento",
+    "overlays", "vigilante", "memo", "duplicados", "servidor", "radiomica",
+    "reumbralizar", "trabajos", "etapas", "escritor", "registro", "metricas",
+]
+
+
 @pytest.fixture
 def pwat(monkeypatch, tmp_path):
+    for name in LOCAL_MODULES:
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    monkeypatch.setenv("PWAT_FEATURE_STORE", str(tmp_path / "feature_store"))
+    monkeypatch.setenv("PWAT_CACHE_DB", str(tmp_path / "cache" / "resultados.sqlite"))
+
     recorded = {
         "nrrd_writes": [],
         "extract_calls": [],
@@ -384,7 +398,9 @@ def test_predecir_mascara_returns_mask_path_and_saves_mask(pwat, monkeypatch):
     assert calls["postprocess_args"] == ("mask-raw", 0.5)
 
 
-def test_predecir_outputs_expected_categories(pwat, capsys):
+def test_predecir_outputs_expected_categories(pwat, capsys, monkeypatch):
+    # Flujo síncrono: NRRD en disco y PyRadiomics leyéndolos de ahí
+    monkeypatch.setenv("PWAT_ESCRITOR", "0")
     pwat.predecir("sample_image.jpg", "sample_mask.jpg")
 
     captured = capsys.readouterr().out.strip()
@@ -421,3 +437,236 @@ def test_predecir_propagates_imread_errors(pwat, monkeypatch):
 
     with pytest.raises(FileNotFoundError):
         pwat.predecir("missing.jpg", "mask.jpg")
+
+
+def test_calentar_modelos_reports_readiness(pwat, monkeypatch):
+    monkeypatch.setattr(pwat.np, "zeros", lambda shape, dtype=None: shape, raising=False)
+    monkeypatch.setattr(pwat.np, "float64", float, raising=False)
+    for nombre, modelo, _ in pwat._clasificadores():
+        modelo.n_features_in_ = 5
+
+    warmed = []
+    monkeypatch.setattr(pwat.clasificadores, "predecir_crudo",
+                        lambda modelo, tipo, datos: warmed.append(datos))
+
+    estado = pwat.calentar_modelos()
+
+    assert estado["listo"] is True
+    assert warmed == [(1, 5)] * 6
+    assert set(estado["modelos"]) == {
+        "segmentacion", "Categoria3", "Categoria4", "Categoria5",
+        "Categoria6", "Categoria7", "Categoria8",
+    }
+    for info in estado["modelos"].values():
+        assert info["carga_s"] >= 0
+        assert info["calentamiento_s"] >= 0
+
+
+def test_models_load_on_first_use_and_warm_when_requested(pwat, monkeypatch):
+    assert pwat._modelos is None
+    calentados = []
+    monkeypatch.setattr(pwat, "calentar_modelos",
+                        lambda modelos=None: calentados.append(modelos))
+    monkeypatch.setattr(pwat, "_calentar_al_cargar", True)
+
+    modelos = pwat.modelos_vigentes()
+
+    assert calentados == [modelos]
+    assert pwat.model is modelos["segmentacion"]
+    assert pwat.modelos_vigentes() is modelos and len(calentados) == 1
+
+
+def test_estado_modelos_not_ready_when_warmup_fails(pwat, monkeypatch):
+    monkeypatch.setattr(pwat.np, "zeros", lambda shape, dtype=None: shape, raising=False)
+    monkeypatch.setattr(pwat.np, "float64", float, raising=False)
+
+    def failing_predict(modelo, tipo, datos):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(pwat, "_numero_caracteristicas", lambda modelo: 5)
+    monkeypatch.setattr(pwat.clasificadores, "predecir_crudo", failing_predict)
+
+    estado = pwat.calentar_modelos()
+
+    assert estado["listo"] is False
+    assert estado["modelos"]["segmentacion"]["estado"] == "listo"
+    assert estado["modelos"]["Categoria4"]["estado"] == "error"
+
+
+def test_mask_precit_memoizes_by_content_and_model_version(pwat, monkeypatch, tmp_path):
+    image = tmp_path / "herida.jpg"
+    image.write_bytes(b"imagen")
+    mask = tmp_path / "masks" / "herida.jpg"
+    artefacto = tmp_path / "best_model.keras"
+    artefacto.write_bytes(b"v1")
+    monkeypatch.setattr(pwat, "ARTEFACTOS_MODELO", [str(artefacto)])
+    monkeypatch.setattr(pwat, "predictions_dir", str(mask.parent))
+    mask.parent.mkdir(exist_ok=True)
+
+    calls = []
+
+    def fake_predecir_mascara(path):
+        calls.append(path)
+        mask.write_bytes(b"mascara")
+        return str(mask)
+
+    monkeypatch.setattr(pwat, "predecir_mascara", fake_predecir_mascara)
+    monkeypatch.setattr(pwat, "predecir", lambda img, msk, imprimir=True: {"Cat3": 1})
+
+    assert pwat.mask_precit(str(image), imprimir=False) == (str(mask), {"Cat3": 1})
+    assert pwat.mask_precit(str(image), imprimir=False) == (str(mask), {"Cat3": 1})
+    assert len(calls) == 1
+    # Ni la consulta ni el acierto cargan los modelos
+    assert pwat._modelos is None
+
+    # Misma imagen con otro nombre: se reutiliza por contenido y la máscara
+    # queda también con el nombre nuevo, que es donde la busca el backend
+    copia = tmp_path / "copia.jpg"
+    copia.write_bytes(b"imagen")
+    assert pwat.buscar_resultado(str(copia))["categorias"] == {"Cat3": 1}
+    mascara_copia, categorias = pwat.mask_precit(str(copia), imprimir=False)
+    pwat.vaciar_escrituras()
+    assert mascara_copia == pwat.ruta_mascara_para(str(copia))
+    assert open(mascara_copia, "rb").read() == b"mascara"
+    assert categorias == {"Cat3": 1} and len(calls) == 1
+    # --mode predecir con la copia: mismo contenido, sin volver a puntuar
+    assert pwat.categorias_memoizadas(str(copia), mascara_copia) == {"Cat3": 1}
+    editada = tmp_path / "editada.jpg"
+    editada.write_bytes(b"otra mascara")
+    assert pwat.categorias_memoizadas(str(copia), str(editada)) is None
+
+    # Un artefacto de modelo nuevo invalida la entrada
+    artefacto.write_bytes(b"v2-distinto")
+    assert pwat.buscar_resultado(str(image)) is None
+    pwat.mask_precit(str(image), imprimir=False)
+    assert len(calls) == 2
+
+    monkeypatch.setenv("PWAT_CACHE", "0")
+    assert pwat.buscar_resultado(str(image)) is None
+
+
+def test_mask_precit_reuses_result_of_near_duplicate(pwat, monkeypatch, tmp_path):
+    original = tmp_path / "herida.jpg"
+    original.write_bytes(b"imagen")
+    copia = tmp_path / "herida_recodificada.jpg"
+    copia.write_bytes(b"imagen-recodificada")
+    distinta = tmp_path / "otra.jpg"
+    distinta.write_bytes(b"otra")
+    # Otra herida con el mismo encuadre: mismo pHash, píxeles distintos
+    mismo_encuadre = tmp_path / "otra_herida.jpg"
+    mismo_encuadre.write_bytes(b"otra herida")
+    artefacto = tmp_path / "best_model.keras"
+    artefacto.write_bytes(b"v1")
+    monkeypatch.setattr(pwat, "ARTEFACTOS_MODELO", [str(artefacto)])
+    predicciones = tmp_path / "masks"
+    predicciones.mkdir(exist_ok=True)
+    monkeypatch.setattr(pwat, "predictions_dir", str(predicciones))
+    monkeypatch.setenv("PWAT_DUPLICADOS", "1")
+
+    huellas = {str(original): 0xF0F0, str(copia): 0xF0F1, str(mismo_encuadre): 0xF0F0,
+               str(distinta): ~0xF0F0 & (2**64 - 1)}
+    monkeypatch.setattr(pwat, "huella_perceptual", lambda ruta: huellas[ruta])
+    comparadas = []
+
+    def fake_mismos_pixeles(ruta, candidato, maxima):
+        comparadas.append((ruta, candidato))
+        return {ruta, candidato} == {str(original), str(copia)}
+
+    monkeypatch.setattr(pwat, "_mismos_pixeles", fake_mismos_pixeles)
+    calls = []
+
+    def fake_predecir_mascara(path):
+        calls.append(path)
+        ruta = predicciones / (os.path.splitext(os.path.basename(path))[0] + ".jpg")
+        ruta.write_bytes(b"mascara")
+        return str(ruta)
+
+    monkeypatch.setattr(pwat, "predecir_mascara", fake_predecir_mascara)
+    monkeypatch.setattr(pwat, "predecir", lambda img, msk, imprimir=True: {"Cat3": 4})
+
+    pwat.mask_precit(str(original), imprimir=False)
+    mascara, categorias = pwat.mask_precit(str(copia), imprimir=False)
+
+    assert calls == [str(original)]
+    assert categorias == {"Cat3": 4}
+    assert mascara == str(predicciones / "herida_recodificada.jpg")
+    pwat.vaciar_escrituras()
+    assert open(mascara, "rb").read() == b"mascara"
+
+    assert comparadas == [(str(copia), str(original))]
+
+    # Un pHash igual sin píxeles parecidos no reutiliza el resultado clínico
+    pwat.mask_precit(str(mismo_encuadre), imprimir=False)
+    assert calls == [str(original), str(mismo_encuadre)]
+
+    pwat.mask_precit(str(distinta), imprimir=False)
+    assert calls == [str(original), str(mismo_encuadre), str(distinta)]
+
+    # Desactivado por defecto
+    monkeypatch.delenv("PWAT_DUPLICADOS")
+    assert pwat.buscar_duplicado(0xF0F0, str(copia)) is None
+
+
+def test_hot_reload_swaps_models_without_affecting_pinned_requests(pwat, monkeypatch, tmp_path):
+    artefacto = tmp_path / "best_model.keras"
+    artefacto.write_bytes(b"v1")
+    monkeypatch.setattr(pwat, "ARTEFACTOS_MODELO", [str(artefacto)])
+    monkeypatch.setenv("PWAT_RECARGA_INTERVALO", "3600")
+    anteriores = pwat.modelos_vigentes()
+    monkeypatch.setattr(pwat, "cargar_modelos",
+                        lambda: dict(anteriores, segmentacion="modelo-v2", estado={}))
+    monkeypatch.setattr(pwat, "validar_modelos", lambda modelos: None)
+
+    registro = pwat.iniciar_recarga()
+    try:
+        with pwat.version_fijada() as fijados:
+            artefacto.write_bytes(b"v2-distinto")
+            registro.comprobar()
+            assert registro.comprobar() is True
+            # La petición en curso termina con los modelos con los que empezó
+            assert pwat.modelos_vigentes() is fijados is anteriores
+        assert pwat.modelos_vigentes()["segmentacion"] == "modelo-v2"
+        assert pwat.model == "modelo-v2"
+        assert pwat.estado_modelos()["recarga"]["recargas"] == 1
+        assert "pwat_modelos_recargas_total 1" in pwat.METRICAS.exponer()
+    finally:
+        registro.detener()
+
+
+def test_mask_precit_records_request_and_reuse_metrics(pwat, monkeypatch, tmp_path):
+    image = tmp_path / "herida.jpg"
+    image.write_bytes(b"imagen")
+    mask = tmp_path / "herida_mask.jpg"
+    monkeypatch.setattr(pwat, "ARTEFACTOS_MODELO", [])
+
+    def fake_predecir_mascara(path):
+        mask.write_bytes(b"mascara")
+        return str(mask)
+
+    monkeypatch.setattr(pwat, "predecir_mascara", fake_predecir_mascara)
+    monkeypatch.setattr(pwat, "predecir", lambda img, msk, imprimir=True: {"Cat3": 1})
+
+    pwat.mask_precit(str(image), imprimir=False)
+    pwat.mask_precit(str(image), imprimir=False)
+
+    def failing_predecir_mascara(path):
+        raise RuntimeError("boom")
+
+    otra = tmp_path / "otra.jpg"
+    otra.write_bytes(b"otra imagen")
+    monkeypatch.setattr(pwat, "predecir_mascara", failing_predecir_mascara)
+    with pytest.raises(RuntimeError):
+        pwat.mask_precit(str(otra), imprimir=False)
+
+    assert pwat.PETICIONES.valor(modo="mask_precit", resultado="ok") == 2
+    assert pwat.PETICIONES.valor(modo="mask_precit", resultado="error") == 1
+    assert pwat.REUTILIZADOS.valor(origen="memo") == 1
+    assert pwat.LATENCIA_PETICIONES.cuenta(modo="mask_precit") == 3
+
+    # predecir es falso: los modelos aún no se cargaron
+    assert 'pwat_modelo_carga_segundos{' not in pwat.METRICAS.exponer()
+    pwat.modelos_vigentes()
+    texto = pwat.METRICAS.exponer()
+    assert 'pwat_peticiones_total{modo="mask_precit",resultado="ok"} 2' in texto
+    assert 'pwat_modelo_carga_segundos{modelo="segmentacion"}' in texto
+    assert "pwat_cola_escrituras" in texto
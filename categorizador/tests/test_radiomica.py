@@ -0,0 +1,163 @@
+import multiprocessing
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+pytest.importorskip("cv2")
+
+# Los trabajadores salen del servidor de forks e importan radiomica de
+# nuevo: los módulos falsos tienen que ser archivos importables
+EXTRACTOR_FALSO = '''
+from collections import OrderedDict
+
+import numpy as np
+
+CLASES = ["firstorder", "glcm", "gldm", "glrlm", "glszm", "ngtdm", "shape", "shape2D"]
+
+
+class RadiomicsFeatureExtractor:
+    """Emite las claves en el orden de PyRadiomics: diagnósticos, forma, resto."""
+
+    def __init__(self):
+        self.enabledFeatures = OrderedDict((clase, []) for clase in CLASES)
+
+    def disableAllFeatures(self):
+        self.enabledFeatures = OrderedDict()
+
+    def enableFeatureClassByName(self, clase):
+        self.enabledFeatures[clase] = []
+
+    def execute(self, imagen, mascara):
+        imagen, mascara = np.asarray(imagen, dtype=float), np.asarray(mascara)
+        resultado = OrderedDict([
+            ("diagnostics_Versions_PyRadiomics", "falso"),
+            ("diagnostics_Mask-original_VoxelNum", int(mascara.sum())),
+            ("diagnostics_Mask-original_VolumeNum", 1),
+        ])
+        if "shape2D" in self.enabledFeatures:
+            resultado["original_shape2D_PixelSurface"] = float(mascara.sum())
+        for clase in self.enabledFeatures:
+            if not clase.startswith("shape"):
+                resultado[f"original_{clase}_Media"] = float(imagen[mascara > 0].mean()) * len(clase)
+                resultado[f"original_{clase}_Maximo"] = float(imagen.max())
+        return resultado
+'''
+
+SITK_FALSO = '''
+import types
+
+
+def GetImageFromArray(arreglo):
+    return arreglo
+
+
+ProcessObject = types.SimpleNamespace(SetGlobalDefaultNumberOfThreads=lambda n: None)
+'''
+
+
+@pytest.fixture
+def radiomica(monkeypatch, tmp_path):
+    (tmp_path / "radiomics").mkdir()
+    (tmp_path / "radiomics" / "__init__.py").write_text("from . import featureextractor\n")
+    (tmp_path / "radiomics" / "featureextractor.py").write_text(EXTRACTOR_FALSO)
+    (tmp_path / "SimpleITK.py").write_text(SITK_FALSO)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    for nombre in ("radiomics", "radiomics.featureextractor", "SimpleITK", "radiomica"):
+        monkeypatch.delitem(sys.modules, nombre, raising=False)
+    import radiomica
+    yield radiomica
+    if radiomica._pool is not None:
+        radiomica._pool.shutdown()
+    for nombre in ("radiomics", "radiomics.featureextractor", "SimpleITK"):
+        sys.modules.pop(nombre, None)
+
+
+def _roi():
+    rng = np.random.default_rng(0)
+    imagen = rng.integers(0, 256, (256, 256), dtype=np.uint8)
+    yy, xx = np.mgrid[:256, :256]
+    mascara = (((yy - 128) ** 2 + (xx - 128) ** 2) < 60 ** 2).astype(np.uint8)
+    return imagen, mascara
+
+
+def test_feature_classes_are_grouped_in_emission_order(radiomica):
+    assert radiomica.grupos_de_clases() == [
+        ("shape", "shape2D"), ("firstorder",), ("glcm",), ("gldm",),
+        ("glrlm",), ("glszm",), ("ngtdm",)]
+
+
+@pytest.mark.skipif("forkserver" not in multiprocessing.get_all_start_methods(),
+                    reason="La extracción en paralelo usa forkserver")
+def test_parallel_extraction_matches_serial_vector_and_order(radiomica):
+    imagen, mascara = _roi()
+
+    serie = radiomica.ejecutar_extractor(imagen, mascara, procesos=0)
+    paralelo = radiomica.ejecutar_extractor(imagen, mascara, procesos=3)
+
+    assert radiomica._pool is not None
+    assert radiomica._pool._mp_context.get_start_method() == "forkserver"
+    assert list(paralelo) == list(serie)
+    assert paralelo == serie
+
+    df_serie = radiomica.extraer_caracteristicas(imagen, mascara, "roi", procesos=0)
+    df_paralelo = radiomica.extraer_caracteristicas(imagen, mascara, "roi", procesos=3)
+    assert list(df_paralelo.columns) == list(df_serie.columns)
+    assert np.array_equal(df_paralelo.values, df_serie.values)
+
+
+PRINCIPAL = '''
+import os
+import sys
+
+sys.path[:0] = [{benchmarks!r}, {categorizador!r}]
+import modelos_falsos
+
+modelos_falsos.instalar()
+modelos = sys.modules["tensorflow.keras.models"]
+cargar = modelos.load_model
+
+
+def contar_carga(*args, **kwargs):
+    with open({marcas!r}, "a") as f:
+        f.write(f"{{os.getpid()}}\\n")
+    return cargar(*args, **kwargs)
+
+
+modelos.load_model = contar_carga
+import PWAT
+
+if __name__ == "__main__":
+    import numpy as np
+    import radiomica
+
+    PWAT.modelos_vigentes()
+    imagen = np.arange(64 * 64, dtype=np.uint8).reshape(64, 64)
+    mascara = np.zeros((64, 64), dtype=np.uint8)
+    mascara[16:48, 16:48] = 1
+    radiomica.ejecutar_extractor(imagen, mascara, procesos=2)
+    print(radiomica._pool is not None)
+'''
+
+
+@pytest.mark.skipif("forkserver" not in multiprocessing.get_all_start_methods(),
+                    reason="La extracción en paralelo usa forkserver")
+def test_pool_workers_do_not_load_the_main_script_models(tmp_path):
+    # Los trabajadores vuelven a ejecutar el script principal como
+    # __mp_main__: PWAT.py no debe cargar los modelos al importarse
+    categorizador = Path(__file__).resolve().parents[1]
+    marcas = tmp_path / "cargas.txt"
+    principal = tmp_path / "principal.py"
+    principal.write_text(PRINCIPAL.format(
+        benchmarks=str(categorizador / "benchmarks"), categorizador=str(categorizador),
+        marcas=str(marcas)))
+
+    salida = subprocess.run([sys.executable, str(principal)], cwd=tmp_path,
+                            capture_output=True, text=True, timeout=120)
+
+    assert salida.returncode == 0, salida.stderr
+    assert salida.stdout.strip().splitlines()[-1] == "True"
+    assert len(marcas.read_text().splitlines()) == 1
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+import recursos
+
+
+def test_parsear_cpus_accepts_ranges_and_lists():
+    assert recursos.parsear_cpus("0-2, 5,3") == [0, 1, 2, 3, 5]
+
+
+def test_perfil_is_none_without_limits():
+    assert recursos.perfil_desde_argv(["--mode", "predecir"], entorno={}) is None
+
+
+def test_perfil_prefers_command_line_over_environment():
+    perfil = recursos.perfil_desde_argv(
+        ["--mode", "mask_precit", "--hilos", "2"],
+        entorno={"PWAT_HILOS": "8", "PWAT_AFINIDAD": "0-1"})
+    assert perfil == {"hilos": 2, "afinidad": [0, 1]}
+
+
+def test_perfil_rejects_non_positive_threads():
+    with pytest.raises(ValueError):
+        recursos.perfil_desde_argv(["--hilos", "0"], entorno={})
+
+
+def test_aplicar_entorno_sets_thread_variables(monkeypatch):
+    for variable in recursos.VARIABLES_HILOS + ["TF_NUM_INTEROP_THREADS"]:
+        monkeypatch.delenv(variable, raising=False)
+
+    recursos.aplicar_entorno({"hilos": 3, "afinidad": None})
+
+    for variable in recursos.VARIABLES_HILOS:
+        assert os.environ[variable] == "3"
+    assert os.environ["TF_NUM_INTEROP_THREADS"] == "1"
+
+
+def test_ajustar_modelos_limits_boosters_and_estimators():
+    class _Booster:
+        def set_param(self, params):
+            self.params = params
+
+    class _Estimator:
+        n_jobs = None
+
+    booster, estimator = _Booster(), _Estimator()
+    recursos.ajustar_modelos({"hilos": 2, "afinidad": None}, [booster, estimator])
+
+    assert booster.params == {"nthread": 2}
+    assert estimator.n_jobs == 2
@@ -0,0 +1,58 @@
+import os
+
+import registro
+
+
+def _tocar(ruta, contenido):
+    ruta.write_bytes(contenido)
+    info = os.stat(ruta)
+    os.utime(ruta, ns=(info.st_atime_ns, info.st_mtime_ns + 10**9))
+
+
+def test_registry_swaps_after_artifacts_settle_and_keeps_old_on_failure(tmp_path):
+    artefacto = tmp_path / "best_model.keras"
+    artefacto.write_bytes(b"v1")
+    versiones = iter(["v2", "v3"])
+    cambios = []
+
+    def validar(version):
+        if version == "v3":
+            raise ValueError("sonda inválida")
+
+    reg = registro.RegistroModelos(
+        [str(artefacto)], cargar=lambda: next(versiones), validar=validar,
+        vigente="v1", al_cambiar=lambda nueva, anterior: cambios.append((anterior, nueva)))
+
+    assert reg.comprobar() is False
+    en_curso = reg.vigente()
+
+    _tocar(artefacto, b"v2")
+    # Primera comprobación: la copia podría no haber terminado
+    assert reg.comprobar() is False and reg.vigente() == "v1"
+    assert reg.comprobar() is True
+    assert reg.vigente() == "v2" and en_curso == "v1"
+    assert cambios == [("v1", "v2")]
+
+    _tocar(artefacto, b"v3-roto")
+    reg.comprobar()
+    assert reg.comprobar() is False
+    assert reg.vigente() == "v2"
+    assert reg.estado()["ultimo_error"] == "ValueError: sonda inválida"
+    # La misma combinación fallida no se vuelve a cargar
+    assert reg.comprobar() is False and reg.comprobar() is False
+    assert reg.estado()["recargas"] == 1
+
+
+def test_registry_discards_version_if_artifacts_change_while_loading(tmp_path):
+    artefacto = tmp_path / "Categoria4.joblib"
+    artefacto.write_bytes(b"v1")
+
+    def cargar():
+        _tocar(artefacto, b"v3")
+        return "v2"
+
+    reg = registro.RegistroModelos([str(artefacto)], cargar=cargar, vigente="v1")
+    _tocar(artefacto, b"v2")
+    reg.comprobar()
+    assert reg.comprobar() is False
+    assert reg.vigente() == "v1" and reg.estado()["ultimo_error"] is None
@@ -0,0 +1,51 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+import escritor
+import reumbralizar
+
+
+def _probabilidades(semilla=0, forma=(32, 48, 1)):
+    return np.random.default_rng(semilla).random(forma, dtype=np.float32)
+
+
+def test_binarizar_matches_direct_threshold_on_grid_thresholds():
+    prob = _probabilidades()
+    cuantizado = reumbralizar.cuantizar(prob)
+
+    assert cuantizado.dtype == np.uint8 and cuantizado.shape == (32, 48)
+    for umbral in (0.25, 0.5, 0.75):
+        esperado = np.where(prob[:, :, 0] > umbral, 255, 0)
+        assert np.array_equal(reumbralizar.binarizar(cuantizado, umbral), esperado)
+
+
+def test_binarizar_off_grid_only_differs_inside_threshold_bucket():
+    prob = _probabilidades(1)
+    umbral = 0.3
+    diferentes = reumbralizar.binarizar(reumbralizar.cuantizar(prob), umbral) != \
+        np.where(prob[:, :, 0] > umbral, 255, 0)
+    assert np.all(np.abs(prob[:, :, 0][diferentes] - umbral) < 1 / 256)
+
+
+def test_directory_rethreshold_writes_masks(tmp_path):
+    prob = _probabilidades(2)
+    ruta_prob = reumbralizar.ruta_probabilidad(str(tmp_path / "herida.jpg"))
+    # Mismo códec y escritura atómica que PWAT.guardar_probabilidad()
+    escritor.escribir_atomico(ruta_prob, lambda temporal: reumbralizar.escribir_cuantizado(
+        reumbralizar.cuantizar(prob), temporal))
+    (tmp_path / "roto.prob.npz").write_bytes(b"no es npz")
+    salida = tmp_path / "nuevas"
+
+    lote = reumbralizar.preparar_lote(str(tmp_path), 0.5, str(salida), extension=".png")
+    resultados = {r["imagen"]: r for r in reumbralizar.reumbralizar_lote(lote, procesos=1)}
+
+    assert ruta_prob.endswith("herida.prob.npz")
+    assert "error" in resultados["roto"]
+    mascara = np.asarray(Image.open(salida / "herida.png"))
+    assert np.array_equal(mascara, np.where(prob[:, :, 0] > 0.5, 255, 0))
+    assert resultados["herida"]["pixeles"] == int(np.count_nonzero(mascara))
+    assert reumbralizar.cargar_cuantizado(ruta_prob).shape == (32, 48)
+    # Sin temporales de la escritura atómica
+    assert sorted(p.name for p in salida.iterdir()) == ["herida.png"]
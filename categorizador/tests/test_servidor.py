@@ -0,0 +1,111 @@
+import base64
+import io
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+import servidor
+
+
+def test_cargar_fuente_decodes_bytes_raw_arrays_and_paths():
+    arreglo = np.arange(12, dtype=np.uint8).reshape(2, 2, 3)
+    peticion = {
+        "imagen": base64.b64encode(b"jpeg").decode(),
+        "mascara": base64.b64encode(arreglo.tobytes()).decode(),
+        "mascara_forma": [2, 2, 3],
+    }
+
+    assert servidor.cargar_fuente(peticion, "imagen") == b"jpeg"
+    assert np.array_equal(servidor.cargar_fuente(peticion, "mascara"), arreglo)
+    assert servidor.cargar_fuente({"image_path": "a.jpg"}, "imagen") == "a.jpg"
+    assert servidor.cargar_fuente({}, "mascara") is None
+    with pytest.raises(servidor.PeticionInvalida):
+        servidor.cargar_fuente({"imagen": "no es base64!"}, "imagen")
+
+
+def test_shared_memory_round_trip():
+    shared_memory = pytest.importorskip("multiprocessing.shared_memory")
+    arreglo = np.random.default_rng(0).integers(0, 256, (4, 5, 3), dtype=np.uint8)
+    entrada = shared_memory.SharedMemory(create=True, size=arreglo.nbytes)
+    salida = shared_memory.SharedMemory(create=True, size=20)
+    try:
+        np.ndarray(arreglo.shape, np.uint8, buffer=entrada.buf)[...] = arreglo
+        peticion = {"imagen_shm": {"nombre": entrada.name, "forma": [4, 5, 3]},
+                    "mascara_shm": {"nombre": salida.name}}
+
+        assert np.array_equal(servidor.cargar_fuente(peticion, "imagen"), arreglo)
+
+        mascara = np.full((4, 5), 255, dtype=np.uint8)
+        assert servidor.entregar_mascara(mascara, peticion) == {"mascara_forma": [4, 5]}
+        assert np.array_equal(np.ndarray((4, 5), np.uint8, buffer=salida.buf), mascara)
+    finally:
+        for bloque in (entrada, salida):
+            bloque.close()
+            bloque.unlink()
+
+
+def test_entregar_mascara_as_png():
+    mascara = np.zeros((3, 4), dtype=np.uint8)
+    mascara[1, 2] = 255
+
+    respuesta = servidor.entregar_mascara(mascara, {"devolver_mascara": True})
+
+    png = Image.open(io.BytesIO(base64.b64decode(respuesta["mascara"])))
+    assert np.array_equal(np.asarray(png), mascara)
+    assert servidor.entregar_mascara(mascara, {}) == {}
+
+
+def test_atender_flujo_answers_each_line_and_reports_errors():
+    def manejar(peticion):
+        if peticion.get("fallar"):
+            raise ValueError("sin máscara")
+        return {"eco": peticion["valor"]}
+
+    entrada = io.StringIO(
+        '{"id": 1, "valor": 10}\n\n{"id": 2, "fallar": true}\nno json\n')
+    salida = io.StringIO()
+
+    servidor.Servidor(manejar, max_concurrencia=2).atender_flujo(entrada, salida)
+
+    respuestas = sorted((json.loads(l) for l in salida.getvalue().splitlines()),
+                        key=lambda r: str(r["id"]))
+    assert respuestas == [
+        {"id": 1, "ok": True, "eco": 10},
+        {"id": 2, "ok": False, "error": "sin máscara"},
+        {"id": None, "ok": False, "error": respuestas[2]["error"]},
+    ]
+
+
+def test_atender_flujo_releases_finished_requests_while_running():
+    import gc
+    import weakref
+
+    atencion = servidor.Servidor(lambda peticion: {"eco": peticion["valor"]},
+                                 max_concurrencia=2)
+    futuros = []
+    enviar = atencion._pool.submit
+
+    def registrar(*args):
+        futuro = enviar(*args)
+        futuros.append(weakref.ref(futuro))
+        return futuro
+
+    atencion._pool.submit = registrar
+    vivos_a_mitad = []
+
+    def entrada():
+        for valor in range(50):
+            yield json.dumps({"id": valor, "valor": valor}) + "\n"
+        atencion._pool.shutdown(wait=True)
+        gc.collect()
+        vivos_a_mitad.append(sum(ref() is not None for ref in futuros))
+
+    salida = io.StringIO()
+    atencion.atender_flujo(entrada(), salida)
+
+    assert len(salida.getvalue().splitlines()) == 50
+    # Antes de EOF solo sigue viva la última petición enviada
+    assert vivos_a_mitad[0] <= 1
@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+import trabajos
+
+
+def _procesador(fallos=None):
+    """Falla `fallos[item]` veces antes de tener éxito."""
+    fallos = dict(fallos or {})
+    llamadas = []
+
+    def procesar(item):
+        llamadas.append(item)
+        if fallos.get(item, 0) > 0:
+            fallos[item] -= 1
+            raise RuntimeError(f"fallo en {item}")
+        return {"item": item}
+
+    return procesar, llamadas
+
+
+def test_job_retries_with_backoff_and_writes_summary(tmp_path):
+    diario = str(tmp_path / "diario.jsonl")
+    procesar, llamadas = _procesador({"b": 1, "c": 5})
+
+    resumen = trabajos.ejecutar_trabajo(["a", "b", "c"], procesar, diario, cada=2,
+                                        max_intentos=3, espera_base=0.001)
+
+    assert resumen["completados"] == 2 and resumen["fallidos"] == 1
+    assert resumen["reintentos"] == 3
+    assert resumen["errores"] == {"c": "RuntimeError: fallo en c"}
+    # Los reintentos no bloquean: "c" se reintenta después de los demás
+    assert llamadas[:3] == ["a", "b", "c"] and llamadas.count("c") == 3
+    with open(diario + ".resumen.json") as f:
+        assert json.load(f)["fallidos"] == 1
+
+
+def test_job_resumes_from_journal(tmp_path):
+    diario = str(tmp_path / "diario.jsonl")
+    procesar, _ = _procesador({"b": 1})
+    trabajos.ejecutar_trabajo(["a", "b"], procesar, diario, max_intentos=1)
+
+    procesar, llamadas = _procesador()
+    resumen = trabajos.ejecutar_trabajo(["a", "b", "c"], procesar, diario, max_intentos=2)
+
+    assert llamadas == ["b", "c"]
+    assert (resumen["omitidos"], resumen["completados"], resumen["fallidos"]) == (1, 2, 0)
+
+
+def test_interrupted_job_keeps_processed_items(tmp_path):
+    diario = str(tmp_path / "diario.jsonl")
+
+    def procesar(item):
+        if item == "c":
+            raise KeyboardInterrupt
+        return None
+
+    with pytest.raises(KeyboardInterrupt):
+        trabajos.ejecutar_trabajo(["a", "b", "c"], procesar, diario, cada=100)
+
+    assert set(trabajos.Diario(diario).estado()) == {"a", "b"}
+
+
+def test_truncated_journal_line_is_discarded(tmp_path):
+    ruta = tmp_path / "diario.jsonl"
+    ruta.write_text('{"item": "a", "estado": "ok", "intentos": 1}\n{"item": "b", "est')
+
+    diario = trabajos.Diario(str(ruta), cada=1)
+    diario.anotar({"item": "c", "estado": "ok", "intentos": 1})
+
+    assert list(diario.estado()) == ["a", "c"]
+
+
+def test_leer_manifiesto_formats(tmp_path):
+    (tmp_path / "imgs").mkdir()
+    for nombre in ("b.jpg", "a.png", "notas.txt"):
+        (tmp_path / "imgs" / nombre).write_bytes(b"x")
+    lista = tmp_path / "lista.txt"
+    lista.write_text('# comentario\nx.jpg\n{"image_path": "/abs/y.jpg"}\nx.jpg\n')
+
+    assert [p.rsplit("/", 1)[1] for p in trabajos.leer_manifiesto(str(tmp_path / "imgs"))] == ["a.png", "b.jpg"]
+    assert trabajos.leer_manifiesto(str(lista), base="/base") == ["/base/x.jpg", "/abs/y.jpg"]
+
+
+def test_journal_waits_for_artifacts_before_each_batch(tmp_path):
+    diario = str(tmp_path / "diario.jsonl")
+    barreras = []
+
+    def antes():
+        with open(diario, "a"):
+            pass
+        with open(diario) as f:
+            barreras.append(sum(1 for _ in f))
+
+    procesar, _ = _procesador()
+    trabajos.ejecutar_trabajo(["a", "b", "c"], procesar, diario, cada=2,
+                              antes_de_sincronizar=antes)
+    # Una barrera por tanda, antes de que sus registros lleguen al diario
+    assert barreras == [0, 2]
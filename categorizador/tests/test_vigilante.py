@@ -0,0 +1,125 @@
+import threading
+import time
+
+import vigilante
+
+
+def _esperar(condicion, limite=5.0):
+    fin = time.time() + limite
+    while time.time() < fin:
+        if condicion():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_polling_processes_new_and_existing_images_once(tmp_path):
+    (tmp_path / "existente.jpg").write_bytes(b"a")
+    (tmp_path / "notas.txt").write_text("ignorar")
+    procesadas = []
+
+    observador = vigilante.Vigilante(
+        str(tmp_path), procesadas.append, intervalo=0.02, usar_inotify=False,
+        procesar_existentes=True)
+    observador.iniciar()
+    try:
+        (tmp_path / "nueva.png").write_bytes(b"b")
+        assert _esperar(lambda: len(procesadas) == 2)
+        time.sleep(0.1)
+    finally:
+        observador.detener()
+
+    assert sorted(p.rsplit("/", 1)[-1] for p in procesadas) == ["existente.jpg", "nueva.png"]
+    assert observador.procesados == 2
+    assert observador.pendientes == 0
+
+
+def test_skips_existing_files_by_default(tmp_path):
+    (tmp_path / "vieja.jpg").write_bytes(b"a")
+    procesadas = []
+
+    observador = vigilante.Vigilante(
+        str(tmp_path), procesadas.append, intervalo=0.02, usar_inotify=False)
+    observador.iniciar()
+    try:
+        (tmp_path / "nueva.jpg").write_bytes(b"b")
+        assert _esperar(lambda: len(procesadas) == 1)
+    finally:
+        observador.detener()
+
+    assert procesadas[0].endswith("nueva.jpg")
+
+
+def test_concurrency_is_bounded_and_errors_are_counted(tmp_path):
+    for i in range(6):
+        (tmp_path / f"img{i}.jpg").write_bytes(b"x")
+    activos = []
+    maximo = []
+    bloqueo = threading.Lock()
+
+    def procesar(ruta):
+        with bloqueo:
+            activos.append(ruta)
+            maximo.append(len(activos))
+        time.sleep(0.05)
+        with bloqueo:
+            activos.remove(ruta)
+        if ruta.endswith("img0.jpg"):
+            raise RuntimeError("boom")
+
+    observador = vigilante.Vigilante(
+        str(tmp_path), procesar, max_concurrencia=2, intervalo=0.01,
+        usar_inotify=False, procesar_existentes=True, max_intentos=1)
+    observador.iniciar()
+    try:
+        assert _esperar(lambda: observador.procesados + observador.errores == 6)
+    finally:
+        observador.detener()
+
+    assert max(maximo) <= 2
+    assert observador.errores == 1
+
+
+def test_failed_images_are_retried_until_they_succeed(tmp_path):
+    llamadas = []
+
+    def procesar(ruta):
+        llamadas.append(ruta)
+        if len(llamadas) == 1:
+            raise RuntimeError("boom")
+
+    observador = vigilante.Vigilante(
+        str(tmp_path), procesar, intervalo=0.01, usar_inotify=False)
+    observador.iniciar()
+    try:
+        (tmp_path / "nueva.jpg").write_bytes(b"x")
+        assert _esperar(lambda: observador.procesados == 1)
+        time.sleep(0.1)
+    finally:
+        observador.detener()
+
+    assert observador.errores == 1
+    assert llamadas == [str(tmp_path / "nueva.jpg")] * 2
+
+
+def test_gives_up_after_max_intentos_until_the_file_changes(tmp_path):
+    llamadas = []
+
+    def procesar(ruta):
+        llamadas.append(ruta)
+        raise RuntimeError("boom")
+
+    observador = vigilante.Vigilante(
+        str(tmp_path), procesar, intervalo=0.01, usar_inotify=False,
+        max_intentos=2)
+    observador.iniciar()
+    try:
+        (tmp_path / "rota.jpg").write_bytes(b"x")
+        assert _esperar(lambda: observador.errores == 2)
+        time.sleep(0.1)
+        assert len(llamadas) == 2
+
+        (tmp_path / "rota.jpg").write_bytes(b"xy")
+        assert _esperar(lambda: observador.errores == 4)
+    finally:
+        observador.detener()
@@ -0,0 +1,222 @@
+"""
+Trabajos masivos reanudables con diario de progreso.
+
+Cada elemento del manifiesto (una ruta de imagen) se procesa con una
+función `procesar(item)`. El resultado de cada intento se anota en un
+diario JSONL que se escribe por tandas de `cada` elementos con fsync; al
+reanudar, los elementos terminados se omiten y los fallidos se reintentan
+hasta agotar `max_intentos`. Un corte a mitad de una escritura deja como
+mucho una línea truncada, que se descarta al abrir el diario.
+
+Al terminar se escribe `<diario>.resumen.json` (de forma atómica) con los
+totales y los errores.
+"""
+import heapq
+import json
+import os
+import random
+import time
+
+ESTADO_OK = 'ok'
+ESTADO_ERROR = 'error'
+
+
+def leer_manifiesto(ruta, base=None):
+    """
+    Lee el manifiesto de un trabajo.
+
+    Acepta un directorio (todas sus imágenes), un archivo de texto con una
+    ruta por línea o un JSONL con objetos {"image_path": ...}. Las rutas
+    relativas se resuelven contra `base`.
+
+    Returns:
+        list: Rutas, sin duplicados y en el orden del manifiesto.
+    """
+    if os.path.isdir(ruta):
+        from preprocesamiento import EXTENSIONES_IMAGEN
+        items = [os.path.join(ruta, n) for n in sorted(os.listdir(ruta))
+                 if os.path.splitext(n)[1].lower() in EXTENSIONES_IMAGEN]
+    else:
+        items = []
+        with open(ruta, encoding='utf-8') as f:
+            for linea in f:
+                linea = linea.strip()
+                if not linea or linea.startswith('#'):
+                    continue
+                if linea.startswith('{'):
+                    linea = json.loads(linea)['image_path']
+                if base and not os.path.isabs(linea):
+                    linea = os.path.join(base, linea)
+                items.append(linea)
+    return list(dict.fromkeys(items))
+
+
+def escribir_atomico(ruta, datos):
+    """Escribe un JSON en un archivo temporal y lo renombra sobre `ruta`."""
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+
+
+class Diario:
+    """
+    Diario de progreso en JSONL, con escrituras por tandas.
+
+    Args:
+        ruta (str): Archivo del diario (se crea si no existe).
+        cada (int): Registros acumulados antes de escribir y sincronizar.
+        antes_de_sincronizar (callable): Se llama antes de escribir cada
+            tanda, p. ej. para esperar a que los artefactos de esos
+            elementos estén en disco.
+    """
+
+    def __init__(self, ruta, cada=10, antes_de_sincronizar=None):
+        self.ruta = ruta
+        self.cada = max(1, cada)
+        self.antes_de_sincronizar = antes_de_sincronizar
+        self._pendientes = []
+        directorio = os.path.dirname(os.path.abspath(ruta))
+        os.makedirs(directorio, exist_ok=True)
+        self._reparar()
+
+    def _reparar(self):
+        """Descarta una última línea que quedó a medio escribir."""
+        if not os.path.exists(self.ruta):
+            return
+        with open(self.ruta, 'r+b') as f:
+            contenido = f.read()
+            if contenido and not contenido.endswith(b'\n'):
+                f.truncate(contenido.rfind(b'\n') + 1)
+
+    def estado(self):
+        """
+        Último registro de cada elemento.
+
+        Returns:
+            dict: {item: registro}
+        """
+        ultimos = {}
+        if not os.path.exists(self.ruta):
+            return ultimos
+        with open(self.ruta, encoding='utf-8') as f:
+            for linea in f:
+                linea = linea.strip()
+                if not linea:
+                    continue
+                try:
+                    registro = json.loads(linea)
+                except json.JSONDecodeError:
+                    break
+                ultimos[registro['item']] = registro
+        return ultimos
+
+    def anotar(self, registro):
+        """Agrega un registro; se escribe al completar la tanda."""
+        self._pendientes.append(registro)
+        if len(self._pendientes) >= self.cada:
+            self.sincronizar()
+
+    def sincronizar(self):
+        """Escribe los registros pendientes y fuerza su llegada a disco."""
+        if not self._pendientes:
+            return
+        if self.antes_de_sincronizar is not None:
+            self.antes_de_sincronizar()
+        texto = ''.join(json.dumps(r, ensure_ascii=False) + '\n'
+                        for r in self._pendientes)
+        with open(self.ruta, 'a', encoding='utf-8') as f:
+            f.write(texto)
+            f.flush()
+            os.fsync(f.fileno())
+        self._pendientes = []
+
+
+def espera_reintento(intento, base=1.0, maximo=60.0):
+    """Espera exponencial con jitter antes del intento `intento` + 1."""
+    return min(maximo, base * 2 ** (intento - 1)) * random.uniform(0.5, 1.0)
+
+
+def ejecutar_trabajo(items, procesar, ruta_diario, cada=10, max_intentos=3,
+                     espera_base=1.0, espera_maxima=60.0, antes_de_sincronizar=None):
+    """
+    Procesa `items` anotando el progreso en el diario, retomando lo que
+    haya quedado de una ejecución anterior.
+
+    Los reintentos no bloquean el trabajo: el elemento fallido vuelve a la
+    cola con una espera exponencial y mientras tanto se procesan los demás.
+
+    Args:
+        items (list): Elementos del manifiesto.
+        procesar (callable): Recibe un elemento y devuelve un resultado
+            serializable a JSON (o None).
+        ruta_diario (str): Archivo del diario.
+        cada (int): Registros por escritura del diario.
+        max_intentos (int): Intentos por elemento, sumando ejecuciones.
+        espera_base (float): Segundos antes del primer reintento.
+        espera_maxima (float): Tope de la espera entre reintentos.
+        antes_de_sincronizar (callable): Ver Diario.
+
+    Returns:
+        dict: Resumen del trabajo.
+    """
+    inicio = time.time()
+    diario = Diario(ruta_diario, cada=cada,
+                    antes_de_sincronizar=antes_de_sincronizar)
+    previos = diario.estado()
+
+    resumen = {'total': len(items), 'completados': 0, 'fallidos': 0,
+               'omitidos': 0, 'reintentos': 0, 'errores': {}}
+    cola = []
+    for orden, item in enumerate(items):
+        previo = previos.get(item)
+        if previo and previo['estado'] == ESTADO_OK:
+            resumen['omitidos'] += 1
+        elif previo and previo['intentos'] >= max_intentos:
+            resumen['fallidos'] += 1
+            resumen['errores'][item] = previo.get('error')
+        else:
+            intentos = previo['intentos'] if previo else 0
+            heapq.heappush(cola, (0.0, orden, item, intentos))
+
+    try:
+        while cola:
+            listo_en, orden, item, intentos = heapq.heappop(cola)
+            espera = listo_en - time.monotonic()
+            if espera > 0:
+                # Los registros ya procesados no esperan al reintento
+                diario.sincronizar()
+                time.sleep(espera)
+
+            intentos += 1
+            if intentos > 1:
+                resumen['reintentos'] += 1
+            try:
+                resultado = procesar(item)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                diario.anotar({'item': item, 'estado': ESTADO_ERROR,
+                               'intentos': intentos, 'error': error,
+                               'ts': time.time()})
+                if intentos < max_intentos:
+                    heapq.heappush(cola, (
+                        time.monotonic() + espera_reintento(
+                            intentos, espera_base, espera_maxima),
+                        orden, item, intentos))
+                else:
+                    resumen['fallidos'] += 1
+                    resumen['errores'][item] = error
+                continue
+
+            diario.anotar({'item': item, 'estado': ESTADO_OK,
+                           'intentos': intentos, 'resultado': resultado,
+                           'ts': time.time()})
+            resumen['completados'] += 1
+    finally:
+        diario.sincronizar()
+
+    resumen['duracion_s'] = round(time.time() - inicio, 3)
+    escribir_atomico(f"{ruta_diario}.resumen.json", resumen)
+    return resumen
@@ -0,0 +1,219 @@
+"""
+Vigilancia de un directorio de subidas con procesamiento en segundo plano.
+
+Detecta archivos nuevos mediante inotify (a través de `watchdog`, si está
+instalado) o, en su defecto, sondeando el directorio. Cada archivo se
+entrega al procesador solo cuando su tamaño deja de cambiar, y los
+procesamientos corren en un pool de hilos con concurrencia acotada.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # Sin watchdog se usa sondeo periódico
+    FileSystemEventHandler = object
+    Observer = None
+
+EXTENSIONES = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+
+
+def _firma(ruta):
+    """Devuelve (tamaño, mtime) del archivo, o None si no existe."""
+    try:
+        info = os.stat(ruta)
+    except OSError:
+        return None
+    return info.st_size, info.st_mtime_ns
+
+
+class _Eventos(FileSystemEventHandler):
+    """Traduce eventos de watchdog en rutas candidatas."""
+
+    def __init__(self, avisar):
+        self.avisar = avisar
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.avisar(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.avisar(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.avisar(event.dest_path)
+
+
+class Vigilante:
+    """
+    Vigila `directorio` y llama a `procesar(ruta)` por cada imagen nueva.
+
+    Args:
+        directorio (str): Directorio a vigilar (no recursivo).
+        procesar (callable): Función que recibe la ruta absoluta.
+        max_concurrencia (int): Procesamientos simultáneos como máximo.
+        intervalo (float): Segundos entre sondeos / comprobaciones.
+        usar_inotify (bool): Usar watchdog si está disponible.
+        procesar_existentes (bool): Encolar también los archivos presentes
+            al arrancar (por defecto solo las subidas nuevas).
+        max_intentos (int): Intentos por archivo antes de darlo por perdido
+            hasta que vuelva a cambiar.
+    """
+
+    def __init__(self, directorio, procesar, max_concurrencia=2, intervalo=1.0,
+                 usar_inotify=True, procesar_existentes=False, max_intentos=3):
+        self.directorio = os.path.abspath(directorio)
+        self.procesar = procesar
+        self.max_concurrencia = max_concurrencia
+        self.intervalo = intervalo
+        self.modo = 'inotify' if usar_inotify and Observer is not None else 'sondeo'
+        self.procesar_existentes = procesar_existentes
+        self.max_intentos = max_intentos
+
+        self._candidatos = queue.Queue()
+        self._en_espera = {}
+        self._en_curso = 0
+        self._bloqueo = threading.Lock()
+        self._vistos = {}
+        self._procesando = set()
+        self._intentos = {}
+        self._cupos = threading.BoundedSemaphore(max_concurrencia)
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrencia,
+                                        thread_name_prefix='vigilante')
+        self._detener = threading.Event()
+        self._hilos = []
+        self._observer = None
+        self.procesados = 0
+        self.errores = 0
+
+    @property
+    def pendientes(self):
+        """Archivos detectados que aún no terminan de procesarse."""
+        return self._candidatos.qsize() + len(self._en_espera) + self._en_curso
+
+    def _es_imagen(self, ruta):
+        return os.path.splitext(ruta)[1].lower() in EXTENSIONES
+
+    def avisar(self, ruta):
+        """Registra una ruta como posible archivo nuevo."""
+        if self._es_imagen(ruta):
+            self._candidatos.put(os.path.abspath(ruta))
+
+    def _sondear(self):
+        while not self._detener.is_set():
+            try:
+                for entrada in os.scandir(self.directorio):
+                    if entrada.is_file() and self._vistos.get(
+                            os.path.abspath(entrada.path)) != _firma(entrada.path):
+                        self.avisar(entrada.path)
+            except OSError:
+                pass
+            self._detener.wait(self.intervalo)
+
+    def _despachar(self):
+        """Entrega al pool los archivos cuyo tamaño ya no cambia."""
+        en_espera = self._en_espera
+        while not self._detener.is_set():
+            try:
+                while True:
+                    ruta = self._candidatos.get_nowait()
+                    en_espera[ruta] = en_espera.get(ruta)
+            except queue.Empty:
+                pass
+
+            for ruta, firma_previa in list(en_espera.items()):
+                firma = _firma(ruta)
+                if (firma is None or self._vistos.get(ruta) == firma
+                        or ruta in self._procesando):
+                    # Los fallidos se vuelven a avisar al terminar
+                    del en_espera[ruta]
+                elif firma != firma_previa:
+                    # Aún se está escribiendo (o recién detectado): esperar
+                    en_espera[ruta] = firma
+                elif self._cupos.acquire(blocking=False):
+                    del en_espera[ruta]
+                    with self._bloqueo:
+                        self._en_curso += 1
+                        self._procesando.add(ruta)
+                    self._pool.submit(self._ejecutar, ruta, firma)
+            self._detener.wait(self.intervalo)
+
+    def _ejecutar(self, ruta, firma):
+        exito = False
+        reintentar = False
+        try:
+            self.procesar(ruta)
+            exito = True
+        except Exception as e:
+            if os.getenv('DEBUG_PWAT') == '1':
+                print(f"Error procesando {ruta}: {e}")
+        finally:
+            with self._bloqueo:
+                self._en_curso -= 1
+                self._procesando.discard(ruta)
+                if exito:
+                    self.procesados += 1
+                else:
+                    self.errores += 1
+                    intentos = self._intentos.get(ruta, 0) + 1
+                    reintentar = intentos < self.max_intentos
+                if reintentar:
+                    self._intentos[ruta] = intentos
+                else:
+                    # Solo se marca como visto al terminar (o agotar intentos)
+                    self._intentos.pop(ruta, None)
+                    self._vistos[ruta] = firma
+            self._cupos.release()
+            if reintentar:
+                self.avisar(ruta)
+
+    def iniciar(self):
+        """Arranca la vigilancia en hilos de fondo."""
+        if self.procesar_existentes:
+            for nombre in sorted(os.listdir(self.directorio)):
+                self.avisar(os.path.join(self.directorio, nombre))
+        else:
+            for nombre in os.listdir(self.directorio):
+                ruta = os.path.join(self.directorio, nombre)
+                self._vistos[ruta] = _firma(ruta)
+
+        if self.modo == 'inotify':
+            self._observer = Observer()
+            self._observer.schedule(_Eventos(self.avisar), self.directorio,
+                                    recursive=False)
+            self._observer.start()
+        else:
+            self._hilos.append(threading.Thread(
+                target=self._sondear, name='vigilante-sondeo', daemon=True))
+        self._hilos.append(threading.Thread(
+            target=self._despachar, name='vigilante-despacho', daemon=True))
+        for hilo in self._hilos:
+            hilo.start()
+        return self
+
+    def detener(self, esperar=True):
+        """Detiene la vigilancia; con `esperar` aguarda los trabajos en curso."""
+        self._detener.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        for hilo in self._hilos:
+            hilo.join()
+        self._pool.shutdown(wait=esperar)
+
+    def ejecutar_por_siempre(self):
+        """Bloquea hasta Ctrl+C."""
+        self.iniciar()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.detener()